@@ -0,0 +1,72 @@
+"""
+콜드 스타트 예산 확인: `import src.graph` 시간과 첫 `graph` 접근(라우터 컴파일) 시간
+
+    python -m benchmarks.bench_cold_start              # 5회 중앙값, 예산 초과 시 종료 코드 1
+    python -m benchmarks.bench_cold_start --runs 10
+
+예산은 COLD_START_IMPORT_BUDGET_MS / COLD_START_GRAPH_BUDGET_MS로 바꿀 수 있다.
+초과하면 src.utils.import_profile 보고서로 느린 임포트를 보여준다.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+from src.utils.import_profile import format_report, profile_imports
+
+IMPORT_BUDGET_MS = float(os.getenv("COLD_START_IMPORT_BUDGET_MS", "300"))
+GRAPH_BUDGET_MS = float(os.getenv("COLD_START_GRAPH_BUDGET_MS", "2500"))
+
+# 인터프리터 기동 시간은 빼고 임포트/그래프 생성만 측정한다
+_PROBE = """
+import json, time
+t0 = time.perf_counter()
+import src.graph
+t1 = time.perf_counter()
+src.graph.graph
+t2 = time.perf_counter()
+print(json.dumps({"import_ms": (t1 - t0) * 1000, "graph_ms": (t2 - t1) * 1000}))
+"""
+
+
+def measure_once() -> Dict[str, float]:
+    proc = subprocess.run([sys.executable, "-c", _PROBE], capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "probe failed")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def run(runs: int) -> Dict[str, float]:
+    samples: List[Dict[str, float]] = [measure_once() for _ in range(runs)]
+    return {
+        "runs": runs,
+        "import_ms": round(statistics.median(s["import_ms"] for s in samples), 1),
+        "graph_ms": round(statistics.median(s["graph_ms"] for s in samples), 1),
+        "import_budget_ms": IMPORT_BUDGET_MS,
+        "graph_budget_ms": GRAPH_BUDGET_MS,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="콜드 스타트 시간 측정 및 예산 확인")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    result = run(args.runs)
+    print(json.dumps(result, ensure_ascii=False))
+
+    over = []
+    if result["import_ms"] > IMPORT_BUDGET_MS:
+        over.append(("src.graph", None))
+    if result["graph_ms"] > GRAPH_BUDGET_MS:
+        over.append(("src.graph", "graph"))
+    for target, attr in over:
+        print()
+        print(format_report(profile_imports(target, attr), top=10))
+    sys.exit(1 if over else 0)
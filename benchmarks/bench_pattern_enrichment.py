@@ -0,0 +1,102 @@
+"""
+LLM 패턴 탐지 겹침 확인: 분석 노드가 enrich_patterns의 LLM 응답이 아니라 detect_patterns 직후에 시작하는지
+
+    python -m benchmarks.bench_pattern_enrichment              # LLM 응답 지연 1초 가정
+    python -m benchmarks.bench_pattern_enrichment --delay 2
+
+패턴 탐지 LLM은 지연만 흉내 내는 가짜 모델로 바꾸고, 분석 노드는 LLM이 필요 없는 fallback으로 실행한다.
+분석 노드가 detect_patterns 종료 후 LLM 지연의 절반 이상 기다렸다가 시작했거나,
+reconcile_patterns가 LLM 패턴을 받지 못했으면 종료 코드 1.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from dataclasses import replace
+from typing import Any, Dict
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langgraph.graph import StateGraph
+
+import src.expert.pattern_agent as pattern_agent
+from src.router.dag import add_dependency_edges, derive_dependencies, prune_specs, timed_node
+from src.router.router import NODE_SPECS
+from src.router.states import RouterState
+from src.utils.utterance_store import UtteranceStore
+
+# 분석 노드 (detect_patterns의 규칙 패턴으로 시작해야 하는 노드)
+ANALYSIS_NODES = ("analyze_style", "evaluate_challenge")
+# 입력으로 직접 넣는 단계 (utterances_columns부터 시작)
+_INPUT_NODES = ("preprocess", "translate_ko_to_en", "label_utterances")
+
+_LLM_RESPONSE = json.dumps([
+    {"pattern_name": "공감부족", "description": "아이의 감정 표현에 반응하지 않음",
+     "utterance_indices": [2, 3], "severity": "medium"},
+], ensure_ascii=False)
+
+
+def _session(n: int) -> Dict[str, Any]:
+    store = UtteranceStore()
+    turns = [
+        ("Parent", "CMD", "Put the blocks in the box now."),
+        ("Child", "OTH", "I don't want to."),
+        ("Parent", "NEG", "Don't throw them like that."),
+        ("Child", "OTH", "I'm sad."),
+        ("Parent", "PR", "Thank you for helping."),
+    ]
+    for i in range(n):
+        speaker, label, text = turns[i % len(turns)]
+        store.append(speaker, label, text, "")
+    return store.to_state()
+
+
+def build_graph():
+    """reconcile_patterns까지의 노드만, 분석 노드는 fallback 함수로"""
+    specs = [
+        replace(spec, func=spec.fallback) if spec.name in ANALYSIS_NODES else spec
+        for spec in prune_specs(NODE_SPECS, ["reconcile_patterns", *ANALYSIS_NODES])
+        if spec.name not in _INPUT_NODES
+    ]
+    deps = derive_dependencies(specs)
+    graph = StateGraph(RouterState)
+    for spec in specs:
+        graph.add_node(spec.name, timed_node(spec, deps[spec.name]))
+    add_dependency_edges(graph, specs, deps)
+    return graph.compile()
+
+
+def run(delay: float, utterances: int) -> Dict[str, Any]:
+    pattern_agent.USE_LLM_PATTERNS = True
+    pattern_agent.get_llm = lambda mini=False: FakeListChatModel(responses=[_LLM_RESPONSE], sleep=delay)
+
+    out = build_graph().invoke({
+        "utterances_columns": _session(utterances),
+        "challenge_spec": {"criteria": [{"type": "count", "label": "PR", "min": 1}]},
+        "meta": {},
+    })
+    timings = out["node_timings"]
+    detect_end = timings["detect_patterns"]["end"]
+    first = min(timings[name]["start"] for name in ANALYSIS_NODES)
+    return {
+        "llm_delay_ms": round(delay * 1000, 1),
+        "analysis_wait_ms": {
+            name: round((timings[name]["start"] - detect_end) * 1000, 2) for name in ANALYSIS_NODES
+        },
+        "enrich_patterns_ms": round((timings["enrich_patterns"]["end"] - timings["enrich_patterns"]["start"]) * 1000, 2),
+        "reconcile_wait_ms": round((timings["reconcile_patterns"]["end"] - timings["reconcile_patterns"]["start"]) * 1000, 2),
+        "llm_patterns": out["pattern_enrichment"]["llm_patterns"],
+        "overlapped": first - detect_end < delay / 2,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="분석 노드와 LLM 패턴 탐지의 겹침 확인")
+    parser.add_argument("--delay", type=float, default=1.0, help="가짜 LLM 응답 지연(초)")
+    parser.add_argument("--utterances", type=int, default=200)
+    args = parser.parse_args()
+
+    result = run(args.delay, args.utterances)
+    print(json.dumps(result, ensure_ascii=False))
+    sys.exit(0 if result["overlapped"] and result["llm_patterns"] else 1)
@@ -0,0 +1,151 @@
+"""
+결과 인코딩 벤치마크: json vs result_codec (크기, 인코딩/디코딩 처리량)
+
+    python -m benchmarks.bench_result_codec                    # 합성 결과로 측정
+    python -m benchmarks.bench_result_codec --corpus out.jsonl # 저장된 결과로 측정
+
+코퍼스의 앞 절반으로 사전을 학습하고 나머지 절반으로 측정한다.
+합성 결과는 문장 8개를 조합해 만들므로 압축률이 실제보다 훨씬 좋게 나온다. 배포 판단에는 --corpus로
+저장된 결과를 측정한다. msgpack / zstandard가 설치되지 않았으면 해당 행이 빠지므로 codec 이름을 확인한다.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+from typing import Any, Callable, Dict, List
+
+from src.utils.result_codec import (
+    COMPRESSION_ZLIB,
+    COMPRESSION_ZSTD,
+    CONTAINER_JSON,
+    CONTAINER_MSGPACK,
+    MSGPACK_AVAILABLE,
+    ZSTD_AVAILABLE,
+    ResultCodec,
+    train_dictionary,
+)
+
+_SENTENCES = [
+    "우와, 블록으로 높은 탑을 만들었구나!",
+    "이제 정리할 시간이야. 장난감 상자에 넣어줄래?",
+    "엄마, 이거 봐! 빨간 자동차야.",
+    "그렇게 던지면 안 돼.",
+    "너는 파란색을 골랐구나.",
+    "이건 어디에 놓을까?",
+    "잘 기다려줘서 고마워.",
+    "싫어, 더 놀고 싶어.",
+]
+
+
+def synthetic_result(rng: random.Random) -> Dict[str, Any]:
+    """aggregate_result와 같은 구조의 합성 결과"""
+    utterances = [
+        {"speaker": rng.choice(["parent", "child"]), "text": rng.choice(_SENTENCES)}
+        for _ in range(rng.randint(20, 60))
+    ]
+
+    def _moments(n: int) -> List[Dict[str, Any]]:
+        out = []
+        for _ in range(n):
+            indices = sorted(rng.sample(range(len(utterances)), 3))
+            out.append({
+                "utterance_indices": indices,
+                "dialogue": [utterances[i] for i in indices],
+                "reason": rng.choice(_SENTENCES),
+                "better_response": rng.choice(_SENTENCES),
+            })
+        return out
+
+    sections = {k: " ".join(rng.choices(_SENTENCES, k=4)) for k in ("summary", "strengths", "actions", "tips")}
+    return {
+        "summary": " ".join(rng.choices(_SENTENCES, k=6)),
+        "key_moments": {
+            "positive": _moments(2),
+            "needs_improvement": _moments(2),
+            "pattern_examples": _moments(1),
+        },
+        "style_analysis": {
+            "style_type": rng.choice(["authoritative", "permissive"]),
+            "style_confidence": rng.random(),
+            "interaction_stats": {lb: rng.randint(0, 20) for lb in ("PR", "RD", "BD", "Q", "CMD", "NEG")},
+        },
+        "coaching_plan": {"full_text": "\n".join(sections.values()), **sections},
+        "challenge_eval": {"challenge_met": rng.random() > 0.5, "score": rng.randint(0, 100)},
+        "patterns": [
+            {"pattern_name": rng.choice(["긍정기회놓치기", "명령과제시"]), "utterance_indices": [rng.randint(0, 20)],
+             "severity": "medium", "description": rng.choice(_SENTENCES)}
+            for _ in range(rng.randint(1, 6))
+        ],
+        "meta": {"session_id": f"s{rng.randint(0, 10**9)}"},
+    }
+
+
+def _measure(name: str, encode: Callable[[Any], bytes], decode: Callable[[bytes], Any],
+             samples: List[Any], json_size: int) -> Dict[str, Any]:
+    start = time.perf_counter()
+    blobs = [encode(s) for s in samples]
+    enc = time.perf_counter() - start
+    start = time.perf_counter()
+    for b in blobs:
+        decode(b)
+    dec = time.perf_counter() - start
+    size = sum(len(b) for b in blobs)
+    return {
+        "codec": name,
+        "bytes": size,
+        "ratio_vs_json": round(size / json_size, 3),
+        "encode_mb_s": round(json_size / enc / 1e6, 1),
+        "decode_mb_s": round(json_size / dec / 1e6, 1),
+    }
+
+
+def run(samples: List[Any]) -> List[Dict[str, Any]]:
+    half = max(1, len(samples) // 2)
+    train, test = samples[:half], samples[half:] or samples
+    dictionary = train_dictionary(train)
+
+    json_size = sum(len(json.dumps(s, ensure_ascii=False).encode("utf-8")) for s in test)
+    rows = [_measure(
+        "json",
+        lambda o: json.dumps(o, ensure_ascii=False).encode("utf-8"),
+        lambda b: json.loads(b.decode("utf-8")),
+        test, json_size,
+    )]
+
+    variants = [("json+zlib", CONTAINER_JSON, COMPRESSION_ZLIB)]
+    if MSGPACK_AVAILABLE:
+        variants.append(("msgpack+zlib", CONTAINER_MSGPACK, COMPRESSION_ZLIB))
+    if ZSTD_AVAILABLE:
+        variants.append(("json+zstd", CONTAINER_JSON, COMPRESSION_ZSTD))
+        if MSGPACK_AVAILABLE:
+            variants.append(("msgpack+zstd", CONTAINER_MSGPACK, COMPRESSION_ZSTD))
+
+    for name, container, compression in variants:
+        for label, dict_bytes in ((name, None), (f"{name}+dict", dictionary)):
+            codec = ResultCodec(dictionary=dict_bytes, container=container, compression=compression)
+            # 무손실 왕복 확인
+            for s in test[:20]:
+                assert codec.decode(codec.encode(s)) == json.loads(json.dumps(s)), label
+            rows.append(_measure(label, codec.encode, codec.decode, test, json_size))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="결과 인코딩 크기/처리량 비교")
+    parser.add_argument("--corpus", help="결과 JSONL 파일 (없으면 합성 결과 사용)")
+    parser.add_argument("--sessions", type=int, default=2000, help="합성 결과 수")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.corpus:
+        with open(args.corpus, "r", encoding="utf-8") as f:
+            corpus = [json.loads(line) for line in f if line.strip()]
+    else:
+        rng = random.Random(args.seed)
+        corpus = [synthetic_result(rng) for _ in range(args.sessions)]
+
+    for row in run(corpus):
+        print(json.dumps(row, ensure_ascii=False))
@@ -0,0 +1,265 @@
+"""
+주간 챌린지 일괄 재채점
+
+새 challenge_spec이 배포되면 저장된 세션의 utterances_labeled / patterns만 읽어
+challenge_eval_node(컴파일 가능한 스펙이면 결정적 평가기)를 다시 실행한다.
+번역/라벨링은 다시 하지 않는다.
+
+MySQL 테이블 (가정):
+    analysis_session(id BIGINT AUTO_INCREMENT PK, session_key VARCHAR(64) UNIQUE, family_id VARCHAR,
+                     created_at DATETIME, utterances_labeled JSON, patterns JSON, result JSON)
+    (persist_result 노드가 src/utils/result_sink.py를 통해 기록하는 테이블)
+    challenge_result(session_id BIGINT, spec_id VARCHAR, challenge_met TINYINT, score INT,
+                     payload JSON, created_at DATETIME, PRIMARY KEY (session_id, spec_id))
+
+결과는 (session_id, spec_id)로 upsert되므로 중단 후 다시 실행하면 남은 세션만 처리한다.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from src.expert.challenge_agent import challenge_eval_node
+from src.utils.challenge_spec import compile_challenge_spec
+from src.utils.log import get_logger
+from src.utils.tracing import span
+
+log = get_logger(__name__)
+
+_SELECT_PENDING_SQL = (
+    "SELECT s.id, s.family_id, s.utterances_labeled, s.patterns "
+    "FROM analysis_session s "
+    "LEFT JOIN challenge_result r ON r.session_id = s.id AND r.spec_id = %s "
+    "WHERE s.created_at >= %s AND s.created_at < %s AND s.id > %s AND r.session_id IS NULL "
+    "ORDER BY s.id LIMIT %s"
+)
+
+_UPSERT_RESULT_SQL = (
+    "INSERT INTO challenge_result (session_id, spec_id, challenge_met, score, payload, created_at) "
+    "VALUES (%s, %s, %s, %s, %s, NOW()) "
+    "ON DUPLICATE KEY UPDATE challenge_met = VALUES(challenge_met), score = VALUES(score), "
+    "payload = VALUES(payload), created_at = VALUES(created_at)"
+)
+
+
+def _load_json(value: Any) -> Any:
+    if isinstance(value, (bytes, str)):
+        return json.loads(value) if value else []
+    return value or []
+
+
+def iter_pending_sessions_sql(
+    spec_id: str,
+    week_start: str,
+    week_end: str,
+    page_size: int = 500,
+) -> Iterator[Dict[str, Any]]:
+    """아직 spec_id 결과가 없는 주간 세션을 id 순서로 페이지 단위 조회"""
+    from src.utils.sql import run_query
+
+    last_id = 0
+    while True:
+        rows = run_query(_SELECT_PENDING_SQL, (spec_id, week_start, week_end, last_id, page_size))
+        if not rows:
+            return
+        for row in rows:
+            yield {
+                "session_id": row["id"],
+                "family_id": row.get("family_id"),
+                "utterances_labeled": _load_json(row.get("utterances_labeled")),
+                "patterns": _load_json(row.get("patterns")),
+            }
+        last_id = rows[-1]["id"]
+
+
+def write_results_sql(spec_id: str, results: List[Dict[str, Any]]) -> None:
+    """결과를 한 번의 executemany로 upsert"""
+    from src.utils.sql import run_many
+
+    run_many(_UPSERT_RESULT_SQL, [
+        (
+            r["session_id"],
+            spec_id,
+            int(bool(r["challenge_eval"].get("challenge_met"))),
+            int(r["challenge_eval"].get("score") or 0),
+            json.dumps(r["challenge_eval"], ensure_ascii=False),
+        )
+        for r in results
+    ])
+
+
+def iter_pending_sessions_jsonl(path: str, done: Set[Any]) -> Iterator[Dict[str, Any]]:
+    """JSONL 세션 파일에서 아직 처리하지 않은 세션을 순차 조회 (로컬 실행용)"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            session = json.loads(line)
+            if session.get("session_id") not in done:
+                yield session
+
+
+def _read_done_ids(output_path: str) -> Set[Any]:
+    done: Set[Any] = set()
+    if os.path.exists(output_path):
+        with open(output_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    done.add(json.loads(line).get("session_id"))
+    return done
+
+
+def write_results_jsonl(output_path: str, results: List[Dict[str, Any]]) -> None:
+    with open(output_path, "a", encoding="utf-8") as f:
+        for r in results:
+            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+
+
+def score_session(session: Dict[str, Any], challenge_spec: Dict[str, Any]) -> Dict[str, Any]:
+    """저장된 라벨/패턴만으로 세션 하나를 채점"""
+    state = {
+        "challenge_spec": challenge_spec,
+        "utterances_labeled": session.get("utterances_labeled") or [],
+        "patterns": session.get("patterns") or [],
+    }
+    with span("session", session_id=session.get("session_id"), batch="challenge_rescore"):
+        challenge_eval = challenge_eval_node(state)["challenge_eval"]
+    return {
+        "session_id": session.get("session_id"),
+        "family_id": session.get("family_id"),
+        "challenge_eval": challenge_eval,
+    }
+
+
+def rescore_sessions(
+    sessions: Iterator[Dict[str, Any]],
+    challenge_spec: Dict[str, Any],
+    write_batch,
+    max_concurrency: int = 8,
+    batch_size: int = 200,
+) -> Dict[str, Any]:
+    """
+    세션들을 제한된 동시성으로 채점하고 batch_size마다 일괄 기록
+
+    Args:
+        sessions: 채점할 세션 이터레이터 (지연 조회)
+        challenge_spec: 새 주간 챌린지 스펙
+        write_batch: 결과 리스트를 받아 일괄 기록하는 함수
+        max_concurrency: 동시에 채점할 최대 세션 수
+        batch_size: 한 번에 기록할 결과 수
+
+    Returns:
+        처리/실패 세션 수와 소요 시간
+    """
+    started = time.time()
+    processed = failed = 0
+    buffer: List[Dict[str, Any]] = []
+    in_flight: Dict[Future, Any] = {}
+
+    def _drain(done_futures) -> None:
+        nonlocal processed, failed
+        for future in done_futures:
+            session_id = in_flight.pop(future)
+            try:
+                buffer.append(future.result())
+                processed += 1
+            except Exception as e:
+                failed += 1
+                log.warning("Challenge rescore error (session %s): %s", session_id, e)
+        if len(buffer) >= batch_size:
+            write_batch(list(buffer))
+            buffer.clear()
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        for session in sessions:
+            # 동시 실행 수를 넘으면 하나 이상 끝날 때까지 대기 (세션을 한꺼번에 메모리에 올리지 않음)
+            if len(in_flight) >= max_concurrency:
+                done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                _drain(done)
+            in_flight[executor.submit(score_session, session, challenge_spec)] = session.get("session_id")
+        if in_flight:
+            done, _ = wait(list(in_flight))
+            _drain(done)
+
+    if buffer:
+        write_batch(list(buffer))
+
+    return {"processed": processed, "failed": failed, "elapsed_sec": round(time.time() - started, 2)}
+
+
+def run_rescore(
+    challenge_spec: Dict[str, Any],
+    spec_id: str,
+    week_start: Optional[str] = None,
+    week_end: Optional[str] = None,
+    input_path: Optional[str] = None,
+    output_path: Optional[str] = None,
+    max_concurrency: int = 8,
+    batch_size: int = 200,
+    with_feedback: bool = False,
+) -> Dict[str, Any]:
+    """
+    일괄 재채점 진입점
+    input_path가 있으면 JSONL 파일 → output_path JSONL, 없으면 MySQL analysis_session → challenge_result
+    """
+    # 수천 세션에 대해 피드백 문구 LLM 호출은 기본적으로 생략
+    spec = {**challenge_spec, "llm_feedback": with_feedback}
+    # 잘못된 조건 값으로 세션마다 LLM 판정에 폴백하지 않도록 시작 전에 검증
+    compile_challenge_spec(spec, strict=True)
+
+    if input_path:
+        output_path = output_path or f"{input_path}.{spec_id}.results.jsonl"
+        done = _read_done_ids(output_path)
+        sessions = iter_pending_sessions_jsonl(input_path, done)
+        return rescore_sessions(
+            sessions, spec, lambda rs: write_results_jsonl(output_path, rs), max_concurrency, batch_size
+        )
+
+    if not (week_start and week_end):
+        raise ValueError("MySQL 모드에서는 week_start와 week_end가 필요합니다.")
+    sessions = iter_pending_sessions_sql(spec_id, week_start, week_end)
+    return rescore_sessions(
+        sessions, spec, lambda rs: write_results_sql(spec_id, rs), max_concurrency, batch_size
+    )
+
+
+def _parse_args() -> Tuple[Any, Dict[str, Any]]:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="저장된 세션에 새 주간 챌린지 스펙 일괄 적용")
+    parser.add_argument("spec", help="challenge_spec JSON 파일")
+    parser.add_argument("--spec-id", required=True, help="결과 저장 키 (예: 2026-W42)")
+    parser.add_argument("--week-start", help="MySQL 모드: 주 시작 (YYYY-MM-DD)")
+    parser.add_argument("--week-end", help="MySQL 모드: 주 종료 (YYYY-MM-DD, 미포함)")
+    parser.add_argument("--input", help="JSONL 모드: 세션 파일")
+    parser.add_argument("--output", help="JSONL 모드: 결과 파일 (이어쓰기)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--with-feedback", action="store_true", help="LLM 피드백 문구도 생성")
+    args = parser.parse_args()
+    with open(args.spec, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    return args, spec
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    args, spec = _parse_args()
+    summary = run_rescore(
+        spec,
+        spec_id=args.spec_id,
+        week_start=args.week_start,
+        week_end=args.week_end,
+        input_path=args.input,
+        output_path=args.output,
+        max_concurrency=args.concurrency,
+        batch_size=args.batch_size,
+        with_feedback=args.with_feedback,
+    )
+    print(json.dumps(summary, ensure_ascii=False))
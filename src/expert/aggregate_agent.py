@@ -1,22 +1,46 @@
 from __future__ import annotations
 
+import time
 from typing import Dict, Any
 
+from src.router.dag import critical_path
+from src.router.profiling import write_profile
+
 
 def aggregate_result_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     ⑩ aggregate_result: 최종 JSON 집계
     모든 분석 결과를 하나의 JSON으로 통합
     """
+    meta = dict(state.get("meta") or {})
+    if state.get("pattern_enrichment"):
+        meta["pattern_enrichment"] = state["pattern_enrichment"]
+    if state.get("degraded"):
+        # 지연 SLO 때문에 경량 모델/fallback으로 만든 섹션 표시
+        meta["degraded"] = state["degraded"]
+        meta["degraded_sections"] = sorted({
+            section for info in state["degraded"].values() for section in info.get("sections", [])
+        })
+    if state.get("node_timings"):
+        # 어느 단계가 세션 지연 시간을 결정했는지 확인할 수 있도록 임계 경로 기록
+        meta["critical_path"] = critical_path(state["node_timings"], until=time.time())
+    if state.get("profile"):
+        # 요청별 프로파일: 아티팩트 경로와 상위 함수 / 노드별 최대 할당 요약
+        meta["profile"] = write_profile(state["profile"], meta)
+    
     result = {
-        "summary": state.get("summary", ""),
-        "key_moments": state.get("key_moments", []),
-        "style_analysis": state.get("style_analysis", {}),
-        "coaching_plan": state.get("coaching_plan", {}),
-        "challenge_eval": state.get("challenge_eval", {}),
-        "patterns": state.get("patterns", []),
-        "meta": state.get("meta", {}),
+        "summary": state.get("summary") or "",
+        "key_moments": state.get("key_moments") or [],
+        "style_analysis": state.get("style_analysis") or {},
+        "coaching_plan": state.get("coaching_plan") or {},
+        "challenge_eval": state.get("challenge_eval") or {},
+        "patterns": state.get("patterns") or [],
+        "meta": meta,
     }
+    requested = state.get("requested_outputs")
+    if requested:
+        # 요청한 섹션만 반환 (나머지 섹션은 계산되지 않았다)
+        result = {k: v for k, v in result.items() if k in requested or k == "meta"}
     
     return {"result": result}
 
@@ -2,11 +2,17 @@ from __future__ import annotations
 
 import json
 import re
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 from langchain_core.prompts import ChatPromptTemplate
 
+from src.utils.challenge_spec import compile_challenge_spec
 from src.utils.common import get_llm
+from src.utils.log import get_logger
+from src.utils.metrics import record_fallback
+from src.utils.utterance_store import get_labeled_utterances, get_utterance_store
+
+log = get_logger(__name__)
 
 
 _CHALLENGE_PROMPT = ChatPromptTemplate.from_messages([
@@ -15,7 +21,7 @@ _CHALLENGE_PROMPT = ChatPromptTemplate.from_messages([
         (
             "You are an expert evaluating parent-child interaction challenges. "
             "Evaluate whether the parent met the challenge criteria based on labeled utterances and patterns. "
-            "Return ONLY a JSON object with: {challenge_met, score, evidence, feedback, improvement_suggestions}. "
+            "Return ONLY a JSON object with: {{challenge_met, score, evidence, feedback, improvement_suggestions}}. "
             "challenge_met: boolean, score: 0-100, evidence: list of specific examples. No extra text."
         ),
     ),
@@ -30,13 +36,79 @@ _CHALLENGE_PROMPT = ChatPromptTemplate.from_messages([
     ),
 ])
 
+_FEEDBACK_PROMPT = ChatPromptTemplate.from_messages([
+    (
+        "system",
+        (
+            "You are a warm parenting coach. The challenge has already been scored. "
+            "Write short, encouraging feedback in Korean based on the results. "
+            "Return ONLY a JSON object with: {{feedback, improvement_suggestions}}. "
+            "improvement_suggestions: list of 1-3 short Korean sentences. No extra text."
+        ),
+    ),
+    (
+        "human",
+        (
+            "Challenge specification:\n{challenge_spec}\n\n"
+            "Evaluation results:\n{evaluation}\n\n"
+            "Write feedback and return JSON object only."
+        ),
+    ),
+])
+
+
+def _compiled_challenge_eval(
+    evaluator, state: Dict[str, Any], challenge_spec: Dict[str, Any], llm_feedback: bool = True
+) -> Dict[str, Any]:
+    """컴파일된 스펙으로 결정적 판정 후, 피드백 문구만 경량 LLM으로 생성"""
+    store = get_utterance_store(state)
+    evaluation = evaluator.evaluate(
+        ((store.speaker_at(i), store.label_at(i)) for i in range(len(store))),
+        state.get("patterns") or [],
+    )
+    
+    feedback = f"규칙 기반 평가: {'챌린지를 달성했습니다' if evaluation['challenge_met'] else '개선이 필요합니다'}."
+    suggestions = []
+    if llm_feedback and challenge_spec.get("llm_feedback", True):
+        try:
+            llm = get_llm(mini=True)
+            res = (_FEEDBACK_PROMPT | llm).invoke({
+                "challenge_spec": json.dumps(challenge_spec, ensure_ascii=False, indent=2),
+                "evaluation": json.dumps(evaluation, ensure_ascii=False, indent=2),
+            })
+            content = getattr(res, "content", "") or str(res)
+            json_match = re.search(r'\{[\s\S]*\}', content)
+            if json_match:
+                parsed = json.loads(json_match.group(0))
+                if isinstance(parsed, dict):
+                    feedback = parsed.get("feedback") or feedback
+                    suggestions = parsed.get("improvement_suggestions") or []
+        except Exception as e:
+            log.warning("Challenge feedback error: %s", e)
+            record_fallback("feedback_error")
+    
+    if not suggestions:
+        suggestions = [
+            f"{c['type']} 조건을 다시 확인해보세요."
+            for c in evaluation["criteria"] if not c["met"]
+        ][:3]
+    
+    return {
+        "challenge_eval": {
+            **evaluation,
+            "feedback": feedback,
+            "improvement_suggestions": suggestions,
+            "evaluator": "compiled",
+        }
+    }
+
 
 def challenge_eval_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     ⑨ challenge_eval: 챌린지 판정 (패턴/라벨 + spec)
+    challenge_spec.criteria가 컴파일 가능하면 결정적으로 판정하고 LLM은 피드백 문구에만 사용한다.
     """
     challenge_spec = state.get("challenge_spec") or {}
-    utterances_labeled = state.get("utterances_labeled") or []
     patterns = state.get("patterns") or []
     
     if not challenge_spec:
@@ -50,7 +122,13 @@ def challenge_eval_node(state: Dict[str, Any]) -> Dict[str, Any]:
             }
         }
     
+    # 측정 가능한 criteria가 있으면 LLM 없이 판정 (컴파일할 수 없는 스펙은 기존 LLM 판정으로 폴백)
+    evaluator = compile_challenge_spec(challenge_spec)
+    if evaluator is not None:
+        return _compiled_challenge_eval(evaluator, state, challenge_spec)
+    
     llm = get_llm(mini=False)
+    utterances_labeled = get_labeled_utterances(state)
     
     # 포맷팅
     challenge_str = json.dumps(challenge_spec, ensure_ascii=False, indent=2)
@@ -78,9 +156,28 @@ def challenge_eval_node(state: Dict[str, Any]) -> Dict[str, Any]:
             if isinstance(challenge_eval, dict):
                 return {"challenge_eval": challenge_eval}
     except Exception as e:
-        print(f"Challenge eval error: {e}")
+        log.warning("Challenge eval error: %s", e)
     
-    # 폴백: 패턴 기반 간단한 평가
+    # 폴백: 패턴 기반 간단한 평가 (LLM 호출/파싱 실패)
+    record_fallback("error")
+    return _pattern_challenge_eval(patterns)
+
+
+def challenge_eval_fallback_node(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    SLO 강등 모드: LLM 없이 판정
+    컴파일 가능한 스펙은 결정적 판정(피드백은 템플릿), 아니면 패턴 수 기반 평가
+    """
+    challenge_spec = state.get("challenge_spec") or {}
+    if not challenge_spec:
+        return challenge_eval_node(state)
+    evaluator = compile_challenge_spec(challenge_spec)
+    if evaluator is not None:
+        return _compiled_challenge_eval(evaluator, state, challenge_spec, llm_feedback=False)
+    return _pattern_challenge_eval(state.get("patterns") or [])
+
+
+def _pattern_challenge_eval(patterns: List[Dict[str, Any]]) -> Dict[str, Any]:
     negative_patterns = [p for p in patterns if p.get("severity") in ["high", "medium"]]
     challenge_met = len(negative_patterns) == 0
     score = max(0, 100 - len(negative_patterns) * 20)
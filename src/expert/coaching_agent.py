@@ -6,6 +6,10 @@ from typing import Dict, Any
 from langchain_core.prompts import ChatPromptTemplate
 
 from src.utils.common import get_llm
+from src.utils.log import get_logger
+from src.utils.metrics import record_fallback
+
+log = get_logger(__name__)
 
 
 _COACHING_PROMPT = ChatPromptTemplate.from_messages([
@@ -60,10 +64,7 @@ def coaching_plan_node(state: Dict[str, Any]) -> Dict[str, Any]:
         f"- {p.get('pattern_name')}: {p.get('description')}"
         for p in patterns
     ]) if patterns else "(없음)"
-    key_moments_str = "\n".join([
-        f"- {m.get('description')}"
-        for m in key_moments
-    ]) if key_moments else "(없음)"
+    key_moments_str = _format_key_moments(key_moments)
     
     try:
         res = (_COACHING_PROMPT | llm).invoke({
@@ -85,7 +86,8 @@ def coaching_plan_node(state: Dict[str, Any]) -> Dict[str, Any]:
             }
         }
     except Exception as e:
-        print(f"Coaching plan error: {e}")
+        log.warning("Coaching plan error: %s", e)
+        record_fallback("error")
         return {
             "coaching_plan": {
                 "full_text": "코칭 계획 생성 중 오류가 발생했습니다.",
@@ -97,6 +99,22 @@ def coaching_plan_node(state: Dict[str, Any]) -> Dict[str, Any]:
         }
 
 
+def _format_key_moments(key_moments: Any) -> str:
+    """key_moments_node 결과({positive, needs_improvement, pattern_examples})를 프롬프트용 텍스트로 변환"""
+    if isinstance(key_moments, list):  # 기존 형식 (하위 호환성)
+        lines = [f"- {m.get('description')}" for m in key_moments if isinstance(m, dict)]
+        return "\n".join(lines) if lines else "(없음)"
+    
+    lines = []
+    for m in key_moments.get("positive", []):
+        lines.append(f"- [긍정] {m.get('reason', '')}")
+    for m in key_moments.get("needs_improvement", []):
+        lines.append(f"- [개선 필요] {m.get('reason', '')} (더 나은 응답: {m.get('better_response', '')})")
+    for m in key_moments.get("pattern_examples", []):
+        lines.append(f"- [패턴] {m.get('pattern_name', '')}: {m.get('problem_explanation', '')}")
+    return "\n".join(lines) if lines else "(없음)"
+
+
 def _extract_section(text: str, section_name: str) -> list:
     """텍스트에서 섹션 추출 (간단한 휴리스틱)"""
     lines = text.split('\n')
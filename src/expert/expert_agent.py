@@ -1,10 +1,14 @@
 from __future__ import annotations
 
+import logging
 from typing import Dict, Any, List
 
 from langchain_core.prompts import ChatPromptTemplate
 
 from src.utils.common import get_llm
+from src.utils.log import get_logger
+
+log = get_logger(__name__)
 
 
 PROMPT = ChatPromptTemplate.from_messages([
@@ -39,18 +43,20 @@ def parenting_advice_node(state: Dict[str, Any]) -> Dict[str, Any]:
     llm = get_llm(mini=False)
     chain = PROMPT | llm
 
-    msgs = PROMPT.format_prompt(
-        dialogue=dialogue,
-        annotated=annotated,
-        highlights_str=highlights_str,
-        context=context,
-    ).to_messages()
-    printable = []
-    for m in msgs:
-        role = getattr(m, "type", getattr(m, "role", ""))
-        content = getattr(m, "content", "")
-        printable.append(f"[{role}]\n{content}")
-    print("\n=== Parenting Advice Prompt ===\n" + "\n\n".join(printable) + "\n=== END ===\n")
+    # 전체 프롬프트는 DEBUG 레벨에서만 만들어 기록 (요청마다 출력하면 그 자체가 비용)
+    if log.isEnabledFor(logging.DEBUG):
+        msgs = PROMPT.format_prompt(
+            dialogue=dialogue,
+            annotated=annotated,
+            highlights_str=highlights_str,
+            context=context,
+        ).to_messages()
+        printable = []
+        for m in msgs:
+            role = getattr(m, "type", getattr(m, "role", ""))
+            content = getattr(m, "content", "")
+            printable.append(f"[{role}]\n{content}")
+        log.debug("Parenting advice prompt:\n%s", "\n\n".join(printable))
 
     res = chain.invoke({
         "dialogue": dialogue,
@@ -7,6 +7,9 @@ from typing import Dict, Any, List
 from langchain_core.prompts import ChatPromptTemplate
 
 from src.utils.common import get_llm
+from src.utils.log import get_logger
+
+log = get_logger(__name__)
 
 
 _PROMPT = ChatPromptTemplate.from_messages([
@@ -102,8 +105,8 @@ def highlight_extract_node(state: Dict[str, Any]) -> Dict[str, Any]:
     res = (_PROMPT | llm).invoke({"numbered": numbered})
     content = getattr(res, "content", "") or str(res)
 
-    # Debug print for inspection
-    print("\n=== Highlight Raw Model Output ===\n" + content + "\n=== END ===\n")
+    # 원본 모델 출력은 DEBUG 레벨에서만 기록 (요청마다 출력하면 그 자체가 비용)
+    log.debug("Highlight raw model output:\n%s", content)
 
     try:
         picks = _parse_indices_or_highlights(content, lines)
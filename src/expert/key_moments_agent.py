@@ -1,29 +1,38 @@
 from __future__ import annotations
 
+import re
 from typing import Dict, Any, List, Optional
 
+import numpy as np
 from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
 
 from src.utils.common import get_structured_llm
+from src.utils.log import get_logger
+from src.utils.metrics import record_fallback
+from src.utils.utterance_store import UtteranceIndex, UtteranceStore, get_labeled_utterances, get_utterance_store
 
+log = get_logger(__name__)
 
-class DialogueUtterance(BaseModel):
-    """대화 발화"""
-    speaker: str = Field(description="발화자: 'parent' (부모) 또는 'child' (아이)")
-    text: str = Field(description="발화 내용 (한국어 원문)")
+_INDICES_DESCRIPTION = "핵심 순간을 구성하는 연속된 발화 번호 리스트 (라벨링된 발화 앞의 번호)"
+_QUOTES_DESCRIPTION = "발화 번호를 적지 못한 경우에만: 핵심 순간의 발화 원문 리스트"
+
+# 인용한 발화 앞에 붙어 오는 "3. [parent] [CMD] " 형식의 번호/태그
+_QUOTE_PREFIX_RE = re.compile(r"^\s*(?:\d+\.\s*)?(?:\[(?P<speaker>[^\]]*)\]\s*)?(?:\[[^\]]*\]\s*)*")
 
 
 class PositiveMoment(BaseModel):
     """긍정적 순간"""
-    dialogue: List[DialogueUtterance] = Field(description="대화 발화 리스트 (한국어 원문 포함)")
+    utterance_indices: List[int] = Field(description=_INDICES_DESCRIPTION)
+    quotes: List[str] = Field(description=_QUOTES_DESCRIPTION, default_factory=list)
     reason: str = Field(description="긍정적인 이유 설명 (한국어)")
     pattern_hint: str = Field(description="관련 패턴 힌트 (한국어)")
 
 
 class NeedsImprovementMoment(BaseModel):
     """개선이 필요한 순간"""
-    dialogue: List[DialogueUtterance] = Field(description="대화 발화 리스트 (한국어 원문 포함)")
+    utterance_indices: List[int] = Field(description=_INDICES_DESCRIPTION)
+    quotes: List[str] = Field(description=_QUOTES_DESCRIPTION, default_factory=list)
     reason: str = Field(description="개선이 필요한 이유 설명 (한국어)")
     better_response: str = Field(description="더 나은 응답 예시 (한국어)")
     pattern_hint: str = Field(description="관련 패턴 힌트 (한국어)")
@@ -33,7 +42,8 @@ class PatternExample(BaseModel):
     """패턴 예시"""
     pattern_name: str = Field(description="패턴 이름 (한국어)")
     occurrences: int = Field(description="발생 횟수")
-    dialogue: List[DialogueUtterance] = Field(description="대화 발화 리스트 (한국어 원문 포함)")
+    utterance_indices: List[int] = Field(description=_INDICES_DESCRIPTION)
+    quotes: List[str] = Field(description=_QUOTES_DESCRIPTION, default_factory=list)
     problem_explanation: str = Field(description="문제 설명 (한국어)")
     suggested_response: str = Field(description="제안된 응답 (한국어)")
 
@@ -59,8 +69,8 @@ _KEY_MOMENTS_PROMPT = ChatPromptTemplate.from_messages([
             "1. 'positive': 부모가 잘 대응한 순간들 (감정 코칭, 공감, 인정 등)\n"
             "2. 'needs_improvement': 부모의 응답을 개선할 수 있는 순간들\n"
             "3. 'pattern_examples': 감지된 패턴의 구체적인 대화 발췌 예시들\n\n"
-            "각 순간에 대해 발화에서 실제 대화(발화자와 한국어 원문 텍스트)를 포함하세요. "
-            "대화는 핵심 순간을 구성하는 연속된 발화들의 리스트여야 합니다. "
+            "각 순간은 'utterance_indices'에 핵심 순간을 구성하는 연속된 발화의 번호만 적으세요. "
+            "발화 원문은 다시 쓰지 말고, 번호를 알 수 없을 때만 'quotes'에 원문을 적으세요. "
             "'needs_improvement' 순간의 경우, 'better_response' 제안을 제공하세요. "
             "'pattern_examples'의 경우, 패턴 이름, 발생 횟수, 문제 설명, 제안된 응답을 포함하세요. "
             "모든 설명과 응답은 한국어로 작성하세요."
@@ -69,32 +79,55 @@ _KEY_MOMENTS_PROMPT = ChatPromptTemplate.from_messages([
     (
         "human",
         (
-            "라벨링된 발화:\n{utterances_labeled}\n\n"
+            "라벨링된 발화 (번호. [발화자] [라벨] 원문):\n{utterances_labeled}\n\n"
             "감지된 패턴:\n{patterns}\n\n"
             "상호작용에서 핵심 순간을 추출하고 분류하세요. "
-            "각 순간에 대해 발화자와 한국어 원문 텍스트가 포함된 실제 대화 발췌를 포함하세요."
+            "각 순간은 발화 번호로 참조하세요."
         ),
     ),
 ])
 
 
+def _moment_indices(index: UtteranceIndex, moment: Any) -> List[int]:
+    """
+    순간의 발화 인덱스
+    LLM이 번호 대신 원문만 돌려준 경우(이전 형식 응답)는 텍스트 해시로 찾는다 (앞 발화 이후의 첫 일치 우선).
+    """
+    indices = index.valid(moment.utterance_indices)
+    if indices or not moment.quotes:
+        return indices
+    found: List[int] = []
+    after = -1
+    for quote in moment.quotes:
+        prefix = _QUOTE_PREFIX_RE.match(quote)
+        i = index.find_text(quote[prefix.end():], speaker=prefix.group("speaker"), after=after)
+        if i is not None:
+            found.append(i)
+            after = i
+    return index.valid(found)
+
+
 def key_moments_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     ⑥ key_moments: 핵심 순간 (LLM)
+    LLM은 발화 번호만 반환하고, 대화 원문은 세션 발화 인덱스에서 상수 시간에 복원한다.
     """
-    utterances_labeled = state.get("utterances_labeled") or []
+    utterances_labeled = get_labeled_utterances(state)
     patterns = state.get("patterns") or []
     
     if not utterances_labeled:
         return {"key_moments": {"positive": [], "needs_improvement": [], "pattern_examples": []}}
     
+    store = get_utterance_store(state)
+    index = UtteranceIndex(store)
+    
     # Structured LLM 사용
     structured_llm = get_structured_llm(KeyMomentsResponse, mini=False)
     
     # 포맷팅 - 발화를 인덱스와 함께 표시 (한국어 원문 사용)
     utterances_str = "\n".join([
-        f"{i}. [{utt.get('speaker', '').lower()}] [{utt.get('label', '')}] {utt.get('original_ko', utt.get('korean', utt.get('text', '')))}"
-        for i, utt in enumerate(utterances_labeled)
+        f"{i}. [{store.speaker_at(i).lower()}] [{store.label_at(i)}] {store.korean_at(i) or store.english_at(i)}"
+        for i in range(len(store))
     ])
     patterns_str = "\n".join([
         f"- {p.get('pattern_name')}: {p.get('description')}"
@@ -111,104 +144,35 @@ def key_moments_node(state: Dict[str, Any]) -> Dict[str, Any]:
         if isinstance(res, KeyMomentsResponse):
             key_moments_content = res.key_moments
             
-            # positive 변환 (한국어 원문 사용)
             positive_list = []
             for moment in key_moments_content.positive:
-                # dialogue에서 발화자와 텍스트를 매칭하여 한국어 원문 찾기
-                dialogue_with_ko = []
-                for utt in moment.dialogue:
-                    # utterances_labeled에서 매칭되는 발화 찾기
-                    matched_text = utt.text
-                    for orig_utt in utterances_labeled:
-                        # 발화자와 텍스트로 매칭 (한국어 원문 우선)
-                        orig_speaker = orig_utt.get('speaker', '').lower()
-                        if orig_speaker in ['mom', 'mother', 'parent', '엄마', '아빠']:
-                            orig_speaker = 'parent'
-                        elif orig_speaker in ['chi', 'child', 'kid', '아이']:
-                            orig_speaker = 'child'
-                        
-                        if (utt.speaker.lower() == orig_speaker and 
-                            (utt.text in orig_utt.get('english', '') or 
-                             utt.text in orig_utt.get('text', '') or
-                             orig_utt.get('english', '') in utt.text or
-                             orig_utt.get('text', '') in utt.text)):
-                            matched_text = orig_utt.get('original_ko', orig_utt.get('korean', utt.text))
-                            break
-                    
-                    dialogue_with_ko.append({
-                        "speaker": utt.speaker,
-                        "text": matched_text
-                    })
-                
+                indices = _moment_indices(index, moment)
                 positive_list.append({
-                    "dialogue": dialogue_with_ko,
+                    "utterance_indices": indices,
+                    "dialogue": index.dialogue(indices),
                     "reason": moment.reason,
                     "pattern_hint": moment.pattern_hint
                 })
             
-            # needs_improvement 변환 (한국어 원문 사용)
             needs_improvement_list = []
             for moment in key_moments_content.needs_improvement:
-                dialogue_with_ko = []
-                for utt in moment.dialogue:
-                    matched_text = utt.text
-                    for orig_utt in utterances_labeled:
-                        orig_speaker = orig_utt.get('speaker', '').lower()
-                        if orig_speaker in ['mom', 'mother', 'parent', '엄마', '아빠']:
-                            orig_speaker = 'parent'
-                        elif orig_speaker in ['chi', 'child', 'kid', '아이']:
-                            orig_speaker = 'child'
-                        
-                        if (utt.speaker.lower() == orig_speaker and 
-                            (utt.text in orig_utt.get('english', '') or 
-                             utt.text in orig_utt.get('text', '') or
-                             orig_utt.get('english', '') in utt.text or
-                             orig_utt.get('text', '') in utt.text)):
-                            matched_text = orig_utt.get('original_ko', orig_utt.get('korean', utt.text))
-                            break
-                    
-                    dialogue_with_ko.append({
-                        "speaker": utt.speaker,
-                        "text": matched_text
-                    })
-                
+                indices = _moment_indices(index, moment)
                 needs_improvement_list.append({
-                    "dialogue": dialogue_with_ko,
+                    "utterance_indices": indices,
+                    "dialogue": index.dialogue(indices),
                     "reason": moment.reason,
                     "better_response": moment.better_response,
                     "pattern_hint": moment.pattern_hint
                 })
             
-            # pattern_examples 변환 (한국어 원문 사용)
             pattern_examples_list = []
             for example in key_moments_content.pattern_examples:
-                dialogue_with_ko = []
-                for utt in example.dialogue:
-                    matched_text = utt.text
-                    for orig_utt in utterances_labeled:
-                        orig_speaker = orig_utt.get('speaker', '').lower()
-                        if orig_speaker in ['mom', 'mother', 'parent', '엄마', '아빠']:
-                            orig_speaker = 'parent'
-                        elif orig_speaker in ['chi', 'child', 'kid', '아이']:
-                            orig_speaker = 'child'
-                        
-                        if (utt.speaker.lower() == orig_speaker and 
-                            (utt.text in orig_utt.get('english', '') or 
-                             utt.text in orig_utt.get('text', '') or
-                             orig_utt.get('english', '') in utt.text or
-                             orig_utt.get('text', '') in utt.text)):
-                            matched_text = orig_utt.get('original_ko', orig_utt.get('korean', utt.text))
-                            break
-                    
-                    dialogue_with_ko.append({
-                        "speaker": utt.speaker,
-                        "text": matched_text
-                    })
-                
+                indices = _moment_indices(index, example)
                 pattern_examples_list.append({
                     "pattern_name": example.pattern_name,
                     "occurrences": example.occurrences,
-                    "dialogue": dialogue_with_ko,
+                    "utterance_indices": indices,
+                    "dialogue": index.dialogue(indices),
                     "problem_explanation": example.problem_explanation,
                     "suggested_response": example.suggested_response
                 })
@@ -222,118 +186,76 @@ def key_moments_node(state: Dict[str, Any]) -> Dict[str, Any]:
             }
         
         # 폴백: 예상치 못한 형식
-        return _fallback_key_moments(utterances_labeled, patterns)
+        record_fallback("unexpected_response")
+        return _fallback_key_moments(utterances_labeled, patterns, store)
         
     except Exception as e:
-        print(f"Key moments error: {e}")
-        import traceback
-        traceback.print_exc()
+        log.warning("Key moments error: %s", e)
+        log.debug("Key moments traceback", exc_info=True)
         # 에러 시 폴백 사용
-        return _fallback_key_moments(utterances_labeled, patterns)
+        record_fallback("error")
+        return _fallback_key_moments(utterances_labeled, patterns, store)
 
 
-def _fallback_key_moments(utterances_labeled: List[Dict[str, Any]], patterns: List[Dict[str, Any]]) -> Dict[str, Any]:
+def key_moments_fallback_node(state: Dict[str, Any]) -> Dict[str, Any]:
+    """SLO 강등 모드: LLM 없이 라벨/패턴 기반 핵심 순간"""
+    utterances_labeled = get_labeled_utterances(state)
+    if not utterances_labeled:
+        return {"key_moments": {"positive": [], "needs_improvement": [], "pattern_examples": []}}
+    return _fallback_key_moments(utterances_labeled, state.get("patterns") or [], get_utterance_store(state))
+
+
+def _fallback_key_moments(
+    utterances_labeled: List[Dict[str, Any]],
+    patterns: List[Dict[str, Any]],
+    store: Optional[UtteranceStore] = None,
+) -> Dict[str, Any]:
     """폴백: 패턴 기반으로 핵심 순간 생성"""
     positive_list = []
     needs_improvement_list = []
     pattern_examples_list = []
     
-    # 패턴 기반으로 pattern_examples 생성
+    store = store if store is not None else UtteranceStore.from_utterances(utterances_labeled)
+    index = UtteranceIndex(store)
+    
+    # 패턴 기반으로 pattern_examples 생성 (인덱스 범위 내, 최대 5개 발화, 한국어 원문 사용)
     for pattern in patterns[:5]:
-        utterance_indices = pattern.get("utterance_indices", [])
-        if not utterance_indices:
-            continue
-        
-        # 발화 추출 (인덱스 범위 내, 한국어 원문 사용)
-        dialogue = []
-        for idx in utterance_indices[:5]:  # 최대 5개 발화
-            if 0 <= idx < len(utterances_labeled):
-                utt = utterances_labeled[idx]
-                speaker = utt.get("speaker", "").lower()
-                if speaker in ["mom", "mother", "parent", "엄마", "아빠"]:
-                    speaker = "parent"
-                elif speaker in ["chi", "child", "kid", "아이"]:
-                    speaker = "child"
-                # 한국어 원문 우선 사용
-                text = utt.get("original_ko", utt.get("korean", utt.get("text", "")))
-                if text:
-                    dialogue.append({"speaker": speaker, "text": text})
+        indices = index.valid(pattern.get("utterance_indices", []))[:5]
+        dialogue = [utt for utt in index.dialogue(indices) if utt["text"]]
         
         if dialogue:
             pattern_examples_list.append({
                 "pattern_name": pattern.get("pattern_name", "Unknown Pattern"),
                 "occurrences": pattern.get("occurrence_count", 1),
+                "utterance_indices": indices,
                 "dialogue": dialogue,
                 "problem_explanation": pattern.get("description", "패턴이 감지되었습니다."),
                 "suggested_response": pattern.get("suggested_response", "더 나은 응답을 고려해보세요.")
             })
     
+    # 라벨 코드 배열에서 후보 인덱스를 한 번에 찾는다 (마지막 발화는 다음 발화가 없으므로 제외)
+    last = len(store) - 1
+    
     # 긍정적 순간 찾기 (PR 라벨이 있는 발화, 한국어 원문 사용)
-    for i, utt in enumerate(utterances_labeled):
-        if utt.get("label") == "PR" and i < len(utterances_labeled) - 1:
-            speaker = utt.get("speaker", "").lower()
-            if speaker in ["mom", "mother", "parent", "엄마", "아빠"]:
-                speaker = "parent"
-            elif speaker in ["chi", "child", "kid", "아이"]:
-                speaker = "child"
-            
-            # 한국어 원문 우선 사용
-            dialogue = [
-                {"speaker": speaker, "text": utt.get("original_ko", utt.get("korean", utt.get("text", "")))}
-            ]
-            # 다음 발화도 포함
-            if i + 1 < len(utterances_labeled):
-                next_utt = utterances_labeled[i + 1]
-                next_speaker = next_utt.get("speaker", "").lower()
-                if next_speaker in ["mom", "mother", "parent", "엄마", "아빠"]:
-                    next_speaker = "parent"
-                elif next_speaker in ["chi", "child", "kid", "아이"]:
-                    next_speaker = "child"
-                dialogue.append({
-                    "speaker": next_speaker,
-                    "text": next_utt.get("original_ko", next_utt.get("korean", next_utt.get("text", "")))
-                })
-            
-            if len(positive_list) < 3 and dialogue:
-                positive_list.append({
-                    "dialogue": dialogue,
-                    "reason": "긍정적 상호작용이 감지되었습니다.",
-                    "pattern_hint": "긍정적 상호작용"
-                })
+    positive_idx = np.flatnonzero(store.mask(labels=["PR"])[:last])[:3]
+    for i in positive_idx.tolist():
+        positive_list.append({
+            "utterance_indices": [i, i + 1],
+            "dialogue": index.dialogue([i, i + 1]),
+            "reason": "긍정적 상호작용이 감지되었습니다.",
+            "pattern_hint": "긍정적 상호작용"
+        })
     
     # 개선이 필요한 순간 찾기 (NEG, CMD 라벨이 있는 발화, 한국어 원문 사용)
-    for i, utt in enumerate(utterances_labeled):
-        if utt.get("label") in ["NEG", "CMD"] and i < len(utterances_labeled) - 1:
-            speaker = utt.get("speaker", "").lower()
-            if speaker in ["mom", "mother", "parent", "엄마", "아빠"]:
-                speaker = "parent"
-            elif speaker in ["chi", "child", "kid", "아이"]:
-                speaker = "child"
-            
-            # 한국어 원문 우선 사용
-            dialogue = [
-                {"speaker": speaker, "text": utt.get("original_ko", utt.get("korean", utt.get("text", "")))}
-            ]
-            # 다음 발화도 포함
-            if i + 1 < len(utterances_labeled):
-                next_utt = utterances_labeled[i + 1]
-                next_speaker = next_utt.get("speaker", "").lower()
-                if next_speaker in ["mom", "mother", "parent", "엄마", "아빠"]:
-                    next_speaker = "parent"
-                elif next_speaker in ["chi", "child", "kid", "아이"]:
-                    next_speaker = "child"
-                dialogue.append({
-                    "speaker": next_speaker,
-                    "text": next_utt.get("original_ko", next_utt.get("korean", next_utt.get("text", "")))
-                })
-            
-            if len(needs_improvement_list) < 3 and dialogue:
-                needs_improvement_list.append({
-                    "dialogue": dialogue,
-                    "reason": "개선이 필요한 상호작용이 감지되었습니다.",
-                    "better_response": "아이의 감정을 먼저 읽어주시고 공감해주세요.",
-                    "pattern_hint": "개선 필요"
-                })
+    improvement_idx = np.flatnonzero(store.mask(labels=["NEG", "CMD"])[:last])[:3]
+    for i in improvement_idx.tolist():
+        needs_improvement_list.append({
+            "utterance_indices": [i, i + 1],
+            "dialogue": index.dialogue([i, i + 1]),
+            "reason": "개선이 필요한 상호작용이 감지되었습니다.",
+            "better_response": "아이의 감정을 먼저 읽어주시고 공감해주세요.",
+            "pattern_hint": "개선 필요"
+        })
     
     return {
         "key_moments": {
@@ -343,3 +265,4 @@ def _fallback_key_moments(utterances_labeled: List[Dict[str, Any]], patterns: Li
         }
     }
 
+
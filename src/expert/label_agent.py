@@ -1,50 +1,83 @@
 from __future__ import annotations
 
+import importlib.util
 import os
-from typing import Dict, Any, List
+from typing import Dict, Any
 
-from src.utils.dpics import label_lines_dpics_llm
+from src.utils.dpics import label_lines_dpics_keywords, label_lines_dpics_llm
+from src.utils.log import get_logger
+from src.utils.metrics import record_fallback
+from src.utils.transcript import get_speaker_lexer
+from src.utils.utterance_store import UtteranceStore
+
+log = get_logger(__name__)
 
 # ELECTRA 모델 사용 여부 (환경 변수로 제어 가능)
 USE_ELECTRA = os.getenv("USE_DPICS_ELECTRA", "true").lower() == "true"
 
-try:
-    from src.utils.dpics_electra import label_lines_dpics_electra
-    ELECTRA_AVAILABLE = True
-except ImportError:
-    ELECTRA_AVAILABLE = False
-    print("경고: dpics_electra를 사용할 수 없습니다. LLM 기반 라벨링을 사용합니다.")
+# dpics_electra (transformers / torch)는 ELECTRA 라벨링을 처음 쓸 때 임포트한다
+ELECTRA_AVAILABLE = (
+    importlib.util.find_spec("transformers") is not None and importlib.util.find_spec("torch") is not None
+)
+if USE_ELECTRA and not ELECTRA_AVAILABLE:
+    log.warning("dpics_electra를 사용할 수 없습니다. LLM 기반 라벨링을 사용합니다.")
 
 
 def label_utterances_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     ③ label_utterances: 영어 발화에 라벨 달기 (파인튜닝 ELECTRA 또는 LLM)
-    utterances_en을 받아서 라벨링된 utterances_labeled 반환
+    utterances_en을 받아서 라벨링된 발화를 컬럼형(utterances_columns)으로 반환
     utterances_en 형식: [{speaker, korean, english, text, original_ko}, ...] 또는 ["Parent: ...", ...]
     """
+    return _label_utterances(state, keywords_only=False)
+
+
+def label_utterances_fallback_node(state: Dict[str, Any]) -> Dict[str, Any]:
+    """SLO 강등 모드: 모델 호출 없이 키워드 휴리스틱으로 라벨링"""
+    return _label_utterances(state, keywords_only=True)
+
+
+def _label_utterances(state: Dict[str, Any], keywords_only: bool) -> Dict[str, Any]:
     utterances_en = state.get("utterances_en") or []
     
     if not utterances_en:
-        return {"utterances_labeled": []}
+        return {"utterances_columns": UtteranceStore().to_state()}
     
     # 구조화된 형식인지 확인
     is_structured = isinstance(utterances_en[0], dict) if utterances_en else False
     
     # 영어 발화를 텍스트로 합치기 (DPICS 라벨링용)
     if is_structured:
-        utterances_text = "\n".join([
+        utterance_lines = [
             f"{utt.get('speaker', 'Parent')}: {utt.get('english', utt.get('text', ''))}"
             for utt in utterances_en
-        ])
+        ]
     else:
-        utterances_text = "\n".join(utterances_en)
+        utterance_lines = list(utterances_en)
+    utterances_text = "\n".join(utterance_lines)
     
     # DPICS 라벨링 (ELECTRA 모델 또는 LLM 기반)
-    if USE_ELECTRA and ELECTRA_AVAILABLE:
+    if keywords_only:
+        labeled_pairs = label_lines_dpics_keywords(utterances_text)
+    elif USE_ELECTRA and ELECTRA_AVAILABLE:
         try:
-            labeled_pairs = label_lines_dpics_electra(utterances_text)
+            if is_structured:
+                # 스피커는 이미 파싱되어 있으므로 코드만 바꿔 모델 입력을 만든다 (태그 재파싱 없음)
+                from src.utils.dpics_electra import label_utterances_dpics_electra
+
+                lexer = get_speaker_lexer()
+                labels = label_utterances_dpics_electra([
+                    (lexer.code(utt.get("speaker", "Parent")), utt.get("english", utt.get("text", "")))
+                    for utt in utterances_en
+                ])
+                labeled_pairs = list(zip(utterance_lines, labels))
+            else:
+                from src.utils.dpics_electra import label_lines_dpics_electra
+
+                labeled_pairs = label_lines_dpics_electra(utterances_text)
         except Exception as e:
-            print(f"ELECTRA 모델 라벨링 실패, LLM으로 폴백: {e}")
+            log.warning("ELECTRA 모델 라벨링 실패, LLM으로 폴백: %s", e)
+            record_fallback("electra_to_llm", node="label_utterances")
             labeled_pairs = label_lines_dpics_llm(utterances_text)
     else:
         labeled_pairs = label_lines_dpics_llm(utterances_text)
@@ -52,7 +85,8 @@ def label_utterances_node(state: Dict[str, Any]) -> Dict[str, Any]:
     # 발화와 라벨을 딕셔너리 리스트로 변환
     # LLM이 반환한 line이 원본과 정확히 일치하지 않을 수 있으므로,
     # 원본 utterances_en을 기준으로 스피커를 추출하고 LLM 결과와 매칭
-    utterances_labeled: List[Dict[str, Any]] = []
+    # 결과는 컬럼형 저장소에 바로 쌓는다 (dict 뷰는 필요한 노드가 저장소에서 만든다)
+    store = UtteranceStore(capacity=max(16, len(utterances_en)))
     
     # 원본 발화에서 스피커와 텍스트 추출 (인덱스별로 미리 파싱)
     original_parsed = []
@@ -124,27 +158,14 @@ def label_utterances_node(state: Dict[str, Any]) -> Dict[str, Any]:
         # 매칭된 항목 사용
         if matched_idx is not None:
             orig = original_parsed[matched_idx]
-            utterances_labeled.append({
-                "speaker": orig["speaker"],
-                "text": orig["text"],
-                "label": label,  # DPICS 코드 (PR, RD, BD, NT, Q, CMD, NEG, IGN, OTH)
-                "original": orig.get("original_ko", orig["original"]),  # 한국어 원문 우선, 없으면 영어
-                "original_ko": orig.get("original_ko", ""),  # 한국어 원문 명시적 포함
-                "english": orig.get("english", orig["text"])  # 영어 번역 포함
-            })
+            # label: DPICS 코드 (PR, RD, BD, NT, Q, CMD, NEG, IGN, OTH)
+            store.append(orig["speaker"], label, orig["english"], orig["original_ko"])
             original_parsed[matched_idx]["matched"] = True
     
     # LLM이 반환하지 않은 원본 발화들도 추가 (기본 라벨)
     for orig in original_parsed:
         if not orig["matched"]:
-            utterances_labeled.append({
-                "speaker": orig["speaker"],
-                "text": orig["text"],
-                "label": "OTH",  # 기본 라벨
-                "original": orig.get("original_ko", orig["original"]),  # 한국어 원문 우선
-                "original_ko": orig.get("original_ko", ""),  # 한국어 원문 명시적 포함
-                "english": orig.get("english", orig["text"])  # 영어 번역 포함
-            })
+            store.append(orig["speaker"], "OTH", orig["english"], orig["original_ko"])  # 기본 라벨
     
-    return {"utterances_labeled": utterances_labeled}
+    return {"utterances_columns": store.to_state()}
 
@@ -1,12 +1,41 @@
 from __future__ import annotations
 
+import contextvars
+import hashlib
 import json
+import os
 import re
-from typing import Dict, Any, List
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Any, List, Optional
 
 from langchain_core.prompts import ChatPromptTemplate
 
 from src.utils.common import get_llm
+from src.utils.log import get_logger
+from src.utils.metrics import record_fallback
+from src.utils.pattern_rules import detect_rule_patterns_columnar, load_rules
+from src.utils.utterance_store import get_utterance_store
+
+log = get_logger(__name__)
+
+# LLM 기반 추가 패턴 탐지 사용 여부 (환경 변수로 제어 가능)
+USE_LLM_PATTERNS = os.getenv("PATTERN_LLM_ENRICH", "true").lower() == "true"
+# 백그라운드 LLM 패턴 탐지 스레드 수 / reconcile_patterns의 최대 대기 시간(초)
+ENRICH_WORKERS = int(os.getenv("PATTERN_LLM_WORKERS", "4"))
+ENRICH_TIMEOUT = float(os.getenv("PATTERN_LLM_TIMEOUT", "60"))
+
+# 작업 키(발화 내용 해시) → LLM 패턴 탐지 Future (최근 작업만 보관)
+_MAX_JOBS = 256
+_JOBS: "OrderedDict[str, Future]" = OrderedDict()
+_JOBS_LOCK = threading.Lock()
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+
+# LLM 패턴으로 결과가 실질적으로 바뀔 때 다시 실행할 노드 (패턴을 직접 집계/판정에 사용하는 노드)
+# 재실행은 그래프의 조건부 노드(router의 reanalyze_style / reevaluate_challenge)가 맡는다.
+PATTERN_SENSITIVE_NODES = ("analyze_style", "evaluate_challenge")
 
 
 _PATTERN_PROMPT = ChatPromptTemplate.from_messages([
@@ -18,7 +47,7 @@ _PATTERN_PROMPT = ChatPromptTemplate.from_messages([
             "Common patterns include: '긍정기회놓치기' (missed positive opportunity), "
             "'명령과제시' (command without choice), '공감부족' (lack of empathy), "
             "'반영부족' (lack of reflection), '비판적반응' (critical response), etc. "
-            "Return ONLY a JSON array of objects with: {pattern_name, description, utterance_indices, severity}. "
+            "Return ONLY a JSON array of objects with: {{pattern_name, description, utterance_indices, severity}}. "
             "severity: 'low', 'medium', 'high'. No extra text."
         ),
     ),
@@ -34,81 +63,168 @@ _PATTERN_PROMPT = ChatPromptTemplate.from_messages([
 
 def detect_patterns_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """
-    ④ detect_patterns: 규칙/LLM로 패턴 찾기
-    utterances_labeled를 받아서 탐지된 패턴들 반환
+    ④ detect_patterns: 규칙 기반 패턴 찾기
+    라벨링된 발화(utterances_columns)를 받아서 규칙으로 탐지된 패턴들 반환
+    LLM 기반 추가 탐지는 enrich_patterns_node에서 분석 노드들과 병렬로 수행된다.
     """
-    utterances_labeled = state.get("utterances_labeled") or []
+    store = get_utterance_store(state)
     
-    if not utterances_labeled:
+    if not len(store):
         return {"patterns": []}
     
-    # 규칙 기반 패턴 탐지
-    patterns: List[Dict[str, Any]] = []
-    
-    # 패턴 1: 긍정기회놓치기 - 아이의 긍정적 행동에 칭찬 없음
-    for i, utt in enumerate(utterances_labeled):
-        if utt.get("speaker") == "Child" and utt.get("label") in ["BD"]:
-            # 다음 부모 발화가 칭찬이 아닌 경우
-            if i + 1 < len(utterances_labeled):
-                next_utt = utterances_labeled[i + 1]
-                if next_utt.get("speaker") == "Parent" and next_utt.get("label") != "PR":
-                    patterns.append({
-                        "pattern_name": "긍정기회놓치기",
-                        "description": f"Child's positive behavior at index {i} was not praised",
-                        "utterance_indices": [i, i + 1],
-                        "severity": "medium"
-                    })
+    # 규칙 기반 패턴 탐지 (pattern_rules.json의 선언적 규칙을 컬럼형 저장소에 적용)
+    patterns: List[Dict[str, Any]] = detect_rule_patterns_columnar(store)
+    return {"patterns": patterns}
+
+
+def _format_utterances(store) -> str:
+    return "\n".join(
+        f"{i}. [{store.speaker_at(i)}] [{store.label_at(i)}] {store.english_at(i)}"
+        for i in range(len(store))
+    )
+
+
+def _llm_patterns(utterances_str: str) -> List[Dict[str, Any]]:
+    """LLM 패턴 탐지 (실패하면 예외를 그대로 올린다)"""
+    llm = get_llm(mini=True)
+    res = (_PATTERN_PROMPT | llm).invoke({"utterances_labeled": utterances_str})
+    content = getattr(res, "content", "") or str(res)
     
-    # 패턴 2: 명령과제시 - 질문 없이 명령만
-    for i, utt in enumerate(utterances_labeled):
-        if utt.get("speaker") == "Parent" and utt.get("label") == "CMD":
-            patterns.append({
-                "pattern_name": "명령과제시",
-                "description": f"Command given without offering choice at index {i}",
-                "utterance_indices": [i],
-                "severity": "low"
-            })
+    # JSON 배열 파싱
+    json_match = re.search(r'\[[\s\S]*\]', content)
+    if json_match:
+        parsed = json.loads(json_match.group(0))
+        if isinstance(parsed, list):
+            return [p for p in parsed if isinstance(p, dict)]
+    return []
+
+
+def get_enrich_executor() -> ThreadPoolExecutor:
+    """LLM 패턴 탐지용 프로세스 전역 스레드 풀"""
+    global _EXECUTOR
+    with _JOBS_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(max_workers=max(1, ENRICH_WORKERS), thread_name_prefix="pattern-enrich")
+        return _EXECUTOR
+
+
+def _job_key(utterances_str: str) -> str:
+    raw = f"{os.getenv('MINI_MODEL_NAME', '')}\n{utterances_str}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def enrich_patterns_node(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    ④-2 enrich_patterns: LLM 기반 추가 패턴 탐지
+    LLM 호출은 백그라운드 스레드에서 실행하고 작업 키(patterns_llm_job)만 바로 반환한다.
+    같은 슈퍼스텝의 detect_patterns 다음 단계(분석 노드들)가 LLM 응답을 기다리지 않게 하기 위해서이며,
+    결과는 reconcile_patterns가 기다려 받는다. 같은 발화의 작업은 프로세스 안에서 재사용된다.
+    """
+    store = get_utterance_store(state)
     
-    # 패턴 3: 비판적반응 - 부모의 부정적 반응
-    for i, utt in enumerate(utterances_labeled):
-        if utt.get("speaker") == "Parent" and utt.get("label") == "NEG":
-            patterns.append({
-                "pattern_name": "비판적반응",
-                "description": f"Critical response at index {i}",
-                "utterance_indices": [i],
-                "severity": "high"
-            })
+    if not len(store) or not USE_LLM_PATTERNS:
+        return {"patterns_llm": [], "patterns_llm_job": None}
     
-    # LLM 기반 추가 패턴 탐지
+    utterances_str = _format_utterances(store)
+    key = _job_key(utterances_str)
+    with _JOBS_LOCK:
+        future = _JOBS.get(key)
+        if future is not None:
+            _JOBS.move_to_end(key)
+    if future is None:
+        # 트레이싱 span / 메트릭 node 라벨 / 경량 모델 강등 여부를 작업 스레드로 넘긴다
+        future = get_enrich_executor().submit(contextvars.copy_context().run, _llm_patterns, utterances_str)
+        with _JOBS_LOCK:
+            _JOBS[key] = future
+            while len(_JOBS) > _MAX_JOBS:
+                _JOBS.popitem(last=False)
+    return {"patterns_llm": [], "patterns_llm_job": key}
+
+
+def _collect_llm_patterns(state: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """enrich_patterns가 시작한 LLM 작업의 결과 (실패/시간 초과 시 빈 리스트)"""
+    key = state.get("patterns_llm_job")
+    if not key:
+        return state.get("patterns_llm") or []
+    with _JOBS_LOCK:
+        future = _JOBS.get(key)
     try:
-        llm = get_llm(mini=True)
-        
-        # 발화를 포맷팅
-        utterances_str = "\n".join([
-            f"{i}. [{utt.get('speaker')}] [{utt.get('label')}] {utt.get('text')}"
-            for i, utt in enumerate(utterances_labeled)
-        ])
-        
-        res = (_PATTERN_PROMPT | llm).invoke({"utterances_labeled": utterances_str})
-        content = getattr(res, "content", "") or str(res)
-        
-        # JSON 배열 파싱
-        json_match = re.search(r'\[[\s\S]*\]', content)
-        if json_match:
-            llm_patterns = json.loads(json_match.group(0))
-            if isinstance(llm_patterns, list):
-                patterns.extend(llm_patterns)
+        if future is None:
+            # 다른 프로세스에서 체크포인트로 재개한 경우 등: 작업이 없으므로 여기서 다시 실행
+            return _llm_patterns(_format_utterances(get_utterance_store(state)))
+        return future.result(timeout=ENRICH_TIMEOUT)
     except Exception as e:
-        print(f"LLM pattern detection error: {e}")
-    
-    # 중복 제거 (간단한 휴리스틱)
+        if isinstance(e, FutureTimeoutError):
+            record_fallback("pattern_llm_timeout", node="reconcile_patterns")
+        log.warning("LLM pattern detection error: %s", e)
+        # 실패한 작업은 재사용하지 않는다
+        with _JOBS_LOCK:
+            if future is not None and _JOBS.get(key) is future:
+                del _JOBS[key]
+        return []
+
+
+def enrich_patterns_fallback_node(state: Dict[str, Any]) -> Dict[str, Any]:
+    """SLO 강등 모드: LLM 패턴 탐지 생략 (규칙 패턴만 사용)"""
+    return {"patterns_llm": [], "patterns_llm_job": None}
+
+
+def _merge_patterns(rule_patterns: List[Dict[str, Any]], llm_patterns: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """규칙 패턴 뒤에 LLM 패턴을 붙이고 (패턴명, 발화 인덱스) 기준으로 중복 제거"""
     seen = set()
     unique_patterns = []
-    for p in patterns:
+    for p in list(rule_patterns) + list(llm_patterns):
         key = (p.get("pattern_name"), tuple(p.get("utterance_indices", [])))
         if key not in seen:
             seen.add(key)
             unique_patterns.append(p)
+    return unique_patterns
+
+
+def _is_material_change(rule_patterns: List[Dict[str, Any]], merged: List[Dict[str, Any]]) -> bool:
+    """
+    LLM이 규칙 파일에 정의된 이름의 패턴을 새로 찾았는지
+    분석 노드는 규칙이 아는 패턴 이름만 집계/판정에 쓰므로 (스타일 분류기의 비판 패턴, 챌린지 pattern 조건),
+    LLM이 자유롭게 붙인 이름의 패턴은 결과를 바꾸지 않는다.
+    """
+    known = {rule.name for rule in load_rules().rules}
+    rule_keys = {(p.get("pattern_name"), tuple(p.get("utterance_indices", []))) for p in rule_patterns}
+    return any(
+        p.get("pattern_name") in known
+        and (p.get("pattern_name"), tuple(p.get("utterance_indices", []))) not in rule_keys
+        for p in merged
+    )
+
+
+def reconcile_patterns_node(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    ④-3 reconcile_patterns: 규칙 패턴과 LLM 패턴 병합 (enrich_patterns의 백그라운드 작업을 여기서 기다린다)
+    분석 노드들은 규칙 패턴으로 먼저 실행되었으므로, LLM 패턴이 결과를 실질적으로 바꾸는 경우에만
+    pattern_enrichment.rerun_nodes에 패턴에 민감한 노드(PATTERN_SENSITIVE_NODES)를 적어
+    그래프가 병합된 패턴으로 다시 실행하게 한다 (rerun_requested 참고).
+    """
+    rule_patterns = state.get("patterns") or []
+    llm_patterns = _collect_llm_patterns(state)
+    merged = _merge_patterns(rule_patterns, llm_patterns)
+    rerun = list(PATTERN_SENSITIVE_NODES) if _is_material_change(rule_patterns, merged) else []
     
-    return {"patterns": unique_patterns}
+    return {
+        "patterns": merged,
+        "patterns_llm": llm_patterns,
+        "pattern_enrichment": {
+            "rule_patterns": len(rule_patterns),
+            "llm_patterns": len(llm_patterns),
+            "merged_patterns": len(merged),
+            "rerun_nodes": rerun,
+        },
+    }
+
+
+def rerun_requested(node: str) -> Callable[[Dict[str, Any]], bool]:
+    """reconcile_patterns가 node의 재실행을 요청했는지 판정하는 NodeSpec.when 조건"""
+
+    def _when(state: Dict[str, Any]) -> bool:
+        return node in ((state.get("pattern_enrichment") or {}).get("rerun_nodes") or [])
 
+    _when.__name__ = f"rerun_{node}"
+    return _when
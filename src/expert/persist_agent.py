@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Dict
+
+from src.utils.result_sink import get_result_sink, result_key
+from src.utils.utterance_store import get_labeled_utterances
+
+
+def persist_result_node(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    ⑪ persist_result: 최종 결과와 중간 산출물을 write-behind 큐에 넣는다
+    RESULT_SINK가 꺼져 있으면 아무것도 하지 않는다.
+    """
+    sink = get_result_sink()
+    if sink is None:
+        return {}
+
+    meta = state.get("meta") or {}
+    # utterances_ko는 transcript / message 입력에서 비어 있으므로 정규화된 발화로 키를 만든다
+    key = result_key(meta, state.get("utterances_normalized") or state.get("utterances_ko"))
+    queued = sink.submit({
+        "session_key": key,
+        "family_id": meta.get("family_id"),
+        "created_at": meta.get("created_at") or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "utterances_labeled": get_labeled_utterances(state),
+        "patterns": state.get("patterns"),
+        "result": state.get("result"),
+    })
+    return {"persistence": {"session_key": key, "queued": queued}}
@@ -1,12 +1,22 @@
 from __future__ import annotations
 
 import json
+import os
 import re
 from typing import Dict, Any, List
 
 from langchain_core.prompts import ChatPromptTemplate
 
 from src.utils.common import get_llm
+from src.utils.log import get_logger
+from src.utils.metrics import record_fallback
+from src.utils.style_classifier import STYLE_TYPES, classify_style, style_features
+from src.utils.utterance_store import get_utterance_store
+
+log = get_logger(__name__)
+
+# 확실한 세션도 항상 LLM 서술형 평가를 받을지 여부 (세션별로는 meta.style_narrative로 요청)
+STYLE_LLM_NARRATIVE = os.getenv("STYLE_LLM_NARRATIVE", "false").lower() == "true"
 
 
 _STYLE_PROMPT = ChatPromptTemplate.from_messages([
@@ -15,8 +25,8 @@ _STYLE_PROMPT = ChatPromptTemplate.from_messages([
         (
             "You are an expert analyzing parenting communication style. "
             "Analyze the parent's communication style and ratios based on labeled utterances and patterns. "
-            "Return ONLY a JSON object with: {style_type, label_distribution, positive_ratio, negative_ratio, "
-            "command_ratio, question_ratio, reflection_ratio, overall_assessment}. "
+            "Return ONLY a JSON object with: {{style_type, label_distribution, positive_ratio, negative_ratio, "
+            "command_ratio, question_ratio, reflection_ratio, overall_assessment}}. "
             "style_type: 'authoritative', 'authoritarian', 'permissive', 'uninvolved', 'mixed'. "
             "No extra text."
         ),
@@ -32,14 +42,36 @@ _STYLE_PROMPT = ChatPromptTemplate.from_messages([
 ])
 
 
+def _assessment_text(style_type: str, ratios: Dict[str, float]) -> str:
+    """분류기 판정 결과에 대한 템플릿 기반 평가 문장"""
+    return (
+        f"통계 기반 분석: {style_type} 스타일로 추정됩니다. "
+        f"(칭찬 {ratios['positive_ratio']:.0%}, 반영 {ratios['reflection_ratio']:.0%}, "
+        f"질문 {ratios['question_ratio']:.0%}, 명령 {ratios['command_ratio']:.0%}, "
+        f"부정 {ratios['negative_ratio']:.0%})"
+    )
+
+
 def analyze_style_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """
-    ⑦ analyze_style: 스타일/비율 분석 (LLM + 패턴/라벨)
+    ⑦ analyze_style: 스타일/비율 분석 (통계 분류기 + 필요 시 LLM)
+    라벨 분포와 패턴 수로 스타일을 먼저 분류하고, 판정이 모호하거나
+    meta.style_narrative로 서술형 평가를 요청한 경우에만 LLM을 호출한다.
     """
-    utterances_labeled = state.get("utterances_labeled") or []
+    return _analyze_style(state, allow_llm=True)
+
+
+def analyze_style_fallback_node(state: Dict[str, Any]) -> Dict[str, Any]:
+    """SLO 강등 모드: 모호한 세션도 LLM 없이 분류기 판정만 사용"""
+    return _analyze_style(state, allow_llm=False)
+
+
+def _analyze_style(state: Dict[str, Any], allow_llm: bool) -> Dict[str, Any]:
+    store = get_utterance_store(state)
     patterns = state.get("patterns") or []
+    meta = state.get("meta") or {}
     
-    if not utterances_labeled:
+    if not len(store):
         return {
             "style_analysis": {
                 "style_type": "unknown",
@@ -53,26 +85,36 @@ def analyze_style_node(state: Dict[str, Any]) -> Dict[str, Any]:
             }
         }
     
-    # 패턴/라벨 기반 통계 계산
-    parent_utterances = [utt for utt in utterances_labeled if utt.get("speaker") == "Parent"]
-    total_parent = len(parent_utterances)
+    # 패턴/라벨 기반 통계 계산 (컬럼형 저장소의 라벨 코드 배열에서 한 번에 집계)
+    label_counts = store.label_counts(speaker="Parent")
+    features = style_features(label_counts, len(store), patterns)
+    ratios = {
+        key: features[key]
+        for key in ["positive_ratio", "negative_ratio", "command_ratio", "question_ratio", "reflection_ratio"]
+    }
     
-    label_counts = {}
-    for utt in parent_utterances:
-        label = utt.get("label", "OTH")
-        label_counts[label] = label_counts.get(label, 0) + 1
+    prediction = classify_style(features)
+    stats = {
+        "label_distribution": label_counts,
+        **ratios,
+        "style_confidence": round(prediction.confidence, 4),
+    }
     
-    # 비율 계산
-    positive_ratio = (label_counts.get("PR", 0) / total_parent) if total_parent > 0 else 0.0
-    negative_ratio = (label_counts.get("NEG", 0) / total_parent) if total_parent > 0 else 0.0
-    command_ratio = (label_counts.get("CMD", 0) / total_parent) if total_parent > 0 else 0.0
-    question_ratio = (label_counts.get("Q", 0) / total_parent) if total_parent > 0 else 0.0
-    reflection_ratio = (label_counts.get("RD", 0) / total_parent) if total_parent > 0 else 0.0
+    narrative_requested = bool(meta.get("style_narrative")) or STYLE_LLM_NARRATIVE
+    if not allow_llm or (not prediction.ambiguous and not narrative_requested):
+        return {
+            "style_analysis": {
+                "style_type": prediction.style_type,
+                **stats,
+                "overall_assessment": _assessment_text(prediction.style_type, ratios),
+                "style_source": "classifier",
+            }
+        }
     
-    # LLM 기반 스타일 분석
+    # LLM 기반 스타일 분석 (모호한 세션의 판정 또는 서술형 평가)
     utterances_str = "\n".join([
         f"[{utt.get('speaker')}] [{utt.get('label')}] {utt.get('text')}"
-        for utt in utterances_labeled
+        for utt in store.as_dicts()
     ])
     patterns_str = "\n".join([
         f"- {p.get('pattern_name')}: {p.get('description')}"
@@ -92,36 +134,23 @@ def analyze_style_node(state: Dict[str, Any]) -> Dict[str, Any]:
         if json_match:
             style_analysis = json.loads(json_match.group(0))
             if isinstance(style_analysis, dict):
+                # 분류기 판정이 확실하면 분류기 스타일 유지, 모호하면 LLM 판정 사용
+                if not prediction.ambiguous or style_analysis.get("style_type") not in STYLE_TYPES:
+                    style_analysis["style_type"] = prediction.style_type
                 # 통계 데이터 병합
-                style_analysis["label_distribution"] = label_counts
-                style_analysis["positive_ratio"] = positive_ratio
-                style_analysis["negative_ratio"] = negative_ratio
-                style_analysis["command_ratio"] = command_ratio
-                style_analysis["question_ratio"] = question_ratio
-                style_analysis["reflection_ratio"] = reflection_ratio
+                style_analysis.update(stats)
+                style_analysis["style_source"] = "llm" if prediction.ambiguous else "classifier"
                 return {"style_analysis": style_analysis}
     except Exception as e:
-        print(f"Style analysis error: {e}")
-    
-    # 폴백: 통계 기반 스타일 추론
-    style_type = "mixed"
-    if command_ratio > 0.3 and negative_ratio > 0.2:
-        style_type = "authoritarian"
-    elif positive_ratio > 0.3 and reflection_ratio > 0.2:
-        style_type = "authoritative"
-    elif command_ratio < 0.1 and negative_ratio < 0.1:
-        style_type = "permissive"
+        log.warning("Style analysis error: %s", e)
     
+    # 폴백: 분류기 판정 사용 (LLM 호출/파싱 실패)
+    record_fallback("error")
     return {
         "style_analysis": {
-            "style_type": style_type,
-            "label_distribution": label_counts,
-            "positive_ratio": positive_ratio,
-            "negative_ratio": negative_ratio,
-            "command_ratio": command_ratio,
-            "question_ratio": question_ratio,
-            "reflection_ratio": reflection_ratio,
-            "overall_assessment": f"통계 기반 분석: {style_type} 스타일로 추정됩니다."
+            "style_type": prediction.style_type,
+            **stats,
+            "overall_assessment": _assessment_text(prediction.style_type, ratios),
+            "style_source": "classifier",
         }
     }
-
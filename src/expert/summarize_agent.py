@@ -5,6 +5,11 @@ from typing import Dict, Any
 from langchain_core.prompts import ChatPromptTemplate
 
 from src.utils.common import get_llm
+from src.utils.log import get_logger
+from src.utils.metrics import record_fallback
+from src.utils.utterance_store import get_labeled_utterances
+
+log = get_logger(__name__)
 
 
 _SUMMARIZE_PROMPT = ChatPromptTemplate.from_messages([
@@ -34,7 +39,7 @@ def summarize_node(state: Dict[str, Any]) -> Dict[str, Any]:
     ⑤ summarize: 오늘의 진단 (LLM)
     """
     utterances_ko = state.get("utterances_ko") or []
-    utterances_labeled = state.get("utterances_labeled") or []
+    utterances_labeled = get_labeled_utterances(state)
     patterns = state.get("patterns") or []
     
     if not utterances_ko and not utterances_labeled:
@@ -62,6 +67,7 @@ def summarize_node(state: Dict[str, Any]) -> Dict[str, Any]:
         summary = getattr(res, "content", "") or str(res)
         return {"summary": summary}
     except Exception as e:
-        print(f"Summarize error: {e}")
+        log.warning("Summarize error: %s", e)
+        record_fallback("error")
         return {"summary": "요약 생성 중 오류가 발생했습니다."}
 
@@ -1,15 +1,22 @@
 from __future__ import annotations
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
 from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
 
 from src.utils.common import get_structured_llm
+from src.utils.log import get_logger
+from src.utils.metrics import record_fallback
+from src.utils.tracing import current_span
+from src.utils.transcript import detect_language, needs_translation
+
+log = get_logger(__name__)
 
 
 class TranslationItem(BaseModel):
     """번역된 발화 항목"""
+    index: Optional[int] = Field(default=None, description="Line number of the source utterance (the number before the speaker)")
     speaker: str = Field(description="Speaker label: MOM (부모/엄마/아빠) or CHI (아이/자녀)")
     korean: str = Field(description="한국어 원문 발화")
     english: str = Field(description="영어 번역된 발화")
@@ -28,24 +35,68 @@ _TRANSLATE_PROMPT = ChatPromptTemplate.from_messages([
             "Translate Korean utterances to English while preserving the speaker labels and emotional tone. "
             "For each utterance, identify the speaker: use 'MOM' for parent/mother/father (부모/엄마/아빠/어머니/아버지) "
             "and 'CHI' for child (아이/자녀/아들/딸). "
-            "Return a structured response with speaker label, Korean original, and English translation for each utterance."
+            "Each line starts with its line number. Return exactly one item per line, with the same line number "
+            "in index, and do not merge, split, or skip lines. "
+            "Return a structured response with index, speaker label, Korean original, and English translation for each utterance."
         ),
     ),
     (
         "human",
         (
             "Korean utterances (one per line):\n{utterances_ko}\n\n"
-            "Translate each utterance and return structured data with speaker (MOM/CHI), Korean original, and English translation."
+            "Translate each utterance and return structured data with index, speaker (MOM/CHI), Korean original, and English translation."
         ),
     ),
 ])
 
 
+def _speaker_label(speaker: str) -> str:
+    return "Parent" if str(speaker).upper() == "MOM" else "Child"
+
+
+def _untranslated(utt: Dict[str, Any]) -> Dict[str, Any]:
+    """번역하지 않은 발화 (영어 발화, 또는 번역 실패 시 한국어 그대로)"""
+    text = utt.get('발화내용_ko', '')
+    entry = {
+        "speaker": _speaker_label(utt.get('speaker', 'MOM')),
+        "korean": text,
+        "english": text,
+        "text": text,
+        "original_ko": text
+    }
+    if utt.get("lang"):
+        entry["lang"] = utt["lang"]
+    return entry
+
+
+def _match_translations(translations: List[TranslationItem], count: int) -> Optional[Dict[int, TranslationItem]]:
+    """
+    보낸 발화 순서(0..count-1) → 번역 항목
+    개수가 같으면 순서대로, 다르면 LLM이 돌려준 줄 번호(index)로 맞춘다.
+    줄 번호가 없거나 범위를 벗어나거나 겹치면 어느 발화의 번역인지 알 수 없으므로 None.
+    """
+    if len(translations) == count:
+        return dict(enumerate(translations))
+    matched: Dict[int, TranslationItem] = {}
+    for item in translations:
+        if item.index is None or not 0 <= item.index < count or item.index in matched:
+            return None
+        matched[item.index] = item
+    return matched
+
+
+def translate_passthrough_node(state: Dict[str, Any]) -> Dict[str, Any]:
+    """번역 없이 원문을 그대로 utterances_en으로 (실시간 세션에서 번역이 실패했을 때)"""
+    return {"utterances_en": [_untranslated(utt) for utt in state.get("utterances_normalized") or []]}
+
+
 def translate_ko_to_en_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     ② translate_ko_to_en: 한국어 → 영어 번역
     utterances_normalized를 받아서 영어로 번역한 utterances_en 반환
-    utterances_normalized 형식: [{speaker: "MOM"|"CHI", 발화내용_ko: str}, ...]
+    utterances_normalized 형식: [{speaker: "MOM"|"CHI", 발화내용_ko: str, lang?}, ...]
+    preprocess가 태깅한 lang이 ko/mixed인 발화만 LLM으로 번역하고, 영어 발화는 그대로 넘긴다
+    (한국어 발화가 없는 세션은 LLM을 호출하지 않는다).
     """
     utterances_normalized = state.get("utterances_normalized") or []
     
@@ -53,15 +104,24 @@ def translate_ko_to_en_node(state: Dict[str, Any]) -> Dict[str, Any]:
         return {"utterances_en": []}
     
     # 구조화된 형식인지 확인 (딕셔너리 리스트)
-    if utterances_normalized and isinstance(utterances_normalized[0], dict):
-        # 새로운 형식: 딕셔너리 리스트
+    is_structured = isinstance(utterances_normalized[0], dict)
+    if is_structured:
+        # 새로운 형식: 딕셔너리 리스트 (lang이 없는 발화는 번역 대상)
+        pending = [
+            idx for idx, utt in enumerate(utterances_normalized)
+            if needs_translation(utt.get("lang") or detect_language(utt.get('발화내용_ko', '')))
+        ]
+        current_span().set(translated=len(pending), passthrough=len(utterances_normalized) - len(pending))
+        if not pending:
+            return {"utterances_en": [_untranslated(utt) for utt in utterances_normalized]}
         utterances_text = "\n".join([
-            f"{utt.get('speaker', 'MOM')}: {utt.get('발화내용_ko', '')}"
-            for utt in utterances_normalized
+            f"{n}. {utterances_normalized[idx].get('speaker', 'MOM')}: {utterances_normalized[idx].get('발화내용_ko', '')}"
+            for n, idx in enumerate(pending)
         ])
     else:
         # 기존 형식: 문자열 리스트 (하위 호환성)
-        utterances_text = "\n".join(utterances_normalized)
+        pending = list(range(len(utterances_normalized)))
+        utterances_text = "\n".join(f"{n}. {line}" for n, line in enumerate(utterances_normalized))
     
     # Structured LLM로 번역
     structured_llm = get_structured_llm(TranslationResponse, mini=True)
@@ -73,59 +133,57 @@ def translate_ko_to_en_node(state: Dict[str, Any]) -> Dict[str, Any]:
         if isinstance(res, TranslationResponse):
             translations = res.translations
             
-            # 구조화된 형식으로 반환: 한국어 원문 보존
+            if is_structured:
+                # 전처리에서 파싱한 스피커를 그대로 쓴다 (LLM이 다시 판단한 스피커는 쓰지 않음)
+                utterances_en = [_untranslated(utt) for utt in utterances_normalized]
+                matched = _match_translations(translations, len(pending))
+                if len(translations) != len(pending):
+                    log.warning("Translation count mismatch: %d sent, %d returned (%s)", len(pending), len(translations),
+                                "matched by index" if matched is not None else "passthrough")
+                if matched is None:
+                    # 위치를 맞출 수 없으면 엉뚱한 발화에 번역을 붙이지 않고 이 배치는 원문 유지
+                    record_fallback("translation_mismatch")
+                    return {"utterances_en": utterances_en}
+                for n, item in matched.items():
+                    entry = utterances_en[pending[n]]
+                    # 구조화된 형식: 한국어 원문과 영어 번역 모두 포함
+                    entry.update({
+                        "korean": item.korean,
+                        "english": item.english,
+                        "text": item.english,  # 하위 호환성을 위한 필드
+                        "original_ko": item.korean  # 한국어 원문 명시적 보존
+                    })
+                return {"utterances_en": utterances_en}
+            
+            # 기존 문자열 형식은 LLM 결과를 그대로 쓴다
             utterances_en = []
             for item in translations:
-                # speaker label을 Parent/Child로 변환
-                speaker_label = "Parent" if item.speaker.upper() == "MOM" else "Child"
-                # 구조화된 형식: 한국어 원문과 영어 번역 모두 포함
                 utterances_en.append({
-                    "speaker": speaker_label,
+                    "speaker": _speaker_label(item.speaker),
                     "korean": item.korean,
                     "english": item.english,
-                    "text": item.english,  # 하위 호환성을 위한 필드
-                    "original_ko": item.korean  # 한국어 원문 명시적 보존
+                    "text": item.english,
+                    "original_ko": item.korean
                 })
             
             return {"utterances_en": utterances_en}
         
         # 폴백: 예상치 못한 형식
+        record_fallback("unexpected_response")
         # 구조화된 형식이면 발화내용_ko를 보존하여 반환
-        if utterances_normalized and isinstance(utterances_normalized[0], dict):
-            utterances_en = []
-            for utt in utterances_normalized:
-                speaker = utt.get('speaker', 'MOM')
-                korean = utt.get('발화내용_ko', '')
-                speaker_label = "Parent" if speaker.upper() == "MOM" else "Child"
-                utterances_en.append({
-                    "speaker": speaker_label,
-                    "korean": korean,
-                    "english": korean,  # 번역 실패 시 한국어 그대로
-                    "text": korean,
-                    "original_ko": korean
-                })
+        if is_structured:
+            utterances_en = [_untranslated(utt) for utt in utterances_normalized]
         else:
             # 기존 문자열 형식 (하위 호환성)
             utterances_en = utterances_normalized
         return {"utterances_en": utterances_en}
         
     except Exception as e:
-        print(f"Translation error: {e}")
+        log.warning("Translation error: %s", e)
+        record_fallback("error")
         # 에러 시 원문 반환 (한국어 보존)
-        if utterances_normalized and isinstance(utterances_normalized[0], dict):
-            utterances_en = []
-            for utt in utterances_normalized:
-                speaker = utt.get('speaker', 'MOM')
-                korean = utt.get('발화내용_ko', '')
-                speaker_label = "Parent" if speaker.upper() == "MOM" else "Child"
-                utterances_en.append({
-                    "speaker": speaker_label,
-                    "korean": korean,
-                    "english": korean,  # 번역 실패 시 한국어 그대로
-                    "text": korean,
-                    "original_ko": korean
-                })
+        if is_structured:
+            utterances_en = [_untranslated(utt) for utt in utterances_normalized]
         else:
             utterances_en = utterances_normalized
         return {"utterances_en": utterances_en}
-
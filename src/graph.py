@@ -1,19 +1,125 @@
 from __future__ import annotations
 
+import json
+import os
+import uuid
+from functools import lru_cache
+from pathlib import Path
 from dotenv import load_dotenv
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, Optional
 
-from src.router.router import build_question_router
 from src.vs.ddl import get_tdl
 
-# Exported graph object for LangGraph Dev UI
-graph = build_question_router()
+_CONFIG_PATH = Path(__file__).resolve().parent.parent / "langgraph.json"
 
 
-def run(message: str) -> Dict[str, Any]:
+@lru_cache(maxsize=1)
+def _load_checkpointer():
+    """
+    langgraph.json의 checkpoints.default 설정으로 체크포인터 생성
+    type이 sqlite면 SQLite 체크포인터, memory면 None (LangGraph 서버 기본 체크포인터 사용)
+    CHECKPOINT_TYPE / CHECKPOINT_PATH 환경변수가 설정 파일보다 우선한다.
+    """
+    config: Dict[str, Any] = {}
+    if _CONFIG_PATH.exists():
+        with open(_CONFIG_PATH, "r", encoding="utf-8") as f:
+            config = (json.load(f).get("checkpoints") or {}).get("default") or {}
+    checkpoint_type = os.getenv("CHECKPOINT_TYPE", config.get("type", "memory"))
+    if checkpoint_type != "sqlite":
+        return None
+
+    from src.router.checkpoint import get_checkpointer
+
+    # 시작할 때 한 번, 이후에는 체크포인트를 쓰는 중에 CHECKPOINT_GC_INTERVAL초마다 오래된 스레드 정리
+    max_age_hours = float(os.getenv("CHECKPOINT_GC_HOURS", config.get("gc_max_age_hours", 0)))
+    checkpointer = get_checkpointer(os.getenv("CHECKPOINT_PATH", config.get("path")), gc_max_age=max_age_hours * 3600)
+    if max_age_hours > 0:
+        removed = checkpointer.gc(max_age_hours * 3600)
+        if removed:
+            from src.utils.log import get_logger
+
+            get_logger(__name__).info("Checkpoint GC: removed %d threads", removed)
+    return checkpointer
+
+
+@lru_cache(maxsize=1)
+def _load_memo_cache():
+    """NODE_MEMO=true면 노드 메모이제이션 캐시 사용"""
+    from src.router.memo import get_memo_cache, memo_enabled
+
+    return get_memo_cache() if memo_enabled() else None
+
+
+@lru_cache(maxsize=1)
+def _load_slo_policy():
+    """SLO_TARGET_MS가 설정되면 지연 SLO 강등 모드 사용"""
+    from src.router.slo import get_slo_policy, slo_enabled
+
+    return get_slo_policy() if slo_enabled() else None
+
+
+def get_graph(outputs: Optional[Iterable[str]] = None):
+    """
+    컴파일된 그래프 (요청 섹션 조합별로 캐시)
+    라우터와 에이전트 모듈은 처음 호출할 때 임포트한다.
+    """
+    from src.router.router import get_question_router
+
+    return get_question_router(
+        outputs,
+        checkpointer=_load_checkpointer(),
+        memo_cache=_load_memo_cache(),
+        slo_policy=_load_slo_policy(),
+    )
+
+
+def reset_graph_cache() -> None:
+    """컴파일된 그래프와 체크포인터/메모/SLO 설정 캐시 초기화 (서버 reload 시 환경변수를 다시 반영)"""
+    from src.router.router import _cached_router
+
+    _cached_router.cache_clear()
+    for loader in (_load_checkpointer, _load_memo_cache, _load_slo_policy):
+        loader.cache_clear()
+
+
+def __getattr__(name: str) -> Any:
+    # Exported graph object for LangGraph Dev UI (src.graph:graph)
+    # 모듈 임포트만으로는 그래프를 만들지 않고, graph 속성에 처음 접근할 때 만든다
+    if name == "graph":
+        return get_graph()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def run(
+    message: str,
+    thread_id: Optional[str] = None,
+    outputs: Optional[Iterable[str]] = None,
+    profile: bool = False,
+) -> Dict[str, Any]:
+    """
+    outputs를 지정하면 해당 결과 섹션에 필요한 노드만 실행한다 (예: ["challenge_eval"])
+    profile=True면 노드별 CPU/메모리 프로파일을 result.meta.profile에 담는다 (src.router.profiling)
+    """
+    from src.router.states import new_run_input
+
     load_dotenv()
-    state = {"message": message, "tdl": get_tdl()}
-    result = graph.invoke(state)
+    state: Dict[str, Any] = {"message": message, "tdl": get_tdl()}
+    if profile:
+        state["meta"] = {"profile": True}
+    if outputs:
+        state["requested_outputs"] = list(outputs)
+    app = get_graph(outputs)
+    # 체크포인터가 있으면 thread_id로 진행 상태가 저장된다 (src.router.checkpoint.resume_thread로 재개)
+    # 같은 thread_id로 새 입력을 넣으면 이전 실행의 채널 값은 지우고 새로 시작한다
+    state = new_run_input(state)
+    thread_id = thread_id or str(uuid.uuid4())
+    config = {"configurable": {"thread_id": thread_id}}
+    from src.utils.tracing import span
+
+    from src.utils.metrics import track_session
+
+    with span("session", thread_id=thread_id), track_session():
+        result = app.invoke(state, config)
     return result
 
 
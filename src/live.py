@@ -0,0 +1,421 @@
+"""
+실시간(live) 세션: 대화 중에 발화를 하나씩 받아 증분 분석
+
+    from src.live import LiveSession
+    session = LiveSession(meta={...}, on_analysis=print)
+    update = session.append("엄마: 이제 정리하자")   # 새 발화만 전처리 → 번역 → 라벨링
+    update["style"], update["patterns"]              # 누적 스타일 비율, 이번 발화로 완성된 규칙 패턴
+    session.snapshot()                               # 현재 상태 + 마지막 LLM 분석 결과
+    session.close()
+
+    python -m src.live < dialogue.txt                # 한 줄에 한 발화, 업데이트를 JSONL로 출력
+
+발화마다 하는 일 (LIVE_UTTERANCE_TARGET_MS 안에 끝나도록):
+- 전처리: 스피커 태그 파싱 + 언어 태깅 (직전 스피커로 교대 추정)
+- 번역: 한글이 섞인 발화만 LLM 번역 (영어 발화는 그대로)
+- 라벨링: ELECTRA / LLM. 이 세션의 최근 라벨링 p95가 남은 예산보다 크면 키워드 휴리스틱으로 대체한다
+  (샘플은 LIVE_LATENCY_MAX_AGE초 뒤 만료, LIVE_PROBE_RATE 비율로는 강등 대신 전체 모드로 재측정)
+- 규칙 패턴: PatternScanner에 발화 하나만 넣어 새로 완성된 패턴을 받는다
+- 스타일: 부모 라벨 수 / 패턴 수를 누적해 분류기 특징값을 다시 계산 (O(라벨 종류))
+
+LLM 분석(LIVE_ANALYSES: summary, key_moments, coaching_plan)은 LIVE_ANALYSIS_EVERY 발화마다, 또는
+심각도가 LIVE_ANALYSIS_SEVERITIES인 패턴이 나왔을 때 최근 윈도우에 대해 백그라운드 스레드에서 실행하고
+on_analysis 콜백으로 알린다 (세션당 한 번에 하나, LIVE_ANALYSIS_MIN_INTERVAL초 간격). 분석 중에 온 트리거는
+버리지 않고 지금 분석이 끝난 뒤 그 시점의 윈도우로 한 번 더 실행한다 (여러 번 밀려도 한 번으로 합친다).
+
+메모리 상한: 분석 컨텍스트는 최근 LIVE_WINDOW 발화(텍스트 합계 LIVE_MAX_BYTES 이하)만 보관하고,
+스타일/패턴은 누적 카운터, 최근 패턴은 LIVE_MAX_PATTERNS개, LLM 분석은 종류별 마지막 결과 하나만 보관한다.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, Union
+
+from src.expert.label_agent import label_utterances_fallback_node, label_utterances_node
+from src.expert.translate_agent import translate_ko_to_en_node, translate_passthrough_node
+from src.router.slo import MODE_FALLBACK, MODE_FULL, LatencyTracker
+from src.utils.log import get_logger
+from src.utils.metrics import FALLBACKS, LIVE_SESSIONS, LIVE_UTTERANCE_DURATION, NODE_DURATION, NODE_ERRORS, node_context
+from src.utils.pattern_rules import PatternScanner, load_rules
+from src.utils.style_classifier import classify_style, style_features
+from src.utils.tracing import span
+from src.utils.transcript import get_speaker_lexer, normalize_segment, plain_segment
+from src.utils.utterance_store import UtteranceStore
+
+log = get_logger(__name__)
+
+TARGET_MS = float(os.getenv("LIVE_UTTERANCE_TARGET_MS", "1500"))
+WINDOW = int(os.getenv("LIVE_WINDOW", "200"))
+MAX_BYTES = int(os.getenv("LIVE_MAX_BYTES", str(256 * 1024)))
+MAX_PATTERNS = int(os.getenv("LIVE_MAX_PATTERNS", "100"))
+ANALYSES = [name.strip() for name in os.getenv("LIVE_ANALYSES", "key_moments").split(",") if name.strip()]
+ANALYSIS_EVERY = int(os.getenv("LIVE_ANALYSIS_EVERY", "20"))
+ANALYSIS_SEVERITIES = frozenset(
+    s.strip() for s in os.getenv("LIVE_ANALYSIS_SEVERITIES", "high").split(",") if s.strip()
+)
+ANALYSIS_MIN_INTERVAL = float(os.getenv("LIVE_ANALYSIS_MIN_INTERVAL", "30"))
+ANALYSIS_WORKERS = int(os.getenv("LIVE_ANALYSIS_WORKERS", "2"))
+LATENCY_MAX_AGE = float(os.getenv("LIVE_LATENCY_MAX_AGE", "120"))
+PROBE_RATE = float(os.getenv("LIVE_PROBE_RATE", "0.05"))
+
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def _analysis_nodes() -> Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]]:
+    # 분석 에이전트는 처음 분석할 때 임포트한다 (결과 키 = 분석 이름)
+    from src.expert.coaching_agent import coaching_plan_node
+    from src.expert.key_moments_agent import key_moments_node
+    from src.expert.summarize_agent import summarize_node
+
+    return {"summary": summarize_node, "key_moments": key_moments_node, "coaching_plan": coaching_plan_node}
+
+
+def get_analysis_executor() -> ThreadPoolExecutor:
+    """실시간 세션 LLM 분석용 프로세스 전역 스레드 풀"""
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(max_workers=max(1, ANALYSIS_WORKERS), thread_name_prefix="live-analysis")
+        return _EXECUTOR
+
+
+def _text_bytes(utt: Dict[str, Any]) -> int:
+    return len(str(utt.get("original_ko") or "").encode("utf-8")) + len(str(utt.get("english") or "").encode("utf-8"))
+
+
+class LiveSession:
+    """
+    Args:
+        session_id: 세션 식별자 (없으면 생성)
+        meta / challenge_spec: 분석 노드에 넘기는 입력 (그래프 입력과 같은 형식)
+        on_analysis: LLM 분석이 끝날 때 분석 스레드에서 호출되는 콜백 ({type: "analysis", name, ...})
+        target_ms: 발화 하나의 목표 처리 시간 (0이면 라벨링을 강등하지 않음)
+        window / max_bytes: 분석 컨텍스트로 보관할 최근 발화 수 / 텍스트 바이트 상한
+        analyses / analysis_every: 실행할 LLM 분석 (순서대로, 앞 결과를 뒤 분석이 입력으로 씀) / 주기 (0이면 주기 실행 안 함)
+    """
+
+    def __init__(
+        self,
+        session_id: Optional[str] = None,
+        meta: Optional[Dict[str, Any]] = None,
+        challenge_spec: Optional[Dict[str, Any]] = None,
+        on_analysis: Optional[Callable[[Dict[str, Any]], None]] = None,
+        target_ms: float = TARGET_MS,
+        window: int = WINDOW,
+        max_bytes: int = MAX_BYTES,
+        analyses: Optional[List[str]] = None,
+        analysis_every: int = ANALYSIS_EVERY,
+    ):
+        self.session_id = session_id or uuid.uuid4().hex
+        self.meta = dict(meta or {})
+        self.challenge_spec = challenge_spec
+        self.on_analysis = on_analysis
+        self.target_ms = target_ms
+        self.window_size = max(1, window)
+        self.max_bytes = max_bytes
+        self.analyses = list(ANALYSES if analyses is None else analyses)
+        unknown = set(self.analyses) - set(_analysis_nodes())
+        if unknown:
+            raise ValueError(f"알 수 없는 실시간 분석입니다: {sorted(unknown)} (가능: {sorted(_analysis_nodes())})")
+        self.analysis_every = analysis_every
+
+        self._lexer = get_speaker_lexer()
+        self._scanner = PatternScanner(load_rules(), keep_results=False)
+        self._lock = threading.Lock()
+        # 분석 결과는 별도 락으로 기록한다 (발화 처리 중에도 분석 결과를 바로 알릴 수 있도록)
+        self._results_lock = threading.Lock()
+        self._last_speaker: Optional[str] = None
+        self.count = 0  # 지금까지 받은 발화 수 (= 다음 발화 인덱스)
+        self._window: Deque[Dict[str, Any]] = deque()
+        self._window_bytes = 0
+        self._parent_labels: Counter = Counter()
+        self._pattern_counts: Counter = Counter()
+        self._recent_patterns: Deque[Dict[str, Any]] = deque(maxlen=MAX_PATTERNS)
+        self.results: Dict[str, Dict[str, Any]] = {}  # 분석 이름 → 마지막 결과
+        # 발화 처리 단계의 지연 기록 (세션별 - 느린 세션 하나가 다른 세션의 라벨링을 강등하지 않도록)
+        self._latency = LatencyTracker(window=50, min_samples=5, max_age=LATENCY_MAX_AGE, probe_rate=PROBE_RATE)
+        self._analysis: Optional[Future] = None
+        self._analysis_running = False  # 분석 스레드가 끝낼 때 _lock 안에서 내린다 (밀린 트리거를 놓치지 않도록)
+        self._analysis_pending: Optional[str] = None  # 분석 중에 온 트리거
+        self._last_analysis_at = 0.0
+        self._closed = False
+        LIVE_SESSIONS.inc()
+
+    # ------------------------------------------------------------------ #
+    # 발화 추가
+    # ------------------------------------------------------------------ #
+    def append(self, item: Union[str, Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        발화 하나 추가 (문자열 또는 세그먼트 {text, speaker?, start?, end?})
+
+        Returns:
+            {index, utterance, patterns, style, latency_ms, over_target, label_mode, analysis} - 빈 발화면 None
+        """
+        segment = item if isinstance(item, dict) else plain_segment(str(item))
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("닫힌 실시간 세션입니다.")
+            start = time.perf_counter()
+            with span("live.utterance", session=self.session_id, index=self.count) as s:
+                normalized = normalize_segment(segment, self._last_speaker, self._lexer)
+                if normalized is None:
+                    return None
+                self._last_speaker = normalized["speaker"]
+
+                translated, _ = self._step("translate", translate_ko_to_en_node, translate_passthrough_node,
+                                           {"utterances_normalized": [normalized]})
+                labeled, label_mode = self._step("label", label_utterances_node, label_utterances_fallback_node,
+                                                 {"utterances_en": translated["utterances_en"]},
+                                                 self._label_mode(start))
+                utterance = {**UtteranceStore.from_state(labeled["utterances_columns"])[0], "lang": normalized["lang"]}
+                for key in ("start", "end"):
+                    if key in normalized:
+                        utterance[key] = normalized[key]
+
+                index = self.count
+                self.count += 1
+                patterns = self._scanner.feed(utterance.get("speaker"), utterance.get("label"))
+                self._remember(utterance, patterns)
+                analysis = self._maybe_analyze(patterns)
+
+                latency_ms = (time.perf_counter() - start) * 1000
+                over_target = self.target_ms > 0 and latency_ms > self.target_ms
+                s.set(label_mode=label_mode, over_target=over_target, patterns=len(patterns))
+            LIVE_UTTERANCE_DURATION.observe(latency_ms / 1000)
+            return {
+                "index": index,
+                "utterance": utterance,
+                "patterns": patterns,
+                "style": self._style(),
+                "latency_ms": round(latency_ms, 1),
+                "over_target": over_target,
+                "label_mode": label_mode,
+                "analysis": analysis,
+            }
+
+    def _step(self, name: str, func, fallback, state: Dict[str, Any], mode: str = MODE_FULL) -> Tuple[Dict[str, Any], str]:
+        """
+        노드 하나 실행 (mode가 fallback이거나 func가 실패하면 fallback 실행 - 발화 하나 때문에 세션을 끊지 않는다)
+
+        Returns:
+            (노드 출력, 실제 실행 모드)
+        """
+        node = f"live.{name}"
+        start = time.perf_counter()
+        try:
+            with span(f"node.{node}", mode=mode), node_context(node):
+                if mode == MODE_FALLBACK:
+                    return fallback(state) or {}, mode
+                try:
+                    return func(state) or {}, mode
+                except Exception as e:
+                    NODE_ERRORS.inc(node=node)
+                    log.warning("Live %s error, using fallback: %s", name, e)
+                    FALLBACKS.inc(node=node, kind="error")
+                    mode = MODE_FALLBACK
+                    return fallback(state) or {}, mode
+        finally:
+            elapsed = time.perf_counter() - start
+            NODE_DURATION.observe(elapsed, node=node)
+            self._latency.observe(name, mode, elapsed * 1000)
+
+    def _label_mode(self, start: float) -> str:
+        """번역까지 쓴 시간 + 최근 라벨링 p95가 목표를 넘으면 키워드 라벨링 (가끔은 전체 모드로 p95 재측정)"""
+        if self.target_ms <= 0:
+            return MODE_FULL
+        expected = self._latency.p95("label", MODE_FULL)
+        remaining = self.target_ms - (time.perf_counter() - start) * 1000
+        if expected is not None and expected > remaining and not self._latency.probe():
+            FALLBACKS.inc(node="live.label", kind="latency_budget")
+            return MODE_FALLBACK
+        return MODE_FULL
+
+    def _remember(self, utterance: Dict[str, Any], patterns: List[Dict[str, Any]]) -> None:
+        if utterance.get("speaker") == "Parent":
+            self._parent_labels[utterance.get("label") or "OTH"] += 1
+        for pattern in patterns:
+            self._pattern_counts[pattern["pattern_name"]] += 1
+            self._recent_patterns.append(pattern)
+
+        self._window.append(utterance)
+        self._window_bytes += _text_bytes(utterance)
+        while len(self._window) > 1 and (
+            len(self._window) > self.window_size or self._window_bytes > self.max_bytes
+        ):
+            self._window_bytes -= _text_bytes(self._window.popleft())
+
+    def _style(self) -> Dict[str, Any]:
+        """누적 카운터로 계산한 스타일 (analyze_style의 분류기 판정과 같은 특징값)"""
+        label_counts = dict(self._parent_labels)
+        features = style_features(label_counts, self.count, pattern_counts=self._pattern_counts)
+        prediction = classify_style(features)
+        return {
+            "style_type": prediction.style_type,
+            "label_distribution": label_counts,
+            **{key: round(features[key], 4) for key in
+               ("positive_ratio", "negative_ratio", "command_ratio", "question_ratio", "reflection_ratio")},
+            "style_confidence": round(prediction.confidence, 4),
+            "ambiguous": prediction.ambiguous,
+        }
+
+    # ------------------------------------------------------------------ #
+    # LLM 분석 (주기 / 이벤트)
+    # ------------------------------------------------------------------ #
+    def _trigger(self, patterns: List[Dict[str, Any]]) -> Optional[str]:
+        if not self.analyses:
+            return None
+        trigger = None
+        if self.analysis_every > 0 and self.count % self.analysis_every == 0:
+            trigger = "cadence"
+        elif any(p.get("severity") in ANALYSIS_SEVERITIES for p in patterns) and \
+                time.monotonic() - self._last_analysis_at >= ANALYSIS_MIN_INTERVAL:
+            trigger = "pattern"
+        if trigger is not None and self._analysis_running:
+            # 실행 중인 분석이 끝나면 한 번 더 (_run_analyses)
+            self._analysis_pending = self._analysis_pending or trigger
+            return None
+        return trigger
+
+    def _maybe_analyze(self, patterns: List[Dict[str, Any]]) -> Optional[str]:
+        """분석을 시작했으면 트리거 이름 (cadence | pattern)"""
+        trigger = self._trigger(patterns)
+        if trigger is None:
+            return None
+        self._last_analysis_at = time.monotonic()
+        self._analysis_running = True
+        self._analysis = get_analysis_executor().submit(self._run_analyses, self._analysis_state(), trigger, self.count)
+        return trigger
+
+    def _run_analyses(self, state: Dict[str, Any], trigger: str, at: int) -> None:
+        """분석 실행, 그동안 밀린 트리거가 있으면 그 시점의 윈도우로 다시 실행"""
+        try:
+            while True:
+                self._analyze(state, trigger, at)
+                with self._lock:
+                    if self._closed or self._analysis_pending is None:
+                        self._analysis_running = False
+                        return
+                    trigger, self._analysis_pending = self._analysis_pending, None
+                    self._last_analysis_at = time.monotonic()
+                    state, at = self._analysis_state(), self.count
+        except BaseException:
+            with self._lock:
+                self._analysis_running = False
+                self._analysis_pending = None
+            raise
+
+    def _analysis_state(self) -> Dict[str, Any]:
+        """최근 윈도우를 그래프 상태 형식으로 (패턴 인덱스는 윈도우 기준으로 옮긴다)"""
+        utterances = list(self._window)
+        offset = self.count - len(utterances)
+        patterns = []
+        for pattern in self._recent_patterns:
+            indices = pattern.get("utterance_indices") or []
+            if indices and indices[0] >= offset:
+                patterns.append({**pattern, "utterance_indices": [i - offset for i in indices]})
+        return {
+            "utterances_columns": UtteranceStore.from_utterances(utterances).to_state(),
+            "patterns": patterns,
+            "style_analysis": self._style(),
+            "challenge_spec": self.challenge_spec,
+            "meta": self.meta,
+            "offset": offset,
+        }
+
+    def _analyze(self, state: Dict[str, Any], trigger: str, at: int) -> None:
+        nodes = _analysis_nodes()
+        for name in self.analyses:
+            if self._closed:
+                return
+            start = time.perf_counter()
+            try:
+                with span("live.analysis", session=self.session_id, analysis=name, trigger=trigger), \
+                        node_context(f"live.{name}"):
+                    state.update(nodes[name](state) or {})
+            except Exception as e:
+                NODE_ERRORS.inc(node=f"live.{name}")
+                log.warning("Live analysis error (%s): %s", name, e)
+                return
+            finally:
+                NODE_DURATION.observe(time.perf_counter() - start, node=f"live.{name}")
+            event = {
+                "type": "analysis",
+                "name": name,
+                "trigger": trigger,
+                "at": at,  # 분석 시점까지 받은 발화 수
+                "offset": state["offset"],  # 결과의 utterance_indices + offset = 세션 발화 인덱스
+                name: state.get(name),
+            }
+            with self._results_lock:
+                if self._closed:
+                    return
+                self.results[name] = event
+            if self.on_analysis is not None:
+                try:
+                    self.on_analysis(event)
+                except Exception as e:
+                    log.warning("Live analysis callback error: %s", e)
+
+    # ------------------------------------------------------------------ #
+    # 조회 / 종료
+    # ------------------------------------------------------------------ #
+    def _results(self) -> Dict[str, Dict[str, Any]]:
+        with self._results_lock:
+            return dict(self.results)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """현재 누적 상태 (스타일, 패턴 수, 최근 패턴, 종류별 마지막 분석 결과)"""
+        with self._lock:
+            return {
+                "session_id": self.session_id,
+                "utterances": self.count,
+                "window": {"utterances": len(self._window), "bytes": self._window_bytes},
+                "style": self._style(),
+                "pattern_counts": dict(self._pattern_counts),
+                "recent_patterns": list(self._recent_patterns),
+                "analyses": self._results(),
+                "analysis_running": self._analysis_running,
+                "analysis_pending": self._analysis_pending,
+            }
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """실행 중인 LLM 분석이 끝날 때까지 대기"""
+        analysis = self._analysis
+        if analysis is not None and not analysis.cancelled():
+            analysis.result(timeout)
+
+    def close(self) -> Dict[str, Any]:
+        """세션 종료 (대기 중인 분석은 취소, 실행 중인 분석의 결과는 버린다). 마지막 스냅샷 반환"""
+        final = self.snapshot()
+        with self._lock, self._results_lock:
+            if self._closed:
+                return final
+            self._closed = True
+            self._analysis_pending = None
+            if self._analysis is not None:
+                self._analysis.cancel()
+        LIVE_SESSIONS.dec()
+        return final
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    session = LiveSession(on_analysis=lambda event: print(json.dumps(event, ensure_ascii=False, default=str), flush=True))
+    for line in sys.stdin:
+        update = session.append(line)
+        if update is not None:
+            print(json.dumps(update, ensure_ascii=False), flush=True)
+    session.wait()
+    print(json.dumps(session.close(), ensure_ascii=False, default=str))
@@ -0,0 +1,458 @@
+"""
+SQLite 체크포인터
+
+인메모리 체크포인터는 워커가 재시작되거나 aggregate_result 같은 후반 노드가 실패하면
+이미 비용을 들인 번역/라벨링 결과를 잃는다. 이 체크포인터는 스레드별 진행 상태를 SQLite 파일에 남긴다.
+
+- 체크포인트마다 전체 상태를 저장하지 않고, 그 스텝에서 버전이 바뀐 채널 값만 (채널, 버전) 단위로 저장한다.
+  체크포인트 행에는 채널 버전만 있고, 읽을 때 버전별 값을 모아 상태를 복원한다.
+- 노드가 실패해도 같은 스텝에서 끝난 노드의 출력은 pending writes로 남아 있으므로
+  resume_thread()로 같은 thread_id를 다시 실행하면 실패한 노드부터 이어서 실행된다.
+- gc()로 마지막 체크포인트가 오래된 스레드를 삭제한다. gc_max_age를 주면 put() 중에 gc_interval초마다
+  자동으로 실행한다 (시작할 때만 정리하면 오래 떠 있는 서버 워커에서는 파일이 계속 커진다).
+
+값은 result_codec으로 인코딩하고, JSON으로 표현할 수 없는 값만 LangGraph 기본 직렬화기를 쓴다.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from src.utils.log import get_logger
+from src.utils.result_codec import UnknownDictionaryError, get_codec
+
+log = get_logger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata TEXT,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS channel_blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    type TEXT NOT NULL,
+    blob BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    blob BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE INDEX IF NOT EXISTS idx_checkpoints_created ON checkpoints (created_at);
+"""
+
+DEFAULT_CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", "./data/checkpoints.sqlite")
+# 자동 GC 주기(초)
+CHECKPOINT_GC_INTERVAL = float(os.getenv("CHECKPOINT_GC_INTERVAL", "3600"))
+
+
+class CodecSerializer(JsonPlusSerializer):
+    """JSON으로 표현 가능한 값은 result_codec으로, 나머지는 LangGraph 기본 직렬화"""
+
+    _TYPE = "result_codec"
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        try:
+            return self._TYPE, get_codec().encode(obj)
+        except (TypeError, ValueError):
+            return super().dumps_typed(obj)
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        type_, blob = data
+        if type_ == self._TYPE:
+            return get_codec().decode(blob)
+        return super().loads_typed(data)
+
+
+class SQLiteCheckpointer(BaseCheckpointSaver):
+    """
+    SQLite 파일 기반 체크포인터
+
+    Args:
+        path: SQLite 파일 경로 (":memory:" 가능)
+        gc_max_age: 0보다 크면 put() 중에 이 시간(초)보다 오래된 스레드를 주기적으로 삭제
+        gc_interval: 자동 GC 주기(초)
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CHECKPOINT_PATH,
+        gc_max_age: float = 0,
+        gc_interval: float = CHECKPOINT_GC_INTERVAL,
+    ):
+        super().__init__(serde=CodecSerializer())
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._conn = self._open()
+        self._pid = os.getpid()
+        # 병렬 노드의 put_writes가 여러 스레드에서 들어오므로 커넥션 접근을 직렬화
+        self._lock = threading.Lock()
+        self.gc_max_age = gc_max_age
+        self.gc_interval = gc_interval
+        self._next_gc = time.monotonic() + gc_interval
+        self._gc_lock = threading.Lock()
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        return conn
+
+    def _connection(self) -> sqlite3.Connection:
+        """fork된 프로세스(프리포크 서버 워커)에서는 부모의 커넥션을 쓰지 않고 새로 연다"""
+        if self._pid != os.getpid():
+            self._lock = threading.Lock()
+            self._conn = self._open()
+            self._pid = os.getpid()
+        return self._conn
+
+    @contextmanager
+    def _tx(self) -> Iterator[sqlite3.Cursor]:
+        conn = self._connection()
+        with self._lock:
+            cur = conn.cursor()
+            cur.execute("BEGIN")
+            try:
+                yield cur
+                cur.execute("COMMIT")
+            except BaseException:
+                cur.execute("ROLLBACK")
+                raise
+            finally:
+                cur.close()
+
+    def _query(self, sql: str, params: Sequence[Any] = ()) -> List[tuple]:
+        conn = self._connection()
+        with self._lock:
+            return conn.execute(sql, tuple(params)).fetchall()
+
+    # ------------------------------------------------------------------ #
+    # 쓰기
+    # ------------------------------------------------------------------ #
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        c = checkpoint.copy()
+        values: Dict[str, Any] = c.pop("channel_values")
+
+        # 이번 스텝에서 갱신된 채널만 저장 (변하지 않은 채널은 이전 버전 행을 그대로 참조)
+        blob_rows = []
+        for channel, version in new_versions.items():
+            type_, blob = self.serde.dumps_typed(values[channel]) if channel in values else ("empty", b"")
+            blob_rows.append((thread_id, checkpoint_ns, channel, str(version), type_, blob))
+
+        type_, blob = self.serde.dumps_typed(c)
+        meta = json.dumps(get_checkpoint_metadata(config, metadata), ensure_ascii=False, default=str)
+        with self._tx() as cur:
+            cur.executemany(
+                "INSERT OR REPLACE INTO channel_blobs VALUES (?, ?, ?, ?, ?, ?)", blob_rows
+            )
+            cur.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                 type_, blob, meta, time.time()),
+            )
+        self._maybe_gc()
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = []
+        special = False
+        for idx, (channel, value) in enumerate(writes):
+            write_idx = WRITES_IDX_MAP.get(channel, idx)
+            special = special or write_idx < 0
+            type_, blob = self.serde.dumps_typed(value)
+            rows.append((thread_id, checkpoint_ns, checkpoint_id, task_id, write_idx, channel, type_, blob, task_path))
+        # 일반 쓰기는 처음 기록한 값을 유지하고, 오류/인터럽트 같은 특수 쓰기는 덮어쓴다
+        verb = "INSERT OR REPLACE" if special else "INSERT OR IGNORE"
+        with self._tx() as cur:
+            cur.executemany(f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    # ------------------------------------------------------------------ #
+    # 읽기
+    # ------------------------------------------------------------------ #
+    def _load_channel_values(self, thread_id: str, checkpoint_ns: str, versions: ChannelVersions) -> Dict[str, Any]:
+        if not versions:
+            return {}
+        rows = self._query(
+            "SELECT channel, version, type, blob FROM channel_blobs "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND channel IN (%s)" % ",".join("?" * len(versions)),
+            (thread_id, checkpoint_ns, *versions.keys()),
+        )
+        wanted = {channel: str(version) for channel, version in versions.items()}
+        values: Dict[str, Any] = {}
+        for channel, version, type_, blob in rows:
+            if wanted.get(channel) == version and type_ != "empty":
+                values[channel] = self.serde.loads_typed((type_, blob))
+        return values
+
+    def _to_tuple(self, row: tuple) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_id, type_, blob, meta = row
+        checkpoint = self.serde.loads_typed((type_, blob))
+        writes = self._query(
+            "SELECT task_id, channel, type, blob FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        )
+        return CheckpointTuple(
+            config={"configurable": {
+                "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id,
+            }},
+            checkpoint={
+                **checkpoint,
+                "channel_values": self._load_channel_values(thread_id, checkpoint_ns, checkpoint["channel_versions"]),
+            },
+            metadata=json.loads(meta) if meta else {},
+            parent_config=(
+                {"configurable": {
+                    "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id,
+                }}
+                if parent_id else None
+            ),
+            pending_writes=[(task, channel, self.serde.loads_typed((t, b))) for task, channel, t, b in writes],
+        )
+
+    _SELECT = (
+        "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata "
+        "FROM checkpoints"
+    )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        if checkpoint_id:
+            rows = self._query(
+                f"{self._SELECT} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            )
+        else:
+            rows = self._query(
+                f"{self._SELECT} WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC LIMIT 1",
+                (thread_id, checkpoint_ns),
+            )
+        if not rows:
+            return None
+        try:
+            return self._to_tuple(rows[0])
+        except UnknownDictionaryError as e:
+            # 보관되지 않은 사전으로 저장된 체크포인트는 없는 것으로 보고 처음부터 실행한다
+            log.warning("Checkpoint not decodable, starting thread %s fresh: %s", thread_id, e)
+            return None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        where: List[str] = []
+        params: List[Any] = []
+        if config:
+            where.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if config["configurable"].get("checkpoint_ns") is not None:
+                where.append("checkpoint_ns = ?")
+                params.append(config["configurable"]["checkpoint_ns"])
+            if get_checkpoint_id(config):
+                where.append("checkpoint_id = ?")
+                params.append(get_checkpoint_id(config))
+        if before and get_checkpoint_id(before):
+            where.append("checkpoint_id < ?")
+            params.append(get_checkpoint_id(before))
+        sql = self._SELECT + (f" WHERE {' AND '.join(where)}" if where else "") + " ORDER BY checkpoint_id DESC"
+
+        remaining = limit
+        for row in self._query(sql, params):
+            if filter:
+                meta = json.loads(row[6]) if row[6] else {}
+                if not all(meta.get(k) == v for k, v in filter.items()):
+                    continue
+            if remaining is not None and remaining <= 0:
+                return
+            try:
+                item = self._to_tuple(row)
+            except UnknownDictionaryError as e:
+                log.warning("Skipping checkpoint %s not decodable: %s", row[2], e)
+                continue
+            if remaining is not None:
+                remaining -= 1
+            yield item
+
+    # ------------------------------------------------------------------ #
+    # 정리
+    # ------------------------------------------------------------------ #
+    def delete_thread(self, thread_id: str) -> None:
+        with self._tx() as cur:
+            for table in ("checkpoints", "channel_blobs", "writes"):
+                cur.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+    def gc(self, max_age_seconds: float) -> int:
+        """마지막 체크포인트가 max_age_seconds보다 오래된 스레드 삭제 후 삭제한 스레드 수 반환"""
+        cutoff = time.time() - max_age_seconds
+        rows = self._query(
+            "SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING MAX(created_at) < ?", (cutoff,)
+        )
+        for (thread_id,) in rows:
+            self.delete_thread(thread_id)
+        if rows:
+            conn = self._connection()
+            with self._lock:
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return len(rows)
+
+    def _maybe_gc(self) -> None:
+        """gc_interval이 지났으면 오래된 스레드 정리 (동시에 들어온 put 중 하나만 실행)"""
+        if self.gc_max_age <= 0 or time.monotonic() < self._next_gc:
+            return
+        if not self._gc_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_gc = time.monotonic() + self.gc_interval
+            removed = self.gc(self.gc_max_age)
+            if removed:
+                log.info("Checkpoint GC: removed %d threads", removed)
+        except sqlite3.Error as e:
+            log.warning("Checkpoint GC failed: %s", e)
+        finally:
+            self._gc_lock.release()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # ------------------------------------------------------------------ #
+    # asyncio 변형
+    # ------------------------------------------------------------------ #
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+def thread_config(thread_id: str) -> Dict[str, Any]:
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def completed_nodes(graph, thread_id: str) -> List[str]:
+    """스레드에서 이미 끝난 노드 목록 (node_timings 기준, 종료 순서)"""
+    snapshot = graph.get_state(thread_config(thread_id))
+    timings = (snapshot.values or {}).get("node_timings") or {}
+    return sorted(timings, key=lambda n: timings[n]["end"])
+
+
+def resume_thread(graph, thread_id: str) -> Dict[str, Any]:
+    """
+    실패했거나 중단된 스레드를 마지막으로 완료된 노드 다음부터 다시 실행
+    이미 끝난 노드(번역/라벨링 등)는 다시 실행하지 않는다.
+    """
+    snapshot = graph.get_state(thread_config(thread_id))
+    if not snapshot.next:
+        # 이미 끝난 스레드
+        return snapshot.values
+    return graph.invoke(None, thread_config(thread_id))
+
+
+_CHECKPOINTER: Optional[SQLiteCheckpointer] = None
+
+
+def get_checkpointer(path: Optional[str] = None, gc_max_age: float = 0) -> SQLiteCheckpointer:
+    """프로세스 전역 SQLite 체크포인터 (gc_max_age초보다 오래된 스레드는 주기적으로 삭제)"""
+    global _CHECKPOINTER
+    if _CHECKPOINTER is None:
+        _CHECKPOINTER = SQLiteCheckpointer(path or DEFAULT_CHECKPOINT_PATH, gc_max_age=gc_max_age)
+    return _CHECKPOINTER
@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from langgraph.graph import START, END, StateGraph
+
+from src.utils.metrics import NODE_DURATION, NODE_ERRORS, node_context
+from src.utils.tracing import span
+
+
+@dataclass(frozen=True)
+class NodeSpec:
+    """
+    그래프 노드 선언
+    reads / writes로 노드가 읽고 쓰는 RouterState 키를 명시하면 엣지는 여기서 자동으로 도출된다.
+
+    version / env / depends / memoize는 노드 메모이제이션(src/router/memo.py)에 쓰인다.
+    - version: 프롬프트나 로직을 바꿔 같은 입력에도 출력이 달라질 때 올린다
+    - env: 출력에 영향을 주는 환경변수 (예: 라벨링 모델 선택)
+    - depends: 노드 모듈 밖에서 출력에 영향을 주는 것 - 모듈 이름(소스 해시) 또는
+      파일/디렉터리 경로를 돌려주는 함수(규칙 JSON, 모델 체크포인트 등, 실행할 때마다 경로를 다시 구한다)
+    - memoize: 출력이 입력만으로 정해지지 않는 노드(시각 기록, 외부 저장 등)는 False
+
+    degrade / fallback / value는 지연 SLO 강등 모드(src/router/slo.py)에 쓰인다.
+    - degrade: 가능한 강등 단계 (약한 것부터, "mini" = 경량 모델, "fallback" = fallback 함수)
+    - fallback: LLM 없이 같은 키를 쓰는 저비용 함수
+    - value: 결과 가치 (낮은 노드부터 강등)
+
+    after는 값을 읽지 않고 순서만 맞추는 키다. 그 키를 쓰는 노드가 그래프에 있으면 그 뒤에 실행하지만,
+    결과 섹션으로 가지치기할 때(prune_specs) 그 노드를 끌어들이지는 않는다.
+
+    when은 조건부 노드의 실행 조건이다. 노드는 도출된 엣지대로 스케줄되지만 조건이 거짓이면
+    아무 키도 쓰지 않고 건너뛴다 (선행 노드의 판단에 따라 다른 노드를 다시 실행하는 경우 등).
+    """
+    name: str
+    func: Callable[[Dict[str, Any]], Dict[str, Any]]
+    reads: Tuple[str, ...]
+    writes: Tuple[str, ...]
+    version: str = "1"
+    env: Tuple[str, ...] = ()
+    depends: Tuple[Union[str, Callable[[], str]], ...] = ()
+    memoize: bool = True
+    degrade: Tuple[str, ...] = ()
+    fallback: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None
+    value: int = 100
+    when: Optional[Callable[[Dict[str, Any]], bool]] = None
+    after: Tuple[str, ...] = ()
+
+
+def derive_dependencies(specs: Sequence[NodeSpec], ordering: bool = True) -> Dict[str, List[str]]:
+    """
+    노드별 선행 노드 도출
+    노드가 읽는 각 키에 대해, 선언 순서상 그 노드보다 앞에서 마지막으로 그 키를 쓴 노드가 선행 노드가 된다.
+    (같은 키를 여러 노드가 갱신하는 경우 선언 순서가 버전 순서 역할을 한다)
+    어떤 노드도 쓰지 않는 키는 그래프 입력으로 간주한다.
+    ordering=False면 순서용 키(after)는 빼고 데이터 의존만 본다 (가지치기용).
+    """
+    deps: Dict[str, List[str]] = {}
+    for pos, spec in enumerate(specs):
+        preds: List[str] = []
+        for key in spec.reads + (spec.after if ordering else ()):
+            writer = None
+            for prev in specs[:pos]:
+                if key in prev.writes:
+                    writer = prev.name
+            if writer is not None and writer not in preds:
+                preds.append(writer)
+        deps[spec.name] = preds
+    return _transitive_reduction(deps)
+
+
+def _transitive_reduction(deps: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    """다른 선행 노드를 통해 이미 보장되는 선행 관계 제거"""
+    ancestors: Dict[str, set] = {}
+
+    def _ancestors(name: str) -> set:
+        if name not in ancestors:
+            result = set()
+            for pred in deps.get(name, []):
+                result.add(pred)
+                result |= _ancestors(pred)
+            ancestors[name] = result
+        return ancestors[name]
+
+    reduced: Dict[str, List[str]] = {}
+    for name, preds in deps.items():
+        reduced[name] = [
+            p for p in preds
+            if not any(p in _ancestors(other) for other in preds if other != p)
+        ]
+    return reduced
+
+
+def timed_node(spec: NodeSpec, deps: List[str]) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """
+    노드 실행 시작/종료 시각을 node_timings에 기록하는 래퍼
+    트레이싱이 켜져 있으면 node.<이름> span도 기록한다 (선행 노드 종료 후 대기 시간 = queue_ms)
+    노드 실행 시간/예외는 메트릭으로도 기록하고, 실행 중에는 LLM 메트릭의 node 라벨을 이 노드로 둔다.
+    spec.when이 거짓이면 실행하지 않으므로 시각도 기록하지 않는다.
+    """
+
+    def _run(state: Dict[str, Any]) -> Dict[str, Any]:
+        if spec.when is not None and not spec.when(state):
+            return {}
+        start = time.time()
+        timings = state.get("node_timings") or {}
+        ready = max((timings[d]["end"] for d in deps if d in timings), default=start)
+        with span(
+            f"node.{spec.name}",
+            **{"graph.node": spec.name, "graph.deps": list(deps)},
+            queue_ms=round((start - ready) * 1000, 2),
+            utterances=len(state.get("utterances_ko") or (state.get("utterances_columns") or {}).get("speaker") or []),
+        ), node_context(spec.name):
+            try:
+                output = spec.func(state) or {}
+            except Exception:
+                NODE_ERRORS.inc(node=spec.name)
+                raise
+        end = time.time()
+        NODE_DURATION.observe(end - start, node=spec.name)
+        timings = {spec.name: {"start": start, "end": end, "deps": list(deps)}}
+        return {**output, "node_timings": timings}
+
+    _run.__name__ = getattr(spec.func, "__name__", spec.name)
+    return _run
+
+
+def add_dependency_edges(graph: StateGraph, specs: Sequence[NodeSpec], deps: Dict[str, List[str]]) -> None:
+    """
+    도출된 의존성으로 엣지 구성
+    - 선행 노드가 없으면 START에서 시작
+    - 선행 노드가 여러 개면 모두 끝난 뒤 실행 (join 엣지)
+    - 후속 노드가 없으면 END로 연결
+    """
+    consumed = {pred for preds in deps.values() for pred in preds}
+    for spec in specs:
+        preds = deps[spec.name]
+        if not preds:
+            graph.add_edge(START, spec.name)
+        elif len(preds) == 1:
+            graph.add_edge(preds[0], spec.name)
+        else:
+            graph.add_edge(list(preds), spec.name)
+        if spec.name not in consumed:
+            graph.add_edge(spec.name, END)
+
+
+def critical_path(node_timings: Optional[Dict[str, Dict[str, Any]]], until: Optional[float] = None) -> Dict[str, Any]:
+    """
+    세션의 임계 경로 계산
+    가장 늦게 끝난 노드에서 시작해, 각 노드의 선행 노드 중 가장 늦게 끝난 노드를 따라 거슬러 올라간다.
+
+    Args:
+        node_timings: timed_node가 기록한 노드별 {start, end, deps}
+        until: 전체 소요 시간 계산 기준 시각 (None이면 마지막 노드 종료 시각)
+
+    Returns:
+        {path, stages: [{node, duration_ms, wait_ms}], total_ms, bottleneck}
+    """
+    if not node_timings:
+        return {"path": [], "stages": [], "total_ms": 0.0, "bottleneck": None}
+
+    current = max(node_timings, key=lambda n: node_timings[n]["end"])
+    path: List[str] = []
+    while current is not None:
+        path.append(current)
+        deps = [d for d in node_timings[current].get("deps", []) if d in node_timings]
+        current = max(deps, key=lambda n: node_timings[n]["end"]) if deps else None
+    path.reverse()
+
+    stages = []
+    prev_end: Optional[float] = None
+    for name in path:
+        t = node_timings[name]
+        stages.append({
+            "node": name,
+            "duration_ms": round((t["end"] - t["start"]) * 1000, 2),
+            # 선행 노드 종료 후 실제 시작까지 대기한 시간 (스케줄링 지연)
+            "wait_ms": round((t["start"] - prev_end) * 1000, 2) if prev_end is not None else 0.0,
+        })
+        prev_end = t["end"]
+
+    first_start = min(t["start"] for t in node_timings.values())
+    last_end = until if until is not None else node_timings[path[-1]]["end"]
+    return {
+        "path": path,
+        "stages": stages,
+        "total_ms": round((last_end - first_start) * 1000, 2),
+        "bottleneck": max(stages, key=lambda s: s["duration_ms"])["node"],
+    }
+
+
+def final_writers(specs: Sequence[NodeSpec]) -> Dict[str, str]:
+    """상태 키별로 선언 순서상 마지막에 쓰는 노드 (그 키의 최종 값을 만드는 노드)"""
+    writers: Dict[str, str] = {}
+    for spec in specs:
+        for key in spec.writes:
+            writers[key] = spec.name
+    return writers
+
+
+def prune_specs(specs: Sequence[NodeSpec], targets: Sequence[str]) -> List[NodeSpec]:
+    """
+    targets 노드와 그 선행 노드들만 남긴 NodeSpec 리스트 (선언 순서 유지)
+    남은 노드들로 derive_dependencies를 다시 계산하면 잘려 나간 노드가 쓰던 키는 그래프 입력으로 취급된다.
+    순서용 키(after)의 작성 노드는 끌어들이지 않는다.
+    조건부 노드(when)는 건너뛰면 이전 값이 결과가 되므로, 같은 키를 먼저 쓰는 노드도 함께 남긴다.
+    """
+    deps = derive_dependencies(specs, ordering=False)
+    for pos, spec in enumerate(specs):
+        if spec.when is None:
+            continue
+        for key in spec.writes:
+            previous = [prev.name for prev in specs[:pos] if key in prev.writes]
+            if previous and previous[-1] not in deps[spec.name]:
+                deps[spec.name] = deps[spec.name] + [previous[-1]]
+    keep = set()
+    stack = [t for t in targets]
+    while stack:
+        name = stack.pop()
+        if name in keep:
+            continue
+        if name not in deps:
+            raise ValueError(f"알 수 없는 노드입니다: {name}")
+        keep.add(name)
+        stack.extend(deps[name])
+    return [spec for spec in specs if spec.name in keep]
@@ -0,0 +1,257 @@
+"""
+노드 단위 메모이제이션
+
+같은 세션을 challenge_spec이나 meta만 바꿔 다시 실행할 때, 입력이 그대로인 노드
+(preprocess, translate, label, patterns 등)는 다시 계산하지 않고 이전 출력을 재사용한다.
+
+캐시 키 = sha256(노드 이름, NodeSpec.version, 노드 모듈 소스 해시, NodeSpec.depends 해시, LLM 설정,
+               NodeSpec.env 값, reads 키의 입력값)
+- 노드 코드나 프롬프트가 바뀌면 모듈 소스 해시가 바뀌어 자동으로 캐시를 건너뛴다.
+- 노드가 쓰는 유틸 모듈(style_classifier 등)과 파일(규칙 JSON, ELECTRA 체크포인트)은 NodeSpec.depends에 적는다.
+  모듈은 소스 해시, 파일은 내용 해시(크기/수정 시각이 같으면 다시 읽지 않음), 디렉터리는 파일별 크기/수정 시각을 쓴다.
+- 모델 교체(MODEL_PROVIDER / MODEL_NAME / MINI_MODEL_NAME)도 키에 포함된다.
+- invalidate()로 노드별(또는 전체) 캐시를 지울 수 있다.
+- 노드가 src.utils.metrics.record_fallback으로 표시한 오류 대체 출력과 SLO 강등 출력은 캐시하지 않는다.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import importlib
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+from src.router.dag import NodeSpec
+from src.utils.log import get_logger
+from src.utils.metrics import CACHE_REQUESTS, track_fallbacks
+from src.utils.result_codec import UnknownDictionaryError, get_codec
+from src.utils.tracing import current_span
+
+log = get_logger(__name__)
+
+DEFAULT_MEMO_PATH = os.getenv("NODE_MEMO_PATH", "./data/node_memo.sqlite")
+
+# 모든 LLM 노드의 출력에 영향을 주는 설정
+_MODEL_ENV = ("MODEL_PROVIDER", "MODEL_NAME", "MINI_MODEL_NAME")
+
+_SOURCE_HASHES: Dict[str, str] = {}
+# (경로, 크기, 수정 시각) → 파일 내용 해시
+_FILE_HASHES: Dict[Tuple[str, int, int], str] = {}
+
+
+def _source_hash(func: Callable[..., Any]) -> str:
+    """노드 함수가 정의된 모듈 전체(프롬프트 포함)의 소스 해시"""
+    return _module_hash(getattr(func, "__module__", "") or "", fallback=getattr(func, "__qualname__", ""))
+
+
+def _module_hash(module_name: str, fallback: str = "") -> str:
+    if module_name not in _SOURCE_HASHES:
+        try:
+            module = sys.modules.get(module_name) or importlib.import_module(module_name)
+            source = inspect.getsource(module)
+        except (ImportError, OSError, TypeError, ValueError):
+            source = fallback or module_name
+        _SOURCE_HASHES[module_name] = hashlib.sha256(source.encode("utf-8")).hexdigest()[:16]
+    return _SOURCE_HASHES[module_name]
+
+
+def _path_hash(path: str) -> str:
+    """파일은 내용 해시, 디렉터리(모델 체크포인트)는 파일별 (상대 경로, 크기, 수정 시각) 해시"""
+    p = Path(path)
+    try:
+        if p.is_dir():
+            entries = sorted(
+                (str(f.relative_to(p)), st.st_size, st.st_mtime_ns)
+                for f in p.rglob("*") if f.is_file() for st in (f.stat(),)
+            )
+            return hashlib.sha256(json.dumps(entries).encode("utf-8")).hexdigest()[:16]
+        st = p.stat()
+    except OSError:
+        return "missing"
+    key = (str(p.resolve()), st.st_size, st.st_mtime_ns)
+    if key not in _FILE_HASHES:
+        digest = hashlib.sha256()
+        with open(p, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        _FILE_HASHES[key] = digest.hexdigest()[:16]
+    return _FILE_HASHES[key]
+
+
+def _dependency_hash(dep: Union[str, Callable[[], str]]) -> Tuple[str, str]:
+    """NodeSpec.depends 항목 → (이름, 해시)"""
+    if callable(dep):
+        path = dep()
+        return path, _path_hash(path)
+    return dep, _module_hash(dep)
+
+
+def node_fingerprint(spec: NodeSpec) -> Dict[str, Any]:
+    """입력값을 제외한 캐시 키 구성요소 (노드/프롬프트/의존 모듈과 파일/모델 버전)"""
+    return {
+        "node": spec.name,
+        "version": spec.version,
+        "source": _source_hash(spec.func),
+        "depends": dict(_dependency_hash(dep) for dep in spec.depends),
+        "env": {name: os.getenv(name) for name in _MODEL_ENV + tuple(spec.env)},
+    }
+
+
+def memo_key(spec: NodeSpec, state: Dict[str, Any]) -> str:
+    payload = {
+        **node_fingerprint(spec),
+        "inputs": {key: state.get(key) for key in spec.reads},
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class NodeMemoCache:
+    """SQLite 파일 기반 노드 출력 캐시"""
+
+    def __init__(self, path: str = DEFAULT_MEMO_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._conn = self._open()
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0}
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS node_memo ("
+            "node TEXT NOT NULL, key TEXT NOT NULL, created_at REAL NOT NULL, output BLOB NOT NULL, "
+            "PRIMARY KEY (node, key))"
+        )
+        return conn
+
+    def _connection(self) -> sqlite3.Connection:
+        """fork된 프로세스에서는 새 커넥션 사용"""
+        if self._pid != os.getpid():
+            self._lock = threading.Lock()
+            self._conn = self._open()
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, node: str, key: str) -> Optional[Dict[str, Any]]:
+        conn = self._connection()
+        with self._lock:
+            row = conn.execute(
+                "SELECT output FROM node_memo WHERE node = ? AND key = ?", (node, key)
+            ).fetchone()
+        output = None
+        if row:
+            try:
+                output = get_codec().decode(row[0])
+            except UnknownDictionaryError as e:
+                # 보관되지 않은 사전으로 인코딩된 항목은 캐시 미스로 보고 다시 계산한 출력으로 덮어쓴다
+                log.debug("Node memo entry not decodable (%s/%s): %s", node, key, e)
+        with self._lock:
+            self._stats["hits" if output is not None else "misses"] += 1
+        return output
+
+    def set(self, node: str, key: str, output: Dict[str, Any]) -> None:
+        try:
+            blob = get_codec().encode(output)
+        except (TypeError, ValueError):
+            # JSON으로 표현할 수 없는 출력은 캐시하지 않는다
+            return
+        conn = self._connection()
+        with self._lock:
+            conn.execute(
+                "INSERT OR REPLACE INTO node_memo VALUES (?, ?, ?, ?)", (node, key, time.time(), blob)
+            )
+            self._stats["stores"] += 1
+
+    def invalidate(self, node: Optional[str] = None, older_than: Optional[float] = None) -> int:
+        """
+        캐시 삭제 (프롬프트/모델 업그레이드 후 남은 항목 정리)
+
+        Args:
+            node: 노드 이름 (None이면 전체)
+            older_than: 이 시간(초)보다 오래된 항목만 삭제
+
+        Returns:
+            삭제한 항목 수
+        """
+        where, params = [], []
+        if node is not None:
+            where.append("node = ?")
+            params.append(node)
+        if older_than is not None:
+            where.append("created_at < ?")
+            params.append(time.time() - older_than)
+        sql = "DELETE FROM node_memo" + (f" WHERE {' AND '.join(where)}" if where else "")
+        conn = self._connection()
+        with self._lock:
+            return conn.execute(sql, params).rowcount
+
+    def metrics(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+
+def memoized_spec(spec: NodeSpec, cache: NodeMemoCache) -> NodeSpec:
+    """입력이 같으면 캐시된 출력을 돌려주는 노드로 감싼 NodeSpec"""
+    if not spec.memoize:
+        return spec
+
+    def _run(state: Dict[str, Any]) -> Dict[str, Any]:
+        key = memo_key(spec, state)
+        cached = cache.get(spec.name, key)
+        current_span().set(memo_hit=cached is not None)
+        CACHE_REQUESTS.inc(cache="node_memo", node=spec.name, result="miss" if cached is None else "hit")
+        if cached is not None:
+            return cached
+        with track_fallbacks() as fallbacks:
+            output = spec.func(state) or {}
+        if not output.get("degraded") and not fallbacks:
+            # SLO 강등 모드나 오류 대체 경로(record_fallback)로 만든 출력은 캐시하지 않는다
+            # (LLM 공급자가 복구된 뒤에도 오류 문구가 재사용되지 않도록 성공한 출력만 남긴다)
+            cache.set(spec.name, key, output)
+        return output
+
+    _run.__name__ = getattr(spec.func, "__name__", spec.name)
+    _run.__module__ = getattr(spec.func, "__module__", __name__)
+    return replace(spec, func=_run)
+
+
+_CACHE: Optional[NodeMemoCache] = None
+
+
+def memo_enabled() -> bool:
+    return os.getenv("NODE_MEMO", "false").lower() == "true"
+
+
+def get_memo_cache(path: Optional[str] = None) -> NodeMemoCache:
+    """프로세스 전역 노드 캐시"""
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = NodeMemoCache(path or DEFAULT_MEMO_PATH)
+    return _CACHE
+
+
+def invalidate(node: Optional[str] = None, older_than: Optional[float] = None) -> int:
+    return get_memo_cache().invalidate(node, older_than)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="노드 메모이제이션 캐시 삭제")
+    parser.add_argument("--node", help="삭제할 노드 이름 (생략 시 전체)")
+    parser.add_argument("--older-than-hours", type=float, help="이 시간보다 오래된 항목만 삭제")
+    args = parser.parse_args()
+    older = args.older_than_hours * 3600 if args.older_than_hours is not None else None
+    print(json.dumps({"deleted": invalidate(args.node, older)}))
@@ -0,0 +1,297 @@
+"""
+요청별 CPU/메모리 프로파일링
+
+meta.profile이 참인 요청(서버에서는 X-Profile: 1 헤더)만 노드 단위로 프로파일링한다.
+- CPU: 노드를 실행하는 스레드의 스택을 PROFILE_INTERVAL_MS 간격으로 샘플링한다. 벽시계 기준이라
+  torch 연산, 정규식 매칭, JSON 파싱, 네트워크 대기가 모두 실제로 머문 함수의 샘플로 잡힌다.
+- 메모리: 노드 전후 tracemalloc 스냅샷을 비교해 할당이 늘어난 위치와 노드 실행 중 최대 사용량을 기록한다.
+  (tracemalloc 최대치는 프로세스 전체 기준이라 병렬로 실행 중인 노드의 할당이 섞일 수 있다)
+  tracemalloc은 할당이 많은 코드를 크게 느리게 하므로 프로파일링한 요청의 wall_ms는 평소보다 길다.
+
+노드별 결과는 profile 상태 키에 모이고, aggregate_result가 PROFILE_DIR/<시각>-<세션>/ 아래에
+cpu.folded(플레임그래프 입력)와 profile.json을 쓰고 요약(상위 함수, 노드별 최대 할당)을 result.meta.profile에 담는다.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from src.router.dag import NodeSpec
+from src.utils.log import get_logger
+
+log = get_logger(__name__)
+
+INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./data/profiles")
+TRACEMALLOC_FRAMES = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", "1"))
+
+# 노드 하나에서 보관할 서로 다른 스택 수 (나머지는 "(other)"로 합친다)
+_MAX_STACKS = 500
+_TOP_ALLOCATIONS = 10
+
+# meta에서 세션 식별자로 쓰는 키 (앞에서부터 우선, 아티팩트 디렉터리 이름에 사용)
+_KEY_FIELDS = ("session_key", "session_id", "request_id")
+
+
+def profiling_enabled() -> bool:
+    """PROFILE_REQUESTS=false면 meta.profile 요청을 무시한다"""
+    return os.getenv("PROFILE_REQUESTS", "true").lower() == "true"
+
+
+def profile_requested(state: Dict[str, Any]) -> bool:
+    return bool((state.get("meta") or {}).get("profile")) and profiling_enabled()
+
+
+# ---------------------------------------------------------------------- #
+# CPU 샘플링
+# ---------------------------------------------------------------------- #
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', '?')}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class _StackSampler:
+    """스레드 하나의 스택을 주기적으로 샘플링 (stop_frame과 그 아래 = LangGraph 실행기 프레임은 제외)"""
+
+    def __init__(self, thread_id: int, stop_frame, interval_s: float):
+        self.thread_id = thread_id
+        self.stop_frame = stop_frame
+        self.interval_s = interval_s
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            labels: List[str] = []
+            while frame is not None and frame is not self.stop_frame:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            if labels:
+                self.stacks[";".join(reversed(labels))] += 1
+
+
+def _cap_stacks(stacks: Counter) -> Dict[str, int]:
+    if len(stacks) <= _MAX_STACKS:
+        return dict(stacks)
+    kept = dict(stacks.most_common(_MAX_STACKS - 1))
+    kept["(other)"] = sum(stacks.values()) - sum(kept.values())
+    return kept
+
+
+def top_functions(stacks: Dict[str, int], limit: int = 10) -> List[Dict[str, Any]]:
+    """
+    folded 스택에서 샘플이 많은 함수
+
+    Returns:
+        [{function, samples, self_pct, total_pct}, ...] - self: 스택 맨 위에 있던 비율, total: 스택 어디든 있던 비율
+    """
+    total = sum(stacks.values())
+    if not total:
+        return []
+    self_counts: Counter = Counter()
+    total_counts: Counter = Counter()
+    for stack, n in stacks.items():
+        frames = stack.split(";")
+        self_counts[frames[-1]] += n
+        for frame in set(frames):
+            total_counts[frame] += n
+    return [
+        {
+            "function": function,
+            "samples": n,
+            "self_pct": round(100 * n / total, 1),
+            "total_pct": round(100 * total_counts[function] / total, 1),
+        }
+        for function, n in self_counts.most_common(limit)
+    ]
+
+
+# ---------------------------------------------------------------------- #
+# tracemalloc
+# ---------------------------------------------------------------------- #
+_TM_LOCK = threading.Lock()
+_TM_USERS = 0
+_TM_STARTED = False
+
+# tracemalloc 자신과 샘플러 스레드의 할당은 제외
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, threading.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def _tracemalloc_enter() -> None:
+    """프로파일링 중인 노드가 하나라도 있는 동안만 tracemalloc을 켠다 (이미 켜져 있었으면 그대로 둔다)"""
+    global _TM_USERS, _TM_STARTED
+    with _TM_LOCK:
+        if _TM_USERS == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            _TM_STARTED = True
+        _TM_USERS += 1
+
+
+def _tracemalloc_exit() -> None:
+    global _TM_USERS, _TM_STARTED
+    with _TM_LOCK:
+        _TM_USERS -= 1
+        if _TM_USERS == 0 and _TM_STARTED:
+            tracemalloc.stop()
+            _TM_STARTED = False
+
+
+def _short_path(filename: str) -> str:
+    """sys.path 기준 상대 경로 (src/..., langchain_core/..., json/...)"""
+    for root in sorted((p for p in sys.path if p), key=len, reverse=True):
+        root = os.path.abspath(root)
+        if filename.startswith(root + os.sep):
+            return filename[len(root) + 1:]
+    return filename
+
+
+def _top_allocations(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot) -> List[Dict[str, Any]]:
+    stats = after.filter_traces(_SNAPSHOT_FILTERS).compare_to(before.filter_traces(_SNAPSHOT_FILTERS), "lineno")
+    out = []
+    for stat in stats:
+        if stat.size_diff <= 0:
+            continue
+        frame = stat.traceback[0]
+        out.append({
+            "where": f"{_short_path(frame.filename)}:{frame.lineno}",
+            "size_kb": round(stat.size_diff / 1024, 1),
+            "count": stat.count_diff,
+        })
+        if len(out) >= _TOP_ALLOCATIONS:
+            break
+    return out
+
+
+# ---------------------------------------------------------------------- #
+# 노드 래퍼
+# ---------------------------------------------------------------------- #
+def profile_call(func: Callable[[Dict[str, Any]], Any], state: Dict[str, Any]) -> Tuple[Any, Dict[str, Any]]:
+    """
+    func(state)를 CPU 샘플링 + tracemalloc으로 실행
+
+    Returns:
+        (func 반환값, {wall_ms, interval_ms, samples, stacks, top_functions, memory: {peak_kb, net_kb, top_allocations}})
+    """
+    _tracemalloc_enter()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        sampler = _StackSampler(threading.get_ident(), sys._getframe(), INTERVAL_MS / 1000)
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            output = func(state)
+        finally:
+            sampler.stop()
+            wall_ms = (time.perf_counter() - start) * 1000
+        current, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        _tracemalloc_exit()
+
+    stacks = _cap_stacks(sampler.stacks)
+    return output, {
+        "wall_ms": round(wall_ms, 1),
+        "interval_ms": INTERVAL_MS,
+        "samples": sum(stacks.values()),
+        "stacks": stacks,
+        "top_functions": top_functions(stacks),
+        "memory": {
+            "peak_kb": round(max(0, peak - base) / 1024, 1),
+            "net_kb": round((current - base) / 1024, 1),
+            "top_allocations": _top_allocations(before, after),
+        },
+    }
+
+
+def profiled_spec(spec: NodeSpec) -> NodeSpec:
+    """meta.profile이 참인 요청에서만 프로파일링하고 결과를 profile 상태 키에 더하는 노드로 감싼 NodeSpec"""
+
+    def _run(state: Dict[str, Any]) -> Dict[str, Any]:
+        if not profile_requested(state):
+            return spec.func(state)
+        output, profile = profile_call(spec.func, state)
+        return {**(output or {}), "profile": {spec.name: profile}}
+
+    _run.__name__ = getattr(spec.func, "__name__", spec.name)
+    _run.__module__ = getattr(spec.func, "__module__", __name__)
+    return replace(spec, func=_run)
+
+
+# ---------------------------------------------------------------------- #
+# 아티팩트 / 요약
+# ---------------------------------------------------------------------- #
+def _session_name(meta: Dict[str, Any]) -> str:
+    key = next((str(meta[k]) for k in _KEY_FIELDS if meta.get(k)), None) or uuid.uuid4().hex[:12]
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{re.sub(r'[^A-Za-z0-9_.-]', '_', key)[:64]}"
+
+
+def write_profile(profiles: Dict[str, Dict[str, Any]], meta: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    노드별 프로파일을 아티팩트로 쓰고 result.meta.profile 요약 반환
+
+    아티팩트 (PROFILE_DIR/<시각>-<세션>/):
+    - cpu.folded: "node.<이름>;frame;frame 샘플수" (flamegraph.pl / speedscope 입력)
+    - profile.json: 노드별 전체 프로파일
+    """
+    merged: Counter = Counter()
+    folded: List[str] = []
+    for node, profile in profiles.items():
+        for stack, n in (profile.get("stacks") or {}).items():
+            merged[stack] += n
+            folded.append(f"node.{node};{stack} {n}")
+
+    artefacts = None
+    try:
+        out_dir = Path(PROFILE_DIR) / _session_name(meta)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        (out_dir / "cpu.folded").write_text("\n".join(folded) + "\n", encoding="utf-8")
+        with open(out_dir / "profile.json", "w", encoding="utf-8") as f:
+            json.dump(profiles, f, ensure_ascii=False, indent=2)
+        artefacts = str(out_dir)
+    except OSError as e:
+        log.warning("Profile artefact write error: %s", e)
+
+    nodes = sorted(profiles.items(), key=lambda item: item[1].get("wall_ms", 0), reverse=True)
+    return {
+        "artefacts": artefacts,
+        "interval_ms": INTERVAL_MS,
+        "top_functions": top_functions(merged),
+        "nodes": {
+            node: {
+                "wall_ms": profile.get("wall_ms"),
+                "samples": profile.get("samples"),
+                "peak_kb": (profile.get("memory") or {}).get("peak_kb"),
+                "net_kb": (profile.get("memory") or {}).get("net_kb"),
+                "top_allocations": ((profile.get("memory") or {}).get("top_allocations") or [])[:3],
+            }
+            for node, profile in nodes
+        },
+    }
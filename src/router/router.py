@@ -1,20 +1,43 @@
 from __future__ import annotations
 
+from functools import lru_cache
+from typing import Iterable, List, Optional
+
 from langgraph.graph import StateGraph, START, END
 
+from src.router.dag import (
+    NodeSpec,
+    add_dependency_edges,
+    derive_dependencies,
+    final_writers,
+    prune_specs,
+    timed_node,
+)
+from src.router.memo import memoized_spec
+from src.router.profiling import profiled_spec
+from src.router.slo import MODE_FALLBACK, MODE_MINI, degradable_spec
 from src.router.states import RouterState
+from src.utils.dpics_electra import model_path as electra_model_path
+from src.utils.pattern_rules import rules_path
 
 # 새로운 플로우 에이전트들
 from src.expert.preprocess_agent import preprocess_node
 from src.expert.translate_agent import translate_ko_to_en_node
-from src.expert.label_agent import label_utterances_node
-from src.expert.pattern_agent import detect_patterns_node
+from src.expert.label_agent import label_utterances_fallback_node, label_utterances_node
+from src.expert.pattern_agent import (
+    detect_patterns_node,
+    enrich_patterns_fallback_node,
+    enrich_patterns_node,
+    reconcile_patterns_node,
+    rerun_requested,
+)
 from src.expert.summarize_agent import summarize_node
-from src.expert.key_moments_agent import key_moments_node
-from src.expert.style_agent import analyze_style_node
+from src.expert.key_moments_agent import key_moments_fallback_node, key_moments_node
+from src.expert.style_agent import analyze_style_fallback_node, analyze_style_node
 from src.expert.coaching_agent import coaching_plan_node
-from src.expert.challenge_agent import challenge_eval_node
+from src.expert.challenge_agent import challenge_eval_fallback_node, challenge_eval_node
 from src.expert.aggregate_agent import aggregate_result_node
+from src.expert.persist_agent import persist_result_node
 
 # 기존 에이전트들 (하위 호환성)
 from src.expert.sentiment_agent import sentiment_label_node
@@ -22,53 +45,185 @@ from src.expert.highlight_agent import highlight_extract_node
 from src.expert.expert_agent import parenting_advice_node
 
 
-def build_question_router():
+# 노드별 읽기/쓰기 상태 키 선언 (선언 순서 = 같은 키를 갱신하는 노드들의 적용 순서)
+# 엣지는 이 선언에서 도출되므로 노드를 추가할 때는 여기에 reads/writes만 정확히 적으면 된다.
+# depends: 노드 모듈 밖에서 출력을 바꾸는 유틸 모듈과 파일 (메모이제이션 키에 해시가 들어간다)
+# degrade / fallback / value: 지연 SLO 강등 모드에서 value가 낮은 노드부터 경량 모델 → fallback 순으로 강등
+NODE_SPECS = [
+    # 순차 처리 단계
+    # transcript_path는 경로만으로는 파일 내용이 바뀐 것을 알 수 없으므로 메모이제이션하지 않는다 (비용이 작은 노드)
+    NodeSpec("preprocess", preprocess_node,
+             reads=("utterances_ko", "transcript", "transcript_path", "transcript_format", "message", "dialogue"),
+             writes=("utterances_normalized",),
+             memoize=False),
+    NodeSpec("translate_ko_to_en", translate_ko_to_en_node,
+             reads=("utterances_normalized",),
+             writes=("utterances_en",),
+             depends=("src.utils.transcript",)),
+    NodeSpec("label_utterances", label_utterances_node,
+             reads=("utterances_en",),
+             writes=("utterances_columns",),
+             env=("USE_DPICS_ELECTRA", "DPICS_ELECTRA_MODEL_PATH"),
+             depends=("src.utils.dpics", "src.utils.dpics_electra", electra_model_path),
+             degrade=(MODE_FALLBACK,), fallback=label_utterances_fallback_node, value=90),
+    NodeSpec("detect_patterns", detect_patterns_node,
+             reads=("utterances_columns",),
+             writes=("patterns",),
+             env=("PATTERN_RULES_PATH",),
+             depends=("src.utils.pattern_rules", rules_path)),
+    # LLM 호출은 백그라운드 작업으로 넘기고 작업 키만 쓰므로 (결과는 reconcile_patterns가 기다림) 메모이제이션하지 않는다
+    NodeSpec("enrich_patterns", enrich_patterns_node,
+             reads=("utterances_columns",),
+             writes=("patterns_llm", "patterns_llm_job"),
+             env=("PATTERN_LLM_ENRICH",),
+             memoize=False,
+             degrade=(MODE_FALLBACK,), fallback=enrich_patterns_fallback_node, value=10),
+
+    # 분석 단계 (입력이 준비되는 즉시 실행)
+    NodeSpec("summarize", summarize_node,
+             reads=("utterances_ko", "utterances_columns", "patterns"),
+             writes=("summary",),
+             degrade=(MODE_MINI,), value=50),
+    NodeSpec("extract_key_moments", key_moments_node,
+             reads=("utterances_columns", "patterns"),
+             writes=("key_moments",),
+             degrade=(MODE_MINI, MODE_FALLBACK), fallback=key_moments_fallback_node, value=30),
+    NodeSpec("analyze_style", analyze_style_node,
+             reads=("utterances_columns", "patterns", "meta"),
+             writes=("style_analysis",),
+             env=("STYLE_LLM_NARRATIVE", "STYLE_AMBIGUITY_BAND", "STYLE_CLASSIFIER_TEMPERATURE"),
+             depends=("src.utils.style_classifier",),
+             degrade=(MODE_MINI, MODE_FALLBACK), fallback=analyze_style_fallback_node, value=20),
+    NodeSpec("evaluate_challenge", challenge_eval_node,
+             reads=("challenge_spec", "utterances_columns", "patterns"),
+             writes=("challenge_eval",),
+             depends=("src.utils.challenge_spec",),
+             degrade=(MODE_MINI, MODE_FALLBACK), fallback=challenge_eval_fallback_node, value=60),
+    NodeSpec("plan_coaching", coaching_plan_node,
+             reads=("summary", "style_analysis", "patterns", "key_moments"),
+             writes=("coaching_plan",),
+             degrade=(MODE_MINI,), value=40),
+
+    # 패턴 병합: LLM 패턴 대기가 분석 노드를 막지 않도록 두 노드 이후에 실행
+    # (두 섹션은 순서만 맞추므로 after - 한쪽 섹션만 요청하면 다른 쪽 노드는 가지치기된다)
+    # (출력이 백그라운드 작업 결과에 달려 있으므로 메모이제이션하지 않는다)
+    NodeSpec("reconcile_patterns", reconcile_patterns_node,
+             reads=("patterns", "patterns_llm", "patterns_llm_job", "utterances_columns"),
+             writes=("patterns", "patterns_llm", "pattern_enrichment"),
+             after=("style_analysis", "challenge_eval"),
+             env=("PATTERN_RULES_PATH",),
+             memoize=False),
+    # 병합된 패턴이 결과를 바꿀 때만 실행되는 조건부 재실행 노드 (reconcile_patterns의 rerun_nodes)
+    NodeSpec("reanalyze_style", analyze_style_node,
+             reads=("utterances_columns", "patterns", "meta", "pattern_enrichment"),
+             writes=("style_analysis",),
+             env=("STYLE_LLM_NARRATIVE", "STYLE_AMBIGUITY_BAND", "STYLE_CLASSIFIER_TEMPERATURE"),
+             depends=("src.utils.style_classifier",),
+             degrade=(MODE_MINI, MODE_FALLBACK), fallback=analyze_style_fallback_node, value=20,
+             when=rerun_requested("analyze_style")),
+    NodeSpec("reevaluate_challenge", challenge_eval_node,
+             reads=("challenge_spec", "utterances_columns", "patterns", "pattern_enrichment"),
+             writes=("challenge_eval",),
+             depends=("src.utils.challenge_spec",),
+             degrade=(MODE_MINI, MODE_FALLBACK), fallback=challenge_eval_fallback_node, value=60,
+             when=rerun_requested("evaluate_challenge")),
+
+    # 최종 집계
+    NodeSpec("aggregate_result", aggregate_result_node,
+             reads=("summary", "key_moments", "style_analysis", "coaching_plan", "challenge_eval",
+                    "patterns", "pattern_enrichment", "meta", "node_timings", "requested_outputs", "degraded", "profile"),
+             writes=("result",),
+             memoize=False),
+
+    # 결과 저장 (RESULT_SINK=true일 때만 write-behind 큐에 넣음, 응답 지연 없음)
+    NodeSpec("persist_result", persist_result_node,
+             reads=("result", "utterances_columns", "patterns", "utterances_normalized", "utterances_ko", "meta"),
+             writes=("persistence",),
+             memoize=False),
+]
+
+
+# 요청할 수 있는 결과 섹션 (aggregate_result의 result 키 = RouterState 키)
+RESULT_SECTIONS = ("summary", "key_moments", "style_analysis", "coaching_plan", "challenge_eval", "patterns")
+
+
+def select_specs(outputs: Optional[Iterable[str]] = None) -> List[NodeSpec]:
+    """
+    요청한 결과 섹션을 만드는 데 필요한 노드만 고른다
+    outputs가 없으면 전체 노드, 있으면 각 섹션의 최종 작성 노드와 그 선행 노드 + aggregate_result
+    (부분 결과가 전체 결과를 덮어쓰지 않도록 persist_result는 전체 실행에서만 포함)
+    """
+    if not outputs:
+        return list(NODE_SPECS)
+    unknown = set(outputs) - set(RESULT_SECTIONS)
+    if unknown:
+        raise ValueError(f"알 수 없는 결과 섹션입니다: {sorted(unknown)} (가능: {list(RESULT_SECTIONS)})")
+    writers = final_writers(NODE_SPECS)
+    keep = {spec.name for spec in prune_specs(NODE_SPECS, [writers[key] for key in outputs])}
+    keep.add("aggregate_result")
+    return [spec for spec in NODE_SPECS if spec.name in keep]
+
+
+def build_question_router(
+    checkpointer=None,
+    memo_cache=None,
+    outputs: Optional[Iterable[str]] = None,
+    slo_policy=None,
+):
     """
     새로운 대화 분석 파이프라인:
-    ① preprocess → ② translate → ③ label → ④ detect_patterns
-    → ⑤-⑨ 병렬 분석 (5개) → ⑩ aggregate_result
+    ① preprocess → ② translate → ③ label → ④ detect_patterns (규칙) / ④-2 enrich_patterns (LLM 패턴)
+    → ⑤ summarize, ⑥ extract_key_moments, ⑦ analyze_style, ⑨ evaluate_challenge → ⑧ plan_coaching
+    → ④-3 reconcile_patterns (→ LLM 패턴이 결과를 바꾸면 reanalyze_style / reevaluate_challenge)
+    → ⑩ aggregate_result → ⑪ persist_result (선택)
+    (LangGraph는 상태 키와 같은 이름의 노드를 허용하지 않으므로 key_moments / challenge_eval / coaching_plan
+    결과를 쓰는 노드는 동사형 이름을 쓴다)
+    
+    엣지는 NODE_SPECS의 reads/writes에서 도출되며, 각 노드는 실제 입력이 준비되는 즉시 실행된다.
+    노드별 실행 시각은 node_timings에 기록되고 aggregate_result에서 임계 경로로 요약된다.
+    meta.profile이 참인 요청은 노드별 CPU/메모리 프로파일이 result.meta.profile에 요약된다 (src.router.profiling).
+
+    Args:
+        checkpointer: LangGraph 체크포인터 (예: src.router.checkpoint.SQLiteCheckpointer).
+                      지정하면 thread_id별 진행 상태가 저장되어 실패한 노드부터 다시 실행할 수 있다.
+        memo_cache: 노드 메모이제이션 캐시 (src.router.memo.NodeMemoCache).
+                    지정하면 reads 입력이 이전 실행과 같은 노드는 캐시된 출력을 재사용한다.
+        outputs: 필요한 결과 섹션 (RESULT_SECTIONS 중 일부). 지정하면 해당 섹션의 선행 노드만 포함한
+                 그래프를 만든다. 입력 상태의 requested_outputs에 같은 값을 넣으면 결과에도 그 섹션만 담긴다.
+        slo_policy: 지연 SLO 정책 (src.router.slo.SLOPolicy). 지정하면 노드별 p95를 추적하고
+                    요청 목표를 넘을 것으로 보이면 가치가 낮은 노드부터 경량 모델/fallback으로 실행한다.
+                    강등된 섹션은 result.meta.degraded에 표시된다.
     """
     graph = StateGraph(RouterState)
 
-    # 순차 처리 단계
-    graph.add_node("preprocess", preprocess_node)
-    graph.add_node("translate_ko_to_en", translate_ko_to_en_node)
-    graph.add_node("label_utterances", label_utterances_node)
-    graph.add_node("detect_patterns", detect_patterns_node)
-
-    # 병렬 분석 단계
-    graph.add_node("summarize", summarize_node)
-    graph.add_node("key_moments", key_moments_node)
-    graph.add_node("analyze_style", analyze_style_node)
-    graph.add_node("coaching_plan", coaching_plan_node)
-    graph.add_node("challenge_eval", challenge_eval_node)
-
-    # 최종 집계
-    graph.add_node("aggregate_result", aggregate_result_node)
-
-    # 엣지 구성: 순차 → 병렬 → 집계
-    graph.add_edge(START, "preprocess")
-    graph.add_edge("preprocess", "translate_ko_to_en")
-    graph.add_edge("translate_ko_to_en", "label_utterances")
-    graph.add_edge("label_utterances", "detect_patterns")
-
-    # detect_patterns 이후 병렬 실행
-    graph.add_edge("detect_patterns", "summarize")
-    graph.add_edge("detect_patterns", "key_moments")
-    graph.add_edge("detect_patterns", "analyze_style")
-    graph.add_edge("detect_patterns", "coaching_plan")
-    graph.add_edge("detect_patterns", "challenge_eval")
-
-    # 모든 병렬 분석이 완료되면 집계
-    graph.add_edge("summarize", "aggregate_result")
-    graph.add_edge("key_moments", "aggregate_result")
-    graph.add_edge("analyze_style", "aggregate_result")
-    graph.add_edge("coaching_plan", "aggregate_result")
-    graph.add_edge("challenge_eval", "aggregate_result")
-
-    graph.add_edge("aggregate_result", END)
-
-    return graph.compile()
+    specs = select_specs(outputs)
+    deps = derive_dependencies(specs)
+    for spec in specs:
+        if slo_policy is not None:
+            spec = degradable_spec(spec, slo_policy, specs, deps)
+        if memo_cache is not None:
+            spec = memoized_spec(spec, memo_cache)
+        # meta.profile이 참인 요청만 노드별 CPU 샘플링/tracemalloc (캐시 적중도 그대로 기록)
+        spec = profiled_spec(spec)
+        graph.add_node(spec.name, timed_node(spec, deps[spec.name]))
+    add_dependency_edges(graph, specs, deps)
+
+    return graph.compile(checkpointer=checkpointer)
+
+
+@lru_cache(maxsize=64)
+def _cached_router(outputs: Optional[frozenset], checkpointer, memo_cache, slo_policy):
+    return build_question_router(checkpointer, memo_cache, sorted(outputs) if outputs else None, slo_policy)
+
+
+def get_question_router(
+    outputs: Optional[Iterable[str]] = None,
+    checkpointer=None,
+    memo_cache=None,
+    slo_policy=None,
+):
+    """요청 섹션 조합별로 컴파일된 그래프를 캐시해 재사용"""
+    return _cached_router(frozenset(outputs) if outputs else None, checkpointer, memo_cache, slo_policy)
 
 
 def build_legacy_router():
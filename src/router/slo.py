@@ -0,0 +1,271 @@
+"""
+지연 SLO 강등 모드
+
+노드별 최근 실행 시간(모드별 롤링 윈도우)으로 p95를 추적하고, 각 노드가 시작할 때
+"지금까지 걸린 시간 + 남은 노드들의 p95 임계 경로"가 요청 목표(SLO_TARGET_MS 또는 meta.slo_target_ms)를
+넘을 것으로 보이면, 결과 가치(NodeSpec.value)가 낮은 노드부터 경량 모델("mini") → fallback 순으로
+강등 계획을 세운다. 계획에 현재 노드가 포함되면 그 노드를 강등된 모드로 실행한다.
+
+p95는 SLO_SAMPLE_MAX_AGE초 안의 샘플로만 계산하고, 강등 계획에 든 노드도 SLO_PROBE_RATE 비율은 전체 모드로
+실행해(probe) 전체 모드 p95를 갱신한다. 일시적인 지연 급증으로 강등된 노드가 프로세스가 끝날 때까지
+강등된 채로 남지 않도록 하기 위해서다 (강등되면 전체 모드 샘플이 더 쌓이지 않는다).
+
+강등된 노드는 degraded 상태 키에 기록되고 aggregate_result가 result.meta.degraded로 내보낸다.
+강등된 출력은 노드 메모이제이션 캐시에 저장하지 않는다.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import replace
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+from src.router.dag import NodeSpec
+from src.utils.common import force_mini_llm
+from src.utils.metrics import FALLBACKS
+from src.utils.tracing import current_span
+
+MODE_FULL = "full"
+MODE_MINI = "mini"
+MODE_FALLBACK = "fallback"
+
+
+class LatencyTracker:
+    """
+    (노드, 모드)별 최근 실행 시간 롤링 윈도우와 진행 중인 노드 수
+
+    Args:
+        window: (노드, 모드)별 최대 샘플 수
+        min_samples: p95를 쓰기 위한 최소 샘플 수
+        max_age: 이 시간(초)보다 오래된 샘플은 p95에 쓰지 않음 (0이면 만료 없음)
+        probe_rate: 강등할 노드를 전체 모드로 실행해 볼 비율 (probe())
+    """
+
+    def __init__(self, window: int = 200, min_samples: int = 5, max_age: float = 0, probe_rate: float = 0):
+        self.window = window
+        self.min_samples = min_samples
+        self.max_age = max_age
+        self.probe_rate = probe_rate
+        # (노드, 모드) → [(기록 시각(monotonic), 실행 시간 ms), ...]
+        self._samples: Dict[Tuple[str, str], Deque[Tuple[float, float]]] = {}
+        self._lock = threading.Lock()
+        self.inflight = 0
+
+    def observe(self, node: str, mode: str, duration_ms: float) -> None:
+        with self._lock:
+            samples = self._samples.get((node, mode))
+            if samples is None:
+                samples = self._samples[(node, mode)] = deque(maxlen=self.window)
+            samples.append((time.monotonic(), duration_ms))
+
+    def _recent(self, node: str, mode: str) -> List[float]:
+        cutoff = time.monotonic() - self.max_age if self.max_age > 0 else None
+        with self._lock:
+            samples = self._samples.get((node, mode)) or ()
+            return [ms for at, ms in samples if cutoff is None or at >= cutoff]
+
+    def p95(self, node: str, mode: str = MODE_FULL) -> Optional[float]:
+        """max_age 안의 샘플이 min_samples보다 적으면 None"""
+        samples = sorted(self._recent(node, mode))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, math.ceil(0.95 * len(samples)) - 1)]
+
+    def probe(self) -> bool:
+        """강등 대신 전체 모드로 실행해 p95를 갱신할지 (probe_rate 확률)"""
+        return self.probe_rate > 0 and random.random() < self.probe_rate
+
+    def enter(self) -> None:
+        with self._lock:
+            self.inflight += 1
+
+    def exit(self) -> None:
+        with self._lock:
+            self.inflight -= 1
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            keys = list(self._samples)
+        out: Dict[str, Dict[str, Any]] = {}
+        for node, mode in keys:
+            out.setdefault(node, {})[mode] = {
+                "samples": len(self._recent(node, mode)),
+                "p95_ms": self.p95(node, mode),
+            }
+        return out
+
+
+class SLOPolicy:
+    """
+    Args:
+        tracker: 노드별 지연 추적기
+        target_ms: 기본 요청 목표 지연 (요청별로 meta.slo_target_ms가 우선, 0이면 강등하지 않음)
+        mini_factor: 경량 모델 실행 기록이 없을 때 전체 모델 p95 대비 예상 비율
+        max_inflight: 프로세스에서 동시에 실행 중인 노드가 이보다 많으면 LLM 노드 예상 시간을 비례해 늘림 (0이면 사용 안 함)
+    """
+
+    def __init__(
+        self,
+        tracker: LatencyTracker,
+        target_ms: float,
+        mini_factor: float = 0.5,
+        max_inflight: int = 0,
+    ):
+        self.tracker = tracker
+        self.target_ms = target_ms
+        self.mini_factor = mini_factor
+        self.max_inflight = max_inflight
+
+    def _modes(self, spec: NodeSpec) -> List[str]:
+        modes = []
+        for mode in spec.degrade:
+            # MINI_MODEL_NAME이 없으면 경량 모델 = 기본 모델이므로 강등 효과가 없다
+            if mode == MODE_MINI and not os.getenv("MINI_MODEL_NAME"):
+                continue
+            if mode == MODE_FALLBACK and spec.fallback is None:
+                continue
+            modes.append(mode)
+        return modes
+
+    def estimate(self, spec: NodeSpec, mode: str) -> float:
+        """노드를 mode로 실행할 때의 예상 시간(ms)"""
+        observed = self.tracker.p95(spec.name, mode)
+        if observed is None:
+            full = self.tracker.p95(spec.name, MODE_FULL) or 0.0
+            observed = {MODE_FULL: full, MODE_MINI: full * self.mini_factor}.get(mode, 0.0)
+        if mode != MODE_FALLBACK and self.max_inflight > 0:
+            observed *= max(1.0, self.tracker.inflight / self.max_inflight)
+        return observed
+
+    def projected_ms(
+        self,
+        elapsed_ms: float,
+        remaining: Sequence[NodeSpec],
+        deps: Dict[str, List[str]],
+        modes: Dict[str, str],
+    ) -> float:
+        """경과 시간 + 남은 노드들의 최장 경로 예상 시간"""
+        names = {spec.name for spec in remaining}
+        finish: Dict[str, float] = {}
+        for spec in remaining:  # 선언 순서 = 위상 순서
+            start = max((finish[p] for p in deps.get(spec.name, []) if p in names), default=0.0)
+            finish[spec.name] = start + self.estimate(spec, modes.get(spec.name, MODE_FULL))
+        return elapsed_ms + max(finish.values(), default=0.0)
+
+    def plan(
+        self,
+        node: str,
+        state: Dict[str, Any],
+        specs: Sequence[NodeSpec],
+        deps: Dict[str, List[str]],
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        현재 노드의 실행 모드 결정
+
+        Returns:
+            (mode, info) - info: {target_ms, projected_ms, planned_ms}
+        """
+        target = float((state.get("meta") or {}).get("slo_target_ms", self.target_ms) or 0)
+        if target <= 0:
+            return MODE_FULL, {}
+
+        timings = state.get("node_timings") or {}
+        now = time.time()
+        request_start = min((t["start"] for t in timings.values()), default=now)
+        elapsed = (now - request_start) * 1000
+        remaining = [spec for spec in specs if spec.name not in timings]
+
+        modes: Dict[str, str] = {}
+        projected = self.projected_ms(elapsed, remaining, deps, modes)
+        info = {"target_ms": round(target, 1), "projected_ms": round(projected, 1)}
+        if projected <= target:
+            return MODE_FULL, info
+
+        # 가치가 낮은 노드부터 한 단계씩 강등하며 목표 안에 들어올 때까지 계획
+        for spec in sorted(remaining, key=lambda s: s.value):
+            for mode in self._modes(spec):
+                modes[spec.name] = mode
+                projected = self.projected_ms(elapsed, remaining, deps, modes)
+                if projected <= target:
+                    break
+            if projected <= target:
+                break
+        info["planned_ms"] = round(projected, 1)
+        mode = modes.get(node, MODE_FULL)
+        if mode != MODE_FULL and self.tracker.probe():
+            # 전체 모드 p95가 회복됐는지 확인하는 실행 (결과는 강등 표시 없이 그대로 쓴다)
+            info["probe"] = True
+            return MODE_FULL, info
+        return mode, info
+
+
+def degradable_spec(
+    spec: NodeSpec,
+    policy: SLOPolicy,
+    specs: Sequence[NodeSpec],
+    deps: Dict[str, List[str]],
+) -> NodeSpec:
+    """실행 시간을 기록하고, 정책에 따라 경량 모델/fallback으로 실행하는 노드로 감싼 NodeSpec"""
+
+    def _run(state: Dict[str, Any]) -> Dict[str, Any]:
+        mode, info = policy.plan(spec.name, state, specs, deps) if spec.degrade else (MODE_FULL, {})
+        if info.get("probe"):
+            current_span().set(slo_probe=True)
+        if mode != MODE_FULL:
+            current_span().set(slo_mode=mode)
+            FALLBACKS.inc(node=spec.name, kind=f"slo_{mode}")
+        policy.tracker.enter()
+        start = time.perf_counter()
+        try:
+            if mode == MODE_FALLBACK:
+                output = spec.fallback(state) or {}
+            elif mode == MODE_MINI:
+                with force_mini_llm():
+                    output = spec.func(state) or {}
+            else:
+                output = spec.func(state) or {}
+        finally:
+            policy.tracker.exit()
+        policy.tracker.observe(spec.name, mode, (time.perf_counter() - start) * 1000)
+
+        if mode == MODE_FULL:
+            return output
+        degraded = {spec.name: {"mode": mode, "sections": list(spec.writes), **info}}
+        return {**output, "degraded": degraded}
+
+    _run.__name__ = getattr(spec.func, "__name__", spec.name)
+    _run.__module__ = getattr(spec.func, "__module__", __name__)
+    return replace(spec, func=_run)
+
+
+_POLICY: Optional[SLOPolicy] = None
+
+
+def slo_enabled() -> bool:
+    return float(os.getenv("SLO_TARGET_MS", "0") or 0) > 0
+
+
+def get_slo_policy() -> SLOPolicy:
+    """프로세스 전역 SLO 정책 (SLO_* 환경변수, 다시 호출하면 목표 지연은 환경변수로 갱신하고 지연 기록은 유지)"""
+    global _POLICY
+    if _POLICY is not None:
+        _POLICY.target_ms = float(os.getenv("SLO_TARGET_MS", "0") or 0)
+    else:
+        tracker = LatencyTracker(
+            window=int(os.getenv("SLO_WINDOW", "200")),
+            min_samples=int(os.getenv("SLO_MIN_SAMPLES", "5")),
+            max_age=float(os.getenv("SLO_SAMPLE_MAX_AGE", "600")),
+            probe_rate=float(os.getenv("SLO_PROBE_RATE", "0.05")),
+        )
+        _POLICY = SLOPolicy(
+            tracker,
+            target_ms=float(os.getenv("SLO_TARGET_MS", "0") or 0),
+            mini_factor=float(os.getenv("SLO_MINI_FACTOR", "0.5")),
+            max_inflight=int(os.getenv("SLO_MAX_INFLIGHT", "0")),
+        )
+    return _POLICY
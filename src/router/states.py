@@ -1,19 +1,34 @@
 from __future__ import annotations
 
-from typing import Dict, Any, TypedDict, List, Optional
+from typing import Annotated, Dict, Any, TypedDict, List, Optional
+
+
+def merge_dicts(left: Dict[str, Any], right: Dict[str, Any]) -> Dict[str, Any]:
+    """병렬 노드들이 같은 dict 키에 쓰는 값을 병합하는 리듀서 (None을 쓰면 비운다 - new_run_input)"""
+    if right is None:
+        return {}
+    return {**(left or {}), **(right or {})}
 
 
 class RouterState(TypedDict, total=False):
     # 입력
     utterances_ko: List[str]  # 한국어 대화 발화 리스트
+    transcript: str  # 전사 원문 (plain / jsonl / json STT 세그먼트 / srt / vtt) - src.utils.transcript
+    transcript_path: str  # 전사 파일 경로 (한 줄씩 읽는다)
+    transcript_format: str  # transcript / transcript_path 형식 (없으면 확장자나 첫 줄로 판단)
     challenge_spec: Dict[str, Any]  # 이번 주 챌린지 스펙
     meta: Dict[str, Any]  # 메타데이터
+    requested_outputs: List[str]  # 필요한 결과 섹션 (없으면 전체) - router.RESULT_SECTIONS 참고
     
     # 중간 처리 결과
     utterances_normalized: List[Dict[str, str]]  # ① preprocess 결과 (스피커 정규화) - [{speaker: "MOM"|"CHI", 발화내용_ko: str}, ...]
     utterances_en: List[Dict[str, Any]]  # ② translate 결과 (영어 번역) - [{speaker, korean, english, text, original_ko}, ...]
-    utterances_labeled: List[Dict[str, Any]]  # ③ label 결과 (라벨링된 발화)
-    patterns: List[Dict[str, Any]]  # ④ detect_patterns 결과 (탐지된 패턴)
+    utterances_labeled: List[Dict[str, Any]]  # 이전 형식의 라벨링된 발화 (이전 체크포인트 호환용, 노드는 쓰지 않음)
+    utterances_columns: Dict[str, Any]  # ③ label 결과 (UtteranceStore.to_state, dict 뷰는 get_labeled_utterances)
+    patterns: List[Dict[str, Any]]  # ④ detect_patterns 결과 (규칙 패턴, reconcile_patterns 이후 병합 패턴)
+    patterns_llm: List[Dict[str, Any]]  # ④-2 LLM 패턴 (reconcile_patterns가 백그라운드 작업에서 받아 채움)
+    patterns_llm_job: Optional[str]  # ④-2 enrich_patterns의 백그라운드 LLM 작업 키
+    pattern_enrichment: Dict[str, Any]  # ④-3 reconcile_patterns 병합 요약 (재실행 노드 등)
     
     # 병렬 분석 결과
     summary: str  # ⑤ summarize 결과
@@ -24,6 +39,12 @@ class RouterState(TypedDict, total=False):
     
     # 최종 결과
     result: Dict[str, Any]  # ⑩ aggregate_result 최종 JSON
+    persistence: Dict[str, Any]  # ⑪ persist_result 저장 요청 상태 - {session_key, queued}
+    
+    # 실행 진단
+    node_timings: Annotated[Dict[str, Dict[str, Any]], merge_dicts]  # 노드별 {start, end, deps}
+    degraded: Annotated[Dict[str, Dict[str, Any]], merge_dicts]  # SLO 강등 모드로 실행된 노드별 {mode, sections, target_ms, projected_ms}
+    profile: Annotated[Dict[str, Dict[str, Any]], merge_dicts]  # meta.profile 요청의 노드별 {wall_ms, stacks, top_functions, memory}
     
     # 기존 필드 (하위 호환성)
     message: str
@@ -33,3 +54,12 @@ class RouterState(TypedDict, total=False):
     annotated: str
     highlights: List[str]
     advice: str
+
+
+def new_run_input(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    새 입력으로 시작하는 실행의 그래프 입력
+    체크포인터가 있으면 같은 thread_id의 이전 실행 채널 값(requested_outputs, challenge_spec, node_timings 등)이
+    그대로 남으므로, 입력에 없는 상태 키를 모두 None으로 덮어 지운다.
+    """
+    return {**{key: None for key in RouterState.__annotations__}, **state}
@@ -0,0 +1,539 @@
+"""
+프리포크 HTTP 서버 (운영용)
+
+    python -m src.server                      # SERVER_WORKERS (기본: CPU 코어 수)개 워커, 0.0.0.0:8000
+    python -m src.server --workers 4 --port 8080
+
+마스터 프로세스가 에이전트 모듈을 임포트해 그래프를 컴파일하고 ELECTRA 모델을 한 번 로드한 뒤
+리스닝 소켓을 열고 워커를 fork한다. 워커는 모델 가중치를 copy-on-write로 공유하며,
+각자 asyncio 이벤트 루프(uvicorn)에서 같은 소켓으로 요청을 받는다.
+
+엔드포인트:
+- POST /analyze: 분석 실행 후 최종 결과 반환
+- POST /stream: 노드가 끝날 때마다 SSE 이벤트(node), 마지막에 result 이벤트
+- GET /health: 워커 상태 (drain 중이면 503)
+- GET /metrics: Prometheus 텍스트 형식 메트릭 (모든 워커 합계, src.utils.metrics)
+- WebSocket /live: 실시간 세션 (src.live) - 연결 하나가 세션 하나라 세션 상태는 연결을 받은 워커에만 있다
+    → {"type": "start", meta?, challenge_spec?}  (선택, 첫 메시지)
+    → {"type": "utterance", text, speaker?, start?, end?}  ← {"type": "utterance", index, utterance, patterns, style, ...}
+    → {"type": "snapshot"}  ← {"type": "snapshot", ...}
+    → {"type": "end"}  ← {"type": "end", ...} 후 연결 종료
+    ← {"type": "analysis", name, trigger, at, offset, <name>: ...}  (주기/이벤트 LLM 분석이 끝날 때)
+
+요청 본문: {utterances_ko | transcript(+transcript_format) | message, challenge_spec?, meta?, outputs?, thread_id?}
+(thread_id를 다시 써도 새 실행으로 시작한다 - 이전 실행의 requested_outputs, challenge_spec, node_timings 등은 지운다)
+X-Profile: 1 헤더(또는 meta.profile=true)를 보내면 노드별 CPU/메모리 프로파일을 result.meta.profile에 담는다.
+
+시그널 (마스터):
+- SIGTERM / SIGINT: drain - 워커의 /health를 503으로 바꾸고 SERVER_DRAIN_DELAY초 뒤(로드밸런서 제외 대기)
+  새 연결을 받지 않고 진행 중인 요청을 마친 다음 종료 (최대 SERVER_DRAIN_TIMEOUT초)
+- SIGHUP: graceful reload - 마스터가 .env를 다시 읽고 같은 인자로 자신을 다시 실행(exec)한다.
+  모듈을 새로 임포트하므로 임포트 시점에 읽는 설정(PATTERN_LLM_ENRICH, STYLE_LLM_NARRATIVE, USE_DPICS_ELECTRA 등)과
+  체크포인터/메모 캐시 싱글톤, 코드 변경까지 반영된다. 리스닝 소켓과 이전 세대 워커는 새 마스터가 넘겨받아
+  새 세대 워커를 띄운 뒤 이전 세대를 drain한다
+- 워커가 비정상 종료하면 같은 세대로 다시 띄운다
+
+워커별 메트릭은 METRICS_DIR(없으면 마스터가 만든 임시 디렉터리)에 METRICS_FLUSH_INTERVAL초마다
+스냅샷으로 기록되고, /metrics를 받은 워커가 모든 스냅샷을 합쳐 응답한다.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import signal
+import shutil
+import socket
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from src.graph import get_graph
+from src.router.states import new_run_input
+from src.utils import metrics
+from src.utils.challenge_spec import compile_challenge_spec
+from src.utils.log import get_logger
+from src.utils.tracing import shutdown_tracing, span
+from src.utils.transcript import FORMATS as TRANSCRIPT_FORMATS
+
+log = get_logger(__name__)
+
+DEFAULT_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+DEFAULT_PORT = int(os.getenv("SERVER_PORT", "8000"))
+DRAIN_DELAY = float(os.getenv("SERVER_DRAIN_DELAY", "0"))
+DRAIN_TIMEOUT = float(os.getenv("SERVER_DRAIN_TIMEOUT", "30"))
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+LIVE_MAX_SESSIONS = int(os.getenv("LIVE_MAX_SESSIONS", "100"))
+LIVE_IDLE_TIMEOUT = float(os.getenv("LIVE_IDLE_TIMEOUT", "300"))
+
+# reload(exec) 때 새 마스터에 넘기는 상태
+_ENV_LISTEN_FD = "_SERVER_LISTEN_FD"
+_ENV_OLD_WORKERS = "_SERVER_OLD_WORKERS"
+_ENV_GENERATION = "_SERVER_GENERATION"
+_ENV_OWNED_METRICS_DIR = "_SERVER_OWNED_METRICS_DIR"
+
+
+# ---------------------------------------------------------------------- #
+# 워커 (HTTP 앱)
+# ---------------------------------------------------------------------- #
+class _WorkerState:
+    def __init__(self, generation: int = 0):
+        self.generation = generation
+        self.started = time.time()
+        self.draining = False
+        self.inflight = 0
+        self.live_sessions = 0
+
+
+_STATE = _WorkerState()
+
+
+def _request_state(body: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any], Optional[List[str]]]:
+    """요청 본문 → (그래프 입력 상태, 실행 config, 요청 섹션)"""
+    if not isinstance(body, dict):
+        raise ValueError("요청 본문은 JSON 객체여야 합니다.")
+    state: Dict[str, Any] = {}
+    if body.get("utterances_ko"):
+        state["utterances_ko"] = list(body["utterances_ko"])
+    elif body.get("transcript"):
+        # STT 결과 / 자막 원문 (서버에서는 파일 경로 입력을 받지 않는다)
+        state["transcript"] = str(body["transcript"])
+        fmt = body.get("transcript_format")
+        if fmt:
+            if fmt not in TRANSCRIPT_FORMATS:
+                raise ValueError(f"알 수 없는 전사 형식입니다: {fmt} (가능: {list(TRANSCRIPT_FORMATS)})")
+            state["transcript_format"] = fmt
+    elif body.get("message"):
+        state["message"] = str(body["message"])
+    else:
+        raise ValueError("utterances_ko, transcript 또는 message가 필요합니다.")
+    for key in ("challenge_spec", "meta"):
+        if body.get(key):
+            state[key] = body[key]
+    if state.get("challenge_spec"):
+        # 측정 가능한 criteria의 잘못된 값은 LLM 판정으로 넘기지 않고 400으로 알린다
+        compile_challenge_spec(state["challenge_spec"], strict=True)
+    outputs = body.get("outputs") or None
+    if outputs:
+        state["requested_outputs"] = list(outputs)
+    # 같은 thread_id로 다시 보내도 이전 실행의 입력/진단 채널은 이어받지 않는다
+    thread_id = str(body.get("thread_id") or uuid.uuid4())
+    return new_run_input(state), {"configurable": {"thread_id": thread_id}}, outputs
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+class _BadRequest(Exception):
+    pass
+
+
+def create_app():
+    """Starlette 앱 (워커마다 하나)"""
+    from starlette.applications import Starlette
+    from starlette.requests import Request
+    from starlette.responses import JSONResponse, Response, StreamingResponse
+    from starlette.routing import Route, WebSocketRoute
+    from starlette.websockets import WebSocket, WebSocketDisconnect
+
+    async def _parse(request: Request):
+        try:
+            body = await request.json()
+            state, config, outputs = _request_state(body)
+            if request.headers.get("x-profile", "").lower() in ("1", "true"):
+                # 요청별 프로파일링 (결과의 meta.profile, src.router.profiling)
+                state["meta"] = {**(state.get("meta") or {}), "profile": True}
+            return state, config, get_graph(outputs)
+        except (ValueError, TypeError) as e:
+            # 잘못된 JSON, 입력 누락, 알 수 없는 결과 섹션
+            raise _BadRequest(str(e))
+
+    async def analyze(request: Request):
+        try:
+            state, config, app = await _parse(request)
+        except _BadRequest as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+        _STATE.inflight += 1
+        try:
+            with span("session", thread_id=config["configurable"]["thread_id"]), metrics.track_session():
+                final = await app.ainvoke(state, config)
+        except Exception as e:
+            log.warning("Analyze error: %s", e)
+            return JSONResponse({"error": "분석 중 오류가 발생했습니다."}, status_code=500)
+        finally:
+            _STATE.inflight -= 1
+        return JSONResponse({
+            "thread_id": config["configurable"]["thread_id"],
+            "result": (final or {}).get("result"),
+        })
+
+    async def stream(request: Request):
+        try:
+            state, config, app = await _parse(request)
+        except _BadRequest as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+
+        async def events() -> AsyncIterator[str]:
+            _STATE.inflight += 1
+            try:
+                yield _sse("start", {"thread_id": config["configurable"]["thread_id"]})
+                with span("session", thread_id=config["configurable"]["thread_id"], stream=True), \
+                        metrics.track_session():
+                    async for chunk in app.astream(state, config, stream_mode="updates"):
+                        for node, update in (chunk or {}).items():
+                            update = update or {}
+                            if "result" in update:
+                                yield _sse("result", update["result"])
+                            else:
+                                yield _sse("node", {"node": node, "keys": sorted(k for k in update if k != "node_timings")})
+            except Exception as e:
+                log.warning("Stream error: %s", e)
+                yield _sse("error", {"error": "분석 중 오류가 발생했습니다."})
+            finally:
+                _STATE.inflight -= 1
+            yield _sse("end", {})
+
+        return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+    async def health(request: Request):
+        electra = sys.modules.get("src.utils.dpics_electra")
+        body = {
+            "status": "draining" if _STATE.draining else "ok",
+            "pid": os.getpid(),
+            "generation": _STATE.generation,
+            "inflight": _STATE.inflight,
+            "live_sessions": _STATE.live_sessions,
+            "uptime_s": round(time.time() - _STATE.started, 1),
+            "electra_loaded": bool(electra and electra._model_instance is not None),
+        }
+        return JSONResponse(body, status_code=503 if _STATE.draining else 200)
+
+    async def live(websocket: WebSocket):
+        if _STATE.draining or _STATE.live_sessions >= LIVE_MAX_SESSIONS:
+            # 1013: try again later (다른 워커 / 잠시 후 재연결)
+            await websocket.close(code=1013)
+            return
+        await websocket.accept()
+        from src.live import LiveSession
+
+        loop = asyncio.get_running_loop()
+        outbox: asyncio.Queue = asyncio.Queue()
+
+        async def sender():
+            # 발화 응답과 분석 스레드의 이벤트를 한 곳에서 순서대로 보낸다 (None이면 종료)
+            while True:
+                message = await outbox.get()
+                if message is None:
+                    return
+                await websocket.send_text(json.dumps(message, ensure_ascii=False, default=str))
+
+        def on_analysis(event: Dict[str, Any]) -> None:
+            loop.call_soon_threadsafe(outbox.put_nowait, event)
+
+        session: Optional[LiveSession] = None
+        sending = asyncio.create_task(sender())
+        _STATE.live_sessions += 1
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(websocket.receive_json(), LIVE_IDLE_TIMEOUT or None)
+                except asyncio.TimeoutError:
+                    outbox.put_nowait({"type": "end", "reason": "idle", **(session.close() if session else {})})
+                    break
+                except (ValueError, TypeError):
+                    outbox.put_nowait({"type": "error", "error": "메시지는 JSON 객체여야 합니다."})
+                    continue
+                kind = message.get("type", "utterance") if isinstance(message, dict) else None
+                try:
+                    if kind == "start" and session is None:
+                        session = LiveSession(
+                            meta=message.get("meta"),
+                            challenge_spec=message.get("challenge_spec"),
+                            on_analysis=on_analysis,
+                        )
+                        outbox.put_nowait({"type": "start", "session_id": session.session_id})
+                    elif kind == "utterance":
+                        session = session or LiveSession(on_analysis=on_analysis)
+                        update = await asyncio.to_thread(session.append, message)
+                        if update is not None:
+                            outbox.put_nowait({"type": "utterance", **update})
+                    elif kind == "snapshot" and session is not None:
+                        outbox.put_nowait({"type": "snapshot", **session.snapshot()})
+                    elif kind == "end":
+                        outbox.put_nowait({"type": "end", **(session.close() if session else {})})
+                        break
+                    else:
+                        outbox.put_nowait({"type": "error", "error": f"알 수 없는 메시지입니다: {kind}"})
+                except ValueError as e:
+                    outbox.put_nowait({"type": "error", "error": str(e)})
+                except Exception as e:
+                    log.warning("Live session error: %s", e)
+                    outbox.put_nowait({"type": "error", "error": "발화 처리 중 오류가 발생했습니다."})
+            # 남은 메시지를 보내고 연결 종료
+            outbox.put_nowait(None)
+            await sending
+            await websocket.close()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            sending.cancel()
+            if session is not None:
+                session.close()
+            _STATE.live_sessions -= 1
+
+    async def metrics_endpoint(request: Request):
+        body = await asyncio.to_thread(metrics.render_metrics)
+        return Response(body, media_type=metrics.CONTENT_TYPE)
+
+    async def flush_metrics():
+        # 다른 워커가 /metrics를 받았을 때 이 워커의 값도 합쳐지도록 주기적으로 스냅샷 기록
+        while True:
+            await asyncio.sleep(METRICS_FLUSH_INTERVAL)
+            await asyncio.to_thread(metrics.write_snapshot)
+
+    @asynccontextmanager
+    async def lifespan(app):
+        # 마스터가 SIGUSR1을 보내면 drain 시작 (/health가 503을 반환해 로드밸런서에서 빠진다)
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGUSR1, lambda: setattr(_STATE, "draining", True))
+        flusher = asyncio.create_task(flush_metrics())
+        yield
+        flusher.cancel()
+        from src.utils.result_sink import shutdown_result_sink
+
+        shutdown_result_sink()
+        shutdown_tracing()
+        metrics.write_snapshot()
+
+    return Starlette(
+        routes=[
+            Route("/analyze", analyze, methods=["POST"]),
+            Route("/stream", stream, methods=["POST"]),
+            Route("/health", health, methods=["GET"]),
+            Route("/metrics", metrics_endpoint, methods=["GET"]),
+            WebSocketRoute("/live", live),
+        ],
+        lifespan=lifespan,
+    )
+
+
+def _worker_main(sock: socket.socket, generation: int, torch_threads: int) -> None:
+    import uvicorn
+
+    global _STATE
+    _STATE = _WorkerState(generation)
+    # 마스터(warm-up)가 기록한 값은 버리고 워커별 스냅샷 파일을 새로 쓴다
+    metrics.reset_metrics()
+    # 마스터가 설치한 핸들러 대신 uvicorn의 종료 처리(SIGTERM/SIGINT)를 사용
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    # reload는 마스터만 처리, SIGUSR1은 앱 시작 후 drain 핸들러로 교체
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+    torch = sys.modules.get("torch")
+    if torch is not None and torch_threads > 0:
+        # 코어를 워커 수로 나눠 쓴다 (워커마다 전체 코어를 쓰면 과다 구독)
+        torch.set_num_threads(torch_threads)
+
+    config = uvicorn.Config(
+        create_app(),
+        lifespan="on",
+        access_log=False,
+        log_level=os.getenv("SERVER_LOG_LEVEL", "info"),
+        timeout_graceful_shutdown=int(DRAIN_TIMEOUT),
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+# ---------------------------------------------------------------------- #
+# 마스터
+# ---------------------------------------------------------------------- #
+def warm_up() -> None:
+    """fork 전에 그래프 컴파일(에이전트 모듈 임포트)과 ELECTRA 모델 로드"""
+    get_graph()
+
+    from src.expert.label_agent import ELECTRA_AVAILABLE, USE_ELECTRA
+
+    if not (USE_ELECTRA and ELECTRA_AVAILABLE):
+        return
+    if int(os.getenv("DPICS_ELECTRA_WORKERS", "0") or 0) > 0:
+        log.warning("DPICS_ELECTRA_WORKERS > 0이면 HTTP 워커마다 추론 프로세스 풀이 생깁니다. 서버 모드에서는 0을 권장합니다.")
+        return
+    try:
+        from src.utils.dpics_electra import _get_model
+
+        _get_model()
+    except Exception as e:
+        log.warning("ELECTRA 모델 사전 로드 실패 (요청 시 LLM 라벨링으로 폴백): %s", e)
+
+
+class PreforkServer:
+    """
+    Args:
+        host / port: 리스닝 주소
+        workers: 워커 프로세스 수
+    """
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, workers: int = 0):
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.torch_threads = max(1, (os.cpu_count() or 1) // self.workers)
+        self.generation = 0
+        self.children: Dict[int, int] = {}  # pid -> generation
+        self.sock: Optional[socket.socket] = None
+        self._signals: List[int] = []
+
+    def _bind(self) -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        return sock
+
+    def _spawn(self) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _worker_main(self.sock, self.generation, self.torch_threads)
+            except BaseException as e:
+                log.error("Worker %d error: %s", os.getpid(), e)
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = self.generation
+
+    def _drain(self, pids: List[int]) -> None:
+        """워커를 drain 상태로 바꾸고 SERVER_DRAIN_DELAY초 뒤 종료 요청"""
+        for pid in pids:
+            self._kill(pid, signal.SIGUSR1)
+        if DRAIN_DELAY > 0:
+            time.sleep(DRAIN_DELAY)
+        for pid in pids:
+            self._kill(pid, signal.SIGTERM)
+
+    @staticmethod
+    def _kill(pid: int, sig: int) -> None:
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def _reap(self) -> List[Tuple[int, int]]:
+        exited = []
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            if pid in self.children:
+                exited.append((pid, self.children.pop(pid)))
+        return exited
+
+    def reload(self) -> None:
+        """
+        같은 인자로 마스터를 다시 실행 (워커는 마스터에서 fork되므로 마스터의 모듈 상태를 새로 만들어야
+        임포트 시점 설정과 싱글톤이 바뀐다). 소켓 fd, 이전 세대 워커 pid, 다음 세대 번호는 환경변수로 넘긴다.
+        """
+        load_dotenv(override=True)
+        os.environ[_ENV_LISTEN_FD] = str(self.sock.fileno())
+        os.environ[_ENV_OLD_WORKERS] = ",".join(str(pid) for pid in self.children)
+        os.environ[_ENV_GENERATION] = str(self.generation + 1)
+        log.info("Reload: re-executing master with %d workers to drain", len(self.children))
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.execv(sys.executable, [sys.executable, *sys.orig_argv[1:]])
+
+    def _take_over(self) -> List[int]:
+        """reload 전 마스터가 넘긴 소켓/세대를 이어받고, drain할 이전 세대 워커 pid 반환"""
+        fd = os.environ.pop(_ENV_LISTEN_FD, None)
+        old = [int(pid) for pid in os.environ.pop(_ENV_OLD_WORKERS, "").split(",") if pid]
+        self.generation = int(os.environ.pop(_ENV_GENERATION, "0"))
+        if fd is None:
+            self.sock = self._bind()
+            return []
+        self.sock = socket.socket(fileno=int(fd))
+        self.sock.set_inheritable(True)
+        for pid in old:
+            # exec해도 pid가 같으므로 이전 세대 워커는 여전히 이 프로세스의 자식이다 (다시 띄우지 않는 세대로 등록)
+            self.children[pid] = -1
+        return old
+
+    def shutdown(self) -> None:
+        log.info("Draining %d workers", len(self.children))
+        self._drain(list(self.children))
+        deadline = time.time() + DRAIN_DELAY + DRAIN_TIMEOUT + 5
+        while self.children and time.time() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in list(self.children):
+            self._kill(pid, signal.SIGKILL)
+        self._reap()
+
+    def run(self) -> None:
+        load_dotenv()
+        metrics_dir = os.getenv(_ENV_OWNED_METRICS_DIR)
+        if not os.getenv("METRICS_DIR"):
+            # 워커들이 메트릭 스냅샷을 공유할 디렉터리 (fork 후 환경변수로 상속, reload 후 마스터가 이어서 정리)
+            metrics_dir = os.environ["METRICS_DIR"] = os.environ[_ENV_OWNED_METRICS_DIR] = tempfile.mkdtemp(
+                prefix="linkid-metrics-"
+            )
+        try:
+            self._serve()
+        finally:
+            if metrics_dir is not None:
+                shutil.rmtree(metrics_dir, ignore_errors=True)
+
+    def _serve(self) -> None:
+        # warm-up 중에 온 시그널도 루프에서 처리 (SIGHUP 기본 동작은 종료)
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(sig, lambda signum, frame: self._signals.append(signum))
+        warm_up()
+        old = self._take_over()
+
+        for _ in range(self.workers):
+            self._spawn()
+        log.info("Serving on %s:%d with %d workers (master pid %d, generation %d)",
+                 self.host, self.port, self.workers, os.getpid(), self.generation)
+        if old:
+            log.info("Reload: generation %d started, draining %d workers", self.generation, len(old))
+            self._drain(old)
+
+        while True:
+            while self._signals:
+                signum = self._signals.pop(0)
+                if signum == signal.SIGHUP:
+                    self.reload()
+                else:
+                    self.shutdown()
+                    self.sock.close()
+                    return
+            for pid, generation in self._reap():
+                # 현재 세대 워커가 죽으면 다시 띄운다 (drain된 이전 세대는 그대로 정리)
+                if generation == self.generation:
+                    log.warning("Worker %d exited, restarting", pid)
+                    self._spawn()
+            time.sleep(0.2)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="프리포크 HTTP 서버")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SERVER_WORKERS", "0") or 0),
+                        help="워커 수 (기본: CPU 코어 수)")
+    args = parser.parse_args()
+    PreforkServer(args.host, args.port, args.workers).run()
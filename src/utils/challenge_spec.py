@@ -0,0 +1,288 @@
+"""
+주간 챌린지 스펙 언어
+
+challenge_spec의 criteria 리스트에 측정 가능한 조건을 선언하면 LLM 없이 판정할 수 있다.
+
+    {
+      "title": "칭찬 5번 하기",
+      "criteria": [
+        {"type": "count", "label": "PR", "min": 5},
+        {"type": "sequence", "first": "RD", "then": "CMD", "window": 3, "min_ratio": 0.5},
+        {"type": "ratio", "numerator": ["PR"], "denominator": ["CMD", "NEG"], "min": 1.0},
+        {"type": "pattern", "pattern": "비판적반응", "max": 0}
+      ]
+    }
+
+- count: speaker(기본 Parent)의 label 발화 수에 대한 min/max
+- ratio: numerator 라벨 수 / denominator 라벨 수 (denominator 생략 시 speaker 전체 발화 수)
+- sequence: then 라벨 발화 중 직전 window개 발화 안에 first 라벨이 있었던 비율(min_ratio) 또는 횟수(min)
+- pattern: 탐지된 패턴 중 해당 이름의 수에 대한 min/max
+"""
+
+from __future__ import annotations
+
+import math
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+from src.utils.log import get_logger
+
+log = get_logger(__name__)
+
+
+class ChallengeSpecError(ValueError):
+    pass
+
+
+def _as_list(value: Any) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return [str(v) for v in value]
+
+
+def _threshold_score(value: float, minimum: Optional[float], maximum: Optional[float]) -> Tuple[bool, float]:
+    """임계값 충족 여부와 0~1 달성도"""
+    met = True
+    score = 1.0
+    if minimum is not None:
+        if value < minimum:
+            met = False
+            score = min(score, value / minimum if minimum > 0 else 0.0)
+    if maximum is not None:
+        if value > maximum:
+            met = False
+            score = min(score, maximum / value if maximum > 0 else 0.0)
+    return met, score
+
+
+def _number(raw: Dict[str, Any], key: str) -> Optional[float]:
+    """조건의 수치 필드 (숫자 문자열은 변환, 그 외 타입이면 ChallengeSpecError)"""
+    value = raw.get(key)
+    if value is None:
+        return None
+    if not isinstance(value, bool):
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            number = math.nan
+        if math.isfinite(number):
+            return number
+    raise ChallengeSpecError(f"{raw.get('type')} 조건의 {key} 값은 숫자여야 합니다: {value!r}")
+
+
+class _Criterion(ABC):
+    kind = ""
+
+    def __init__(self, raw: Dict[str, Any]):
+        self.raw = raw
+        self.speaker = raw.get("speaker", "Parent")
+        self.minimum = _number(raw, "min")
+        self.maximum = _number(raw, "max")
+
+    def feed(self, i: int, speaker: str, label: str) -> None:
+        """발화 하나 반영 (발화 시퀀스를 쓰지 않는 조건은 무시)"""
+
+    @abstractmethod
+    def result(self, patterns: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """{value, met, score, evidence}"""
+
+
+class _CountCriterion(_Criterion):
+    kind = "count"
+
+    def __init__(self, raw: Dict[str, Any]):
+        super().__init__(raw)
+        self.labels = set(_as_list(raw.get("label") or raw.get("labels")))
+        if not self.labels:
+            raise ChallengeSpecError("count 조건에는 label이 필요합니다.")
+        if self.minimum is None and self.maximum is None:
+            raise ChallengeSpecError("count 조건에는 min 또는 max가 필요합니다.")
+        self.indices: List[int] = []
+
+    def feed(self, i: int, speaker: str, label: str) -> None:
+        if speaker == self.speaker and label in self.labels:
+            self.indices.append(i)
+
+    def result(self, patterns: List[Dict[str, Any]]) -> Dict[str, Any]:
+        value = len(self.indices)
+        met, score = _threshold_score(value, self.minimum, self.maximum)
+        return {"value": value, "met": met, "score": score, "evidence": self.indices}
+
+
+class _RatioCriterion(_Criterion):
+    kind = "ratio"
+
+    def __init__(self, raw: Dict[str, Any]):
+        super().__init__(raw)
+        self.numerator = set(_as_list(raw.get("numerator")))
+        self.denominator = set(_as_list(raw.get("denominator")))
+        if not self.numerator:
+            raise ChallengeSpecError("ratio 조건에는 numerator가 필요합니다.")
+        if self.minimum is None and self.maximum is None:
+            raise ChallengeSpecError("ratio 조건에는 min 또는 max가 필요합니다.")
+        self.num_indices: List[int] = []
+        self.den_count = 0
+
+    def feed(self, i: int, speaker: str, label: str) -> None:
+        if speaker != self.speaker:
+            return
+        if label in self.numerator:
+            self.num_indices.append(i)
+        if not self.denominator or label in self.denominator:
+            self.den_count += 1
+
+    def result(self, patterns: List[Dict[str, Any]]) -> Dict[str, Any]:
+        if self.den_count == 0:
+            # 분모가 없으면 분자가 있을 때 무한대로, 없을 때 0으로 본다
+            value = float("inf") if self.num_indices else 0.0
+        else:
+            value = len(self.num_indices) / self.den_count
+        met, score = _threshold_score(value, self.minimum, self.maximum)
+        return {
+            "value": value if value != float("inf") else None,
+            "met": met,
+            "score": score,
+            "evidence": self.num_indices,
+        }
+
+
+class _SequenceCriterion(_Criterion):
+    kind = "sequence"
+
+    def __init__(self, raw: Dict[str, Any]):
+        super().__init__(raw)
+        self.first = set(_as_list(raw.get("first")))
+        self.then = set(_as_list(raw.get("then")))
+        if not self.first or not self.then:
+            raise ChallengeSpecError("sequence 조건에는 first와 then이 필요합니다.")
+        window = _number(raw, "window")
+        self.window = int(window) if window is not None else 1
+        if self.window < 1:
+            raise ChallengeSpecError(f"sequence 조건의 window 값은 1 이상이어야 합니다: {raw.get('window')!r}")
+        self.min_ratio = _number(raw, "min_ratio")
+        if self.min_ratio is None and self.minimum is None and self.maximum is None:
+            raise ChallengeSpecError("sequence 조건에는 min_ratio, min 또는 max가 필요합니다.")
+        self.recent_first: Deque[int] = deque()
+        self.then_total = 0
+        self.pairs: List[Tuple[int, int]] = []
+
+    def feed(self, i: int, speaker: str, label: str) -> None:
+        while self.recent_first and i - self.recent_first[0] > self.window:
+            self.recent_first.popleft()
+        if speaker != self.speaker:
+            return
+        if label in self.then:
+            self.then_total += 1
+            if self.recent_first:
+                self.pairs.append((self.recent_first[-1], i))
+        if label in self.first:
+            self.recent_first.append(i)
+
+    def result(self, patterns: List[Dict[str, Any]]) -> Dict[str, Any]:
+        count = len(self.pairs)
+        ratio = (count / self.then_total) if self.then_total else 1.0
+        met, score = _threshold_score(count, self.minimum, self.maximum)
+        if self.min_ratio is not None:
+            ratio_met, ratio_score = _threshold_score(ratio, self.min_ratio, None)
+            met = met and ratio_met
+            score = min(score, ratio_score)
+        return {
+            "value": count,
+            "ratio": ratio,
+            "met": met,
+            "score": score,
+            "evidence": sorted({idx for pair in self.pairs for idx in pair}),
+        }
+
+
+class _PatternCriterion(_Criterion):
+    kind = "pattern"
+
+    def __init__(self, raw: Dict[str, Any]):
+        super().__init__(raw)
+        self.names = set(_as_list(raw.get("pattern") or raw.get("patterns")))
+        if not self.names:
+            raise ChallengeSpecError("pattern 조건에는 pattern이 필요합니다.")
+        if self.minimum is None and self.maximum is None:
+            raise ChallengeSpecError("pattern 조건에는 min 또는 max가 필요합니다.")
+
+    def result(self, patterns: List[Dict[str, Any]]) -> Dict[str, Any]:
+        matched = [p for p in patterns if p.get("pattern_name") in self.names]
+        met, score = _threshold_score(len(matched), self.minimum, self.maximum)
+        evidence = sorted({idx for p in matched for idx in p.get("utterance_indices", []) if isinstance(idx, int)})
+        return {"value": len(matched), "met": met, "score": score, "evidence": evidence}
+
+
+_CRITERIA = {
+    cls.kind: cls
+    for cls in (_CountCriterion, _RatioCriterion, _SequenceCriterion, _PatternCriterion)
+}
+
+
+class CompiledChallenge:
+    """컴파일된 챌린지 평가기 (발화 시퀀스를 한 번 훑어 모든 조건을 계산)"""
+
+    def __init__(self, spec: Dict[str, Any], criteria_raw: List[Dict[str, Any]]):
+        self.spec = spec
+        self.criteria_raw = criteria_raw
+
+    def evaluate(
+        self,
+        utterances: Iterable[Tuple[str, str]],
+        patterns: Optional[List[Dict[str, Any]]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Args:
+            utterances: (speaker, label) 시퀀스
+            patterns: 탐지된 패턴 리스트
+
+        Returns:
+            {challenge_met, score, evidence, criteria}
+        """
+        # 평가마다 새 상태로 시작 (평가기는 여러 세션에 재사용된다)
+        criteria = [_CRITERIA[raw["type"]](raw) for raw in self.criteria_raw]
+        for i, (speaker, label) in enumerate(utterances):
+            for criterion in criteria:
+                criterion.feed(i, speaker, label)
+
+        results = []
+        evidence: List[int] = []
+        for criterion in criteria:
+            res = criterion.result(patterns or [])
+            results.append({"type": criterion.kind, **{k: v for k, v in criterion.raw.items() if k != "type"}, **res})
+            evidence.extend(res["evidence"])
+
+        score = round(100 * sum(r["score"] for r in results) / len(results))
+        return {
+            "challenge_met": all(r["met"] for r in results),
+            "score": score,
+            "evidence": sorted(set(evidence)),
+            "criteria": results,
+        }
+
+
+def compile_challenge_spec(spec: Dict[str, Any], strict: bool = False) -> Optional[CompiledChallenge]:
+    """
+    challenge_spec을 평가기로 컴파일
+    criteria가 없으면 None (LLM 판정으로 폴백)
+    해석할 수 없는 조건이 있으면 strict=False일 때 None, strict=True일 때 ChallengeSpecError (ValueError)
+    (요청 검증이나 일괄 재채점처럼 잘못된 스펙을 LLM 판정으로 넘기지 않아야 하는 곳은 strict=True)
+    """
+    criteria_raw = spec.get("criteria") if isinstance(spec, dict) else None
+    if not isinstance(criteria_raw, list) or not criteria_raw:
+        return None
+    try:
+        for raw in criteria_raw:
+            if not isinstance(raw, dict) or raw.get("type") not in _CRITERIA:
+                raise ChallengeSpecError(f"알 수 없는 조건입니다: {raw}")
+            # 생성자에서 필수 필드와 수치 필드 검증
+            _CRITERIA[raw["type"]](raw)
+    except ChallengeSpecError as e:
+        if strict:
+            raise
+        log.warning("Challenge spec compile error: %s", e)
+        return None
+    return CompiledChallenge(spec, criteria_raw)
@@ -1,13 +1,27 @@
 from __future__ import annotations
 
 import os
-from typing import Any, Optional, Type
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, Optional, Type
 
 from dotenv import load_dotenv
 from pydantic import BaseModel
 
 load_dotenv()
 
+# SLO 강등 모드: 이 컨텍스트 안에서는 get_llm(mini=False)도 경량 모델을 반환
+_FORCE_MINI: ContextVar[bool] = ContextVar("force_mini_llm", default=False)
+
+
+@contextmanager
+def force_mini_llm() -> Iterator[None]:
+    token = _FORCE_MINI.set(True)
+    try:
+        yield
+    finally:
+        _FORCE_MINI.reset(token)
+
 
 def _get_provider() -> str:
     provider = os.getenv("MODEL_PROVIDER", "openai").lower()
@@ -20,8 +34,35 @@ def get_provider() -> str:
     return _get_provider()
 
 
+_RATE_LIMITER: Any = None
+
+
+def _llm_options(provider: str) -> dict:
+    """
+    모든 제공자 모델에 공통으로 넘기는 옵션
+    - 메트릭 콜백 (노드/제공자별 LLM 호출, 토큰, 오류 카운터)
+    - 트레이싱 콜백 (TRACE_SAMPLE_RATE > 0일 때 llm.call span)
+    - LLM_RATE_LIMIT_RPS가 설정되면 프로세스 공유 rate limiter (대기 시간은 llm.rate_limit_wait span)
+    """
+    global _RATE_LIMITER
+    from src.utils import metrics
+    from src.utils.tracing import llm_callbacks, traced_rate_limiter
+
+    options: dict = {}
+    callbacks = metrics.llm_callbacks(provider) + llm_callbacks()
+    if callbacks:
+        options["callbacks"] = callbacks
+    rps = float(os.getenv("LLM_RATE_LIMIT_RPS", "0") or 0)
+    if rps > 0:
+        if _RATE_LIMITER is None:
+            _RATE_LIMITER = traced_rate_limiter(rps)
+        options["rate_limiter"] = _RATE_LIMITER
+    return options
+
+
 def get_llm(mini: bool = False) -> Any:
     provider = _get_provider()
+    mini = mini or _FORCE_MINI.get()
     # Default model names per provider
     if provider == "ollama":
         default_model = "llama3:8b"
@@ -31,24 +72,25 @@ def get_llm(mini: bool = False) -> Any:
     primary_model = os.getenv("MODEL_NAME", default_model)
     mini_model_env = os.getenv("MINI_MODEL_NAME")
     model_name = mini_model_env if (mini and mini_model_env) else primary_model
+    options = _llm_options(provider)
 
     if provider == "openai":
         from langchain_openai import ChatOpenAI
 
-        return ChatOpenAI(model=model_name, temperature=0)
+        return ChatOpenAI(model=model_name, temperature=0, **options)
     if provider == "anthropic":
         from langchain_anthropic import ChatAnthropic
 
-        return ChatAnthropic(model=model_name, temperature=0)
+        return ChatAnthropic(model=model_name, temperature=0, **options)
     if provider == "google":
         from langchain_google_genai import ChatGoogleGenerativeAI
 
-        return ChatGoogleGenerativeAI(model=model_name, temperature=0)
+        return ChatGoogleGenerativeAI(model=model_name, temperature=0, **options)
     if provider == "ollama":
         from langchain_community.chat_models import ChatOllama
 
         base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
-        return ChatOllama(model=model_name, temperature=0, base_url=base_url)
+        return ChatOllama(model=model_name, temperature=0, base_url=base_url, **options)
 
     raise ValueError(f"Unsupported provider: {provider}")
 
@@ -7,6 +7,7 @@ from typing import List, Tuple
 from langchain_core.prompts import ChatPromptTemplate
 
 from src.utils.common import get_llm
+from src.utils.metrics import record_fallback
 
 # DPICS 간략 코드 집합
 # PR: Praise, RD: Reflection, BD: Behavior Description, NT: Neutral Talk,
@@ -63,22 +64,29 @@ def label_lines_dpics_llm(text: str) -> List[Tuple[str, str]]:
     try:
         return _parse_dpics_json(content)
     except Exception:
-        # 간단 폴백 휴리스틱
-        out: List[Tuple[str, str]] = []
-        for ln in lines:
-            t = ln.strip()
-            code = "NT"
-            low = t.lower()
-            if t.endswith("?") or "왜" in t or "어디" in t or "무엇" in t:
-                code = "Q"
-            elif any(k in low for k in ["해주세요", "해", "하지마", "그만", "지금", "해라"]):
-                code = "CMD"
-            elif any(k in low for k in ["잘했", "고마", "멋지", "great", "good", "nice"]):
-                code = "PR"
-            elif any(k in low for k in ["싫어", "나빠", "짜증", "못해", "미워", "bad", "hate"]):
-                code = "NEG"
-            out.append((t, code))
-        return out
+        record_fallback("llm_parse_error")
+        return label_lines_dpics_keywords(text)
+
+
+def label_lines_dpics_keywords(text: str) -> List[Tuple[str, str]]:
+    """간단 폴백 휴리스틱 (LLM 응답 파싱 실패 또는 SLO 강등 모드)"""
+    out: List[Tuple[str, str]] = []
+    for ln in text.splitlines():
+        t = ln.strip()
+        if not t:
+            continue
+        code = "NT"
+        low = t.lower()
+        if t.endswith("?") or "왜" in t or "어디" in t or "무엇" in t:
+            code = "Q"
+        elif any(k in low for k in ["해주세요", "해", "하지마", "그만", "지금", "해라"]):
+            code = "CMD"
+        elif any(k in low for k in ["잘했", "고마", "멋지", "great", "good", "nice"]):
+            code = "PR"
+        elif any(k in low for k in ["싫어", "나빠", "짜증", "못해", "미워", "bad", "hate"]):
+            code = "NEG"
+        out.append((t, code))
+    return out
 
 
 def annotate_dialogue_dpics(text: str) -> str:
@@ -1,20 +1,38 @@
 from __future__ import annotations
 
 import os
-from typing import List, Tuple, Optional
+from typing import List, Optional, Sequence, Tuple
 from pathlib import Path
 
-try:
-    from transformers import AutoTokenizer, AutoModelForSequenceClassification
-    import torch
-    TRANSFORMERS_AVAILABLE = True
-except ImportError:
-    TRANSFORMERS_AVAILABLE = False
-
+import importlib.util
 import json
-import re
+
+# transformers / torch는 수 초가 걸리므로 모듈 임포트 시점이 아니라 모델을 처음 로딩할 때 임포트한다
+TRANSFORMERS_AVAILABLE = (
+    importlib.util.find_spec("transformers") is not None and importlib.util.find_spec("torch") is not None
+)
+torch = None
+AutoTokenizer = None
+AutoModelForSequenceClassification = None
+
+
+def _load_backend() -> None:
+    """transformers / torch 지연 임포트"""
+    global torch, AutoTokenizer, AutoModelForSequenceClassification
+    if torch is None:
+        import torch as _torch
+        from transformers import AutoTokenizer as _AutoTokenizer
+        from transformers import AutoModelForSequenceClassification as _AutoModel
+
+        torch, AutoTokenizer, AutoModelForSequenceClassification = _torch, _AutoTokenizer, _AutoModel
 
 from src.utils.dpics import _ALLOWED
+from src.utils.log import get_logger
+from src.utils.metrics import ELECTRA_BATCH_SIZE, FALLBACKS, current_node, record_fallback
+from src.utils.tracing import span
+from src.utils.transcript import CHILD, PARENT, get_speaker_lexer
+
+log = get_logger(__name__)
 
 # 모델의 전체 이름 라벨을 DPICS 코드로 매핑
 _MODEL_LABEL_TO_DPICS = {
@@ -48,26 +66,15 @@ def _normalize_text_for_model(text: str) -> str:
     if text.startswith("[MOM]") or text.startswith("[CHI]"):
         return text
     
-    # Parent/Mom/Mother 등 → [MOM]
-    parent_pattern = re.match(
-        r'^(Parent|Mom|Dad|Mother|Father|부모|엄마|아빠|어머니|아버지)[:\s]+(.+)$',
-        text,
-        flags=re.IGNORECASE
-    )
-    if parent_pattern:
-        return f"[MOM] {parent_pattern.group(2).strip()}"
-    
-    # Child/Kid/Son/Daughter 등 → [CHI]
-    child_pattern = re.match(
-        r'^(Child|Kid|Son|Daughter|아이|자녀|아들|딸)[:\s]+(.+)$',
-        text,
-        flags=re.IGNORECASE
-    )
-    if child_pattern:
-        return f"[CHI] {child_pattern.group(2).strip()}"
-    
-    # 스피커 정보가 없으면 그대로 반환 (모델이 처리할 수 있도록)
-    return text
+    # 스피커 태그 파싱은 전처리와 같은 lexer 사용 (스피커 정보가 없으면 그대로 반환)
+    speaker, body = get_speaker_lexer().parse(text)
+    return model_input(speaker, body) if speaker else text
+
+
+def model_input(speaker: Optional[str], text: str) -> str:
+    """이미 파싱한 스피커 코드와 발화 → 모델 학습 형식 "[MOM] ..." (스피커가 없으면 발화 그대로)"""
+    text = text.strip()
+    return f"[{speaker}] {text}" if speaker in (PARENT, CHILD) else text
 
 
 class DPICSElectraModel:
@@ -88,6 +95,7 @@ class DPICSElectraModel:
         self.model_path = Path(model_path)
         if not self.model_path.exists():
             raise FileNotFoundError(f"모델 경로를 찾을 수 없습니다: {model_path}")
+        _load_backend()
         
         # 디바이스 설정
         if device is None:
@@ -96,7 +104,7 @@ class DPICSElectraModel:
             self.device = device
         
         # 모델과 토크나이저 로드
-        print(f"DPICS ELECTRA 모델 로딩 중: {model_path} (device: {self.device})")
+        log.info("DPICS ELECTRA 모델 로딩 중: %s (device: %s)", model_path, self.device)
         try:
             self.tokenizer = AutoTokenizer.from_pretrained(str(self.model_path))
             self.model = AutoModelForSequenceClassification.from_pretrained(str(self.model_path))
@@ -112,12 +120,12 @@ class DPICSElectraModel:
                 id2label_raw = label_mapping.get("id2label", {})
                 self.id2label = {int(k): v for k, v in id2label_raw.items()}
                 self.label2id = {v: int(k) for k, v in id2label_raw.items()}
-                print(f"label_mapping.json에서 라벨 매핑 로드: {self.id2label}")
+                log.debug("label_mapping.json에서 라벨 매핑 로드: %s", self.id2label)
             elif hasattr(self.model.config, 'id2label') and self.model.config.id2label:
                 # 모델 config에서 라벨 매핑 확인
                 self.id2label = {int(k): v for k, v in self.model.config.id2label.items()}
                 self.label2id = {v: int(k) for k, v in self.model.config.id2label.items()}
-                print(f"모델 config에서 라벨 매핑 로드: {self.id2label}")
+                log.debug("모델 config에서 라벨 매핑 로드: %s", self.id2label)
             else:
                 raise RuntimeError("라벨 매핑을 찾을 수 없습니다. label_mapping.json 파일이 필요합니다.")
             
@@ -126,9 +134,9 @@ class DPICSElectraModel:
             for label_id, model_label in self.id2label.items():
                 dpics_code = _MODEL_LABEL_TO_DPICS.get(model_label, "OTH")
                 self.id2dpics[label_id] = dpics_code
-            print(f"DPICS 코드 매핑: {self.id2dpics}")
+            log.debug("DPICS 코드 매핑: %s", self.id2dpics)
             
-            print("모델 로딩 완료")
+            log.info("모델 로딩 완료")
         except Exception as e:
             raise RuntimeError(f"모델 로딩 실패: {e}")
     
@@ -237,19 +245,19 @@ def _get_project_root() -> Path:
     return project_root
 
 
+def model_path() -> str:
+    """환경 변수로 경로 지정 가능, 없으면 프로젝트 루트 기준 models/dpics-electra"""
+    env_path = os.getenv("DPICS_ELECTRA_MODEL_PATH")
+    if env_path:
+        return env_path
+    return str(_get_project_root() / "models" / "dpics-electra")
+
+
 def _get_model() -> DPICSElectraModel:
     """전역 모델 인스턴스 가져오기 (싱글톤 패턴)"""
     global _model_instance
     if _model_instance is None:
-        # 환경 변수로 경로 지정 가능, 없으면 프로젝트 루트 기준 상대 경로 사용
-        env_path = os.getenv("DPICS_ELECTRA_MODEL_PATH")
-        if env_path:
-            model_path = env_path
-        else:
-            # 프로젝트 루트 기준 models/dpics-electra
-            project_root = _get_project_root()
-            model_path = str(project_root / "models" / "dpics-electra")
-        _model_instance = DPICSElectraModel(model_path=model_path)
+        _model_instance = DPICSElectraModel(model_path=model_path())
     return _model_instance
 
 
@@ -274,23 +282,62 @@ def label_lines_dpics_electra(text: str, use_batch: bool = True) -> List[Tuple[s
     if not lines:
         return []
     
+    # (line, label) 튜플 리스트 반환
+    return list(zip(lines, _predict_labels(lines, use_batch)))
+
+
+def label_utterances_dpics_electra(
+    utterances: Sequence[Tuple[Optional[str], str]],
+    use_batch: bool = True,
+) -> List[str]:
+    """
+    전처리에서 파싱한 스피커로 바로 모델 입력을 만들어 라벨링 (스피커 태그를 다시 파싱하지 않는다)
+
+    Args:
+        utterances: (스피커 코드 MOM|CHI|None, 영어 발화) 리스트
+        use_batch: 배치 예측 사용 여부
+
+    Returns:
+        utterances와 같은 순서의 DPICS 라벨 리스트
+    """
+    if not TRANSFORMERS_AVAILABLE:
+        raise ImportError(
+            "transformers 라이브러리가 필요합니다. "
+            "pip install transformers torch 로 설치해주세요."
+        )
+    if not utterances:
+        return []
+    return _predict_labels([model_input(speaker, text) for speaker, text in utterances], use_batch)
+
+
+def _predict_labels(texts: List[str], use_batch: bool = True) -> List[str]:
     try:
-        model = _get_model()
-        
-        if use_batch and len(lines) > 1:
-            # 배치 예측
-            labels = model.predict_batch(lines)
-        else:
+        # 워커 풀이 설정되어 있으면 멀티 프로세스 추론 사용 (DPICS_ELECTRA_WORKERS)
+        from src.utils.dpics_electra_pool import get_worker_pool
+        pool = get_worker_pool()
+        ELECTRA_BATCH_SIZE.observe(len(texts), backend="pool" if pool is not None else "inline")
+        with span("electra.batch", utterances=len(texts), pool=pool is not None):
+            if pool is not None:
+                try:
+                    return pool.predict_batch(texts)
+                except Exception as e:
+                    # 워커 시간 초과 / 비정상 종료 → 이 프로세스에서 추론 (실패하면 아래에서 기본 라벨)
+                    log.warning("ELECTRA 워커 풀 오류, 프로세스 내 추론으로 폴백: %s", e)
+                    FALLBACKS.inc(node=current_node(), kind="electra_pool_error")
+            
+            model = _get_model()
+            
+            if use_batch and len(texts) > 1:
+                # 배치 예측
+                return model.predict_batch(texts)
             # 개별 예측
-            labels = [model.predict(line) for line in lines]
-        
-        # (line, label) 튜플 리스트 반환
-        return list(zip(lines, labels))
+            return [model.predict(text) for text in texts]
     
     except Exception as e:
-        print(f"ELECTRA 모델 예측 오류: {e}")
+        log.warning("ELECTRA 모델 예측 오류: %s", e)
+        record_fallback("electra_error")
         # 폴백: 기본 라벨 반환
-        return [(line, "OTH") for line in lines]
+        return ["OTH"] * len(texts)
 
 
 def reset_model_instance():
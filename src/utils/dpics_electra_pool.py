@@ -0,0 +1,345 @@
+from __future__ import annotations
+
+import itertools
+import multiprocessing as mp
+import os
+import threading
+import time
+from concurrent.futures import Future, wait
+from typing import Dict, List, Optional
+
+from src.utils.dpics_electra import DPICSElectraModel, _get_model, model_path, TRANSFORMERS_AVAILABLE
+from src.utils.log import get_logger
+from src.utils.metrics import register_collector
+
+log = get_logger(__name__)
+
+# 결과를 기다리는 동안 워커 생존을 확인하는 간격(초)
+_LIVENESS_INTERVAL = 0.5
+
+
+def _split_cores(num_workers: int) -> List[List[int]]:
+    """사용 가능한 CPU 코어를 워커 수만큼 겹치지 않게 분할"""
+    try:
+        cores = sorted(os.sched_getaffinity(0))
+    except AttributeError:  # macOS 등 sched_getaffinity 미지원
+        cores = list(range(os.cpu_count() or 1))
+    if num_workers <= 0:
+        return []
+    per_worker = max(1, len(cores) // num_workers)
+    groups = []
+    for i in range(num_workers):
+        group = cores[i * per_worker:(i + 1) * per_worker]
+        # 코어보다 워커가 많으면 순환 배정
+        groups.append(group or [cores[i % len(cores)]])
+    return groups
+
+
+# 워커가 모델 로딩을 마쳤을 때 결과 큐로 보내는 job_id
+_READY = -1
+
+
+def _worker_main(
+    model: Optional[DPICSElectraModel],
+    model_path: str,
+    cores: List[int],
+    num_threads: int,
+    task_queue,
+    result_queue,
+) -> None:
+    """
+    워커 프로세스 진입점
+    spawn이면 워커가 모델을 CPU로 직접 로딩하고, fork면 부모가 로딩한 모델을 copy-on-write로 공유한다.
+    """
+    if cores and hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, cores)
+        except OSError:
+            pass
+    import torch
+
+    torch.set_num_threads(num_threads)
+    if model is None:
+        model = DPICSElectraModel(model_path=model_path, device="cpu")
+    result_queue.put((_READY, os.getpid(), None))
+
+    while True:
+        task = task_queue.get()
+        if task is None:  # 종료 신호
+            break
+        job_id, texts = task
+        try:
+            labels = model.predict_batch(texts)
+            result_queue.put((job_id, labels, None))
+        except Exception as e:  # 워커는 죽지 않고 에러를 호출자에게 전달
+            result_queue.put((job_id, None, str(e)))
+
+
+class DPICSElectraWorkerPool:
+    """
+    ELECTRA 추론을 여러 프로세스로 분산하는 워커 풀
+
+    - 기본은 spawn: 워커가 모델을 CPU로 직접 로딩한다 (스레드가 도는 서버 프로세스에서 fork하지 않음)
+    - fork(DPICS_ELECTRA_START_METHOD=fork): 부모가 로딩한 CPU 모델을 copy-on-write로 공유.
+      스레드가 생기기 전(프로세스 시작 직후)에 start()해야 하며 CUDA 모델은 거부한다
+    - 워커마다 전용 코어 집합(affinity)과 torch 스레드 수를 지정
+    - 작업은 청크 단위로 공유 큐에 넣고, 유휴 워커가 가져가 처리 (동적 부하 분산)
+    - 결과를 기다리는 동안 워커 생존을 확인하고, 죽은 워커가 있으면 대기 중인 작업을 실패시키고
+      풀 전체를 다시 띄운다 (죽은 워커가 큐 락을 잡고 있을 수 있으므로 큐도 새로 만든다)
+    """
+
+    def __init__(
+        self,
+        num_workers: int,
+        threads_per_worker: Optional[int] = None,
+        chunk_size: int = 32,
+        start_method: str = "spawn",
+        timeout: float = 30.0,
+        start_timeout: float = 120.0,
+    ):
+        """
+        Args:
+            num_workers: 추론 프로세스 수
+            threads_per_worker: 워커별 torch 스레드 수 (None이면 배정된 코어 수)
+            chunk_size: 한 번에 워커로 보내는 발화 수 (predict_batch의 배치 크기)
+            start_method: spawn | fork
+            timeout: predict_batch 한 번의 최대 대기 시간(초)
+            start_timeout: 워커가 모델 로딩을 마칠 때까지의 최대 대기 시간(초)
+        """
+        if not TRANSFORMERS_AVAILABLE:
+            raise ImportError(
+                "transformers 라이브러리가 필요합니다. "
+                "pip install transformers torch 로 설치해주세요."
+            )
+        if start_method not in mp.get_all_start_methods():
+            raise RuntimeError(f"이 플랫폼은 {start_method} 시작 방식을 지원하지 않습니다.")
+
+        self.num_workers = num_workers
+        self.threads_per_worker = threads_per_worker
+        self.chunk_size = chunk_size
+        self.start_method = start_method
+        self.timeout = timeout
+        self.start_timeout = start_timeout
+
+        self._ctx = mp.get_context(start_method)
+        self._task_queue = None
+        self._result_queue = None
+        self._processes: List[mp.Process] = []
+        self._pending: Dict[int, Future] = {}
+        self._pending_lock = threading.Lock()
+        self._lifecycle_lock = threading.RLock()
+        self._ready = threading.Semaphore(0)
+        self._job_ids = itertools.count()
+        self._collector: Optional[threading.Thread] = None
+        self._started = False
+
+    def start(self) -> None:
+        """워커 프로세스를 띄우고 모델 로딩이 끝날 때까지 대기"""
+        with self._lifecycle_lock:
+            if self._started:
+                return
+
+            model = None
+            if self.start_method == "fork":
+                model = _get_model()
+                if model.device != "cpu":
+                    raise RuntimeError("CUDA 모델은 fork한 워커에서 사용할 수 없습니다. spawn을 쓰거나 CPU 모델을 사용하세요.")
+                # 가중치 스토리지를 공유 메모리로 옮겨 모든 워커가 같은 물리 페이지를 사용하도록 함
+                model.model.share_memory()
+
+            self._task_queue = self._ctx.SimpleQueue()
+            self._result_queue = self._ctx.SimpleQueue()
+            self._ready = threading.Semaphore(0)
+
+            # fork면 수집 스레드를 띄우기 전에 fork해야 자식에 잠긴 락이 복제되지 않는다
+            for cores in _split_cores(self.num_workers):
+                num_threads = self.threads_per_worker or len(cores)
+                proc = self._ctx.Process(
+                    target=_worker_main,
+                    args=(model, model_path(), cores, num_threads, self._task_queue, self._result_queue),
+                    daemon=True,
+                )
+                proc.start()
+                self._processes.append(proc)
+
+            self._collector = threading.Thread(target=self._collect_results, args=(self._result_queue,), daemon=True)
+            self._collector.start()
+            self._started = True
+
+            deadline = time.monotonic() + self.start_timeout
+            for _ in self._processes:
+                if not self._ready.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                    self._stop_processes()
+                    raise TimeoutError("ELECTRA 워커가 시간 안에 모델을 로딩하지 못했습니다.")
+                if self._dead_workers():
+                    self._stop_processes()
+                    raise RuntimeError("ELECTRA 워커가 시작 중에 종료되었습니다.")
+            log.info("DPICS ELECTRA 워커 풀 시작: %d개 프로세스 (%s)", len(self._processes), self.start_method)
+
+    def _collect_results(self, result_queue) -> None:
+        """결과 큐를 읽어 대기 중인 Future를 완료 (큐가 닫히면 종료)"""
+        while True:
+            try:
+                job_id, labels, error = result_queue.get()
+            except (OSError, EOFError, ValueError):
+                break
+            if job_id is None:  # 종료 신호
+                break
+            if job_id == _READY:
+                self._ready.release()
+                continue
+            with self._pending_lock:
+                future = self._pending.pop(job_id, None)
+            if future is None:
+                continue
+            if error is not None:
+                future.set_exception(RuntimeError(f"워커 추론 실패: {error}"))
+            else:
+                future.set_result(labels)
+
+    def _dead_workers(self) -> List[mp.Process]:
+        return [proc for proc in self._processes if not proc.is_alive()]
+
+    def _fail_pending(self, error: Exception) -> None:
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(error)
+
+    def _stop_processes(self) -> None:
+        """워커를 종료하고 큐를 닫는다 (수집 스레드는 큐가 닫히면 끝난다)"""
+        for proc in self._processes:
+            if proc.is_alive():
+                proc.terminate()
+        for proc in self._processes:
+            proc.join(1.0)
+        if self._result_queue is not None:
+            self._result_queue.close()
+        if self._task_queue is not None:
+            self._task_queue.close()
+        self._processes = []
+        self._started = False
+
+    def _restart(self, dead: List[mp.Process]) -> None:
+        with self._lifecycle_lock:
+            if not self._started or not self._dead_workers():
+                return  # 다른 스레드가 이미 다시 띄움
+            log.warning("ELECTRA 워커 비정상 종료 (pid=%s, exitcode=%s), 워커 풀 재시작",
+                        [p.pid for p in dead], [p.exitcode for p in dead])
+            self._fail_pending(RuntimeError("ELECTRA 워커가 비정상 종료되었습니다."))
+            self._stop_processes()
+            self.start()
+
+    def predict_batch(self, texts: List[str]) -> List[str]:
+        """
+        여러 텍스트를 청크로 나눠 워커들에게 분산 예측
+
+        Args:
+            texts: 예측할 텍스트 리스트
+
+        Returns:
+            DPICS 라벨 리스트 (입력 순서 유지)
+
+        Raises:
+            TimeoutError: timeout 안에 결과가 오지 않음
+            RuntimeError: 워커 추론 실패 또는 워커 비정상 종료 (호출자가 다른 라벨러로 폴백)
+        """
+        if not texts:
+            return []
+        if not self._started:
+            self.start()
+
+        futures: Dict[int, Future] = {}
+        for i in range(0, len(texts), self.chunk_size):
+            job_id = next(self._job_ids)
+            future: Future = Future()
+            with self._pending_lock:
+                self._pending[job_id] = future
+            self._task_queue.put((job_id, texts[i:i + self.chunk_size]))
+            futures[job_id] = future
+
+        deadline = time.monotonic() + self.timeout
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                _, not_done = wait(list(futures.values()), timeout=max(0.0, min(_LIVENESS_INTERVAL, remaining)))
+                if not not_done:
+                    break
+                dead = self._dead_workers()
+                if dead:
+                    self._restart(dead)
+                    raise RuntimeError("ELECTRA 워커가 비정상 종료되었습니다.")
+                if remaining <= 0:
+                    raise TimeoutError(f"ELECTRA 워커 풀 응답 시간 초과 ({self.timeout}s)")
+        finally:
+            with self._pending_lock:
+                for job_id in futures:
+                    self._pending.pop(job_id, None)
+
+        labels: List[str] = []
+        for future in futures.values():
+            labels.extend(future.result())
+        return labels
+
+    def close(self, timeout: float = 5.0) -> None:
+        """워커와 수집 스레드 종료"""
+        with self._lifecycle_lock:
+            if not self._started:
+                return
+            for _ in self._processes:
+                self._task_queue.put(None)
+            for proc in self._processes:
+                proc.join(timeout)
+            self._fail_pending(RuntimeError("ELECTRA 워커 풀이 종료되었습니다."))
+            self._stop_processes()
+            if self._collector is not None:
+                self._collector.join(timeout)
+
+
+# 전역 워커 풀 인스턴스 (지연 생성)
+_pool_instance: Optional[DPICSElectraWorkerPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_worker_pool() -> Optional[DPICSElectraWorkerPool]:
+    """
+    DPICS_ELECTRA_WORKERS 환경 변수가 1 이상이면 전역 워커 풀을 반환 (없으면 None)
+    DPICS_ELECTRA_THREADS_PER_WORKER로 워커별 torch 스레드 수, DPICS_ELECTRA_START_METHOD로 시작 방식(spawn | fork),
+    DPICS_ELECTRA_POOL_TIMEOUT으로 배치당 최대 대기 시간(초)을 지정할 수 있다.
+    """
+    global _pool_instance
+    num_workers = int(os.getenv("DPICS_ELECTRA_WORKERS", "0") or 0)
+    if num_workers <= 0:
+        return None
+    with _pool_lock:
+        if _pool_instance is None:
+            threads_env = os.getenv("DPICS_ELECTRA_THREADS_PER_WORKER")
+            _pool_instance = DPICSElectraWorkerPool(
+                num_workers=num_workers,
+                threads_per_worker=int(threads_env) if threads_env else None,
+                start_method=os.getenv("DPICS_ELECTRA_START_METHOD", "spawn"),
+                timeout=float(os.getenv("DPICS_ELECTRA_POOL_TIMEOUT", "30")),
+            )
+            _pool_instance.start()
+    return _pool_instance
+
+
+def _collect_metrics():
+    pool = _pool_instance
+    if pool is not None:
+        with pool._pending_lock:
+            depth = len(pool._pending)
+        yield "electra_queue_depth", {}, depth
+
+
+register_collector(_collect_metrics)
+
+
+def shutdown_worker_pool() -> None:
+    """전역 워커 풀 종료 (서버 종료/테스트용)"""
+    global _pool_instance
+    with _pool_lock:
+        if _pool_instance is not None:
+            _pool_instance.close()
+            _pool_instance = None
@@ -0,0 +1,123 @@
+"""
+임포트 시간 진단
+
+    python -m src.utils.import_profile                       # src.graph 임포트 + graph 생성
+    python -m src.utils.import_profile src.graph --no-attr   # 임포트만
+    python -m src.utils.import_profile --top 30 --json
+
+새 프로세스에서 `python -X importtime`으로 대상을 임포트해 패키지별 누적/자기 시간을 집계한다.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+
+def _import_code(target: str, attr: Optional[str]) -> str:
+    code = f"import {target}"
+    if attr:
+        code += f"; getattr(__import__({target!r}, fromlist=['_']), {attr!r})"
+    return code
+
+
+def _parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """-X importtime 출력 파싱 → [{module, self_us, cumulative_us, depth}]"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        self_us, cumulative_us, name = parts
+        module = name.rstrip()
+        depth = (len(module) - len(module.lstrip())) // 2
+        rows.append({
+            "module": module.strip(),
+            "self_us": int(self_us.strip()),
+            "cumulative_us": int(cumulative_us.strip()),
+            "depth": depth,
+        })
+    return rows
+
+
+def profile_imports(
+    target: str = "src.graph",
+    attr: Optional[str] = "graph",
+    python: str = sys.executable,
+    env: Optional[Dict[str, str]] = None,
+) -> Dict[str, Any]:
+    """
+    새 인터프리터에서 target을 임포트(attr가 있으면 속성 접근까지)하며 시간 측정
+
+    Returns:
+        {wall_ms, import_ms, packages: [{package, self_ms, modules}], slowest: [{module, cumulative_ms}]}
+    """
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [python, "-X", "importtime", "-c", _import_code(target, attr)],
+        capture_output=True,
+        text=True,
+        env={**os.environ, **(env or {})},
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        tail = "\n".join(proc.stderr.splitlines()[-10:])
+        raise RuntimeError(f"{target} 임포트 실패:\n{tail}")
+
+    rows = _parse_importtime(proc.stderr)
+    packages: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        root = row["module"].split(".")[0]
+        pkg = packages.setdefault(root, {"package": root, "self_ms": 0.0, "modules": 0})
+        pkg["self_ms"] += row["self_us"] / 1000
+        pkg["modules"] += 1
+    for pkg in packages.values():
+        pkg["self_ms"] = round(pkg["self_ms"], 1)
+
+    return {
+        "target": f"{target}:{attr}" if attr else target,
+        "wall_ms": round(wall_ms, 1),
+        "import_ms": round(sum(r["self_us"] for r in rows) / 1000, 1),
+        "packages": sorted(packages.values(), key=lambda p: p["self_ms"], reverse=True),
+        "slowest": [
+            {"module": r["module"], "cumulative_ms": round(r["cumulative_us"] / 1000, 1)}
+            for r in sorted(rows, key=lambda r: r["cumulative_us"], reverse=True)
+            if r["depth"] == 0
+        ],
+    }
+
+
+def format_report(profile: Dict[str, Any], top: int = 15) -> str:
+    lines = [
+        f"target: {profile['target']}",
+        f"wall: {profile['wall_ms']} ms (임포트 합계 {profile['import_ms']} ms)",
+        "",
+        f"{'package':<32}{'self ms':>10}{'modules':>10}",
+    ]
+    for pkg in profile["packages"][:top]:
+        lines.append(f"{pkg['package']:<32}{pkg['self_ms']:>10}{pkg['modules']:>10}")
+    lines += ["", f"{'top-level import':<48}{'cumulative ms':>14}"]
+    for row in profile["slowest"][:top]:
+        lines.append(f"{row['module']:<48}{row['cumulative_ms']:>14}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="모듈 임포트 시간 분석 (-X importtime)")
+    parser.add_argument("target", nargs="?", default="src.graph")
+    parser.add_argument("--attr", default="graph", help="임포트 후 접근할 속성 (기본: graph)")
+    parser.add_argument("--no-attr", action="store_true", help="임포트만 측정")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    result = profile_imports(args.target, None if args.no_attr else args.attr)
+    print(json.dumps(result, ensure_ascii=False, indent=2) if args.json else format_report(result, args.top))
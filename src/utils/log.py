@@ -0,0 +1,56 @@
+"""
+레벨별 로깅과 샘플링
+
+    from src.utils.log import get_logger
+    log = get_logger(__name__)
+    log.warning("Summarize error: %s", e)
+
+- LOG_LEVEL: 기본 레벨 (기본: INFO)
+- LOG_SAMPLE_RATE: INFO 이하 이벤트를 남길 비율 (기본: 1.0). WARNING 이상은 항상 남긴다.
+- 현재 트레이스 span이 있으면 로그에 trace_id가 붙고, WARNING 이상은 span 이벤트로도 기록된다.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import random
+import sys
+
+_CONFIGURED = False
+
+
+class _SampleFilter(logging.Filter):
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        from src.utils.tracing import current_span
+
+        s = current_span()
+        record.trace_id = s.trace_id or "-"
+        if record.levelno >= logging.WARNING:
+            s.event("log", level=record.levelname, message=record.getMessage())
+            return True
+        return self.rate >= 1.0 or random.random() < self.rate
+
+
+def _configure() -> None:
+    global _CONFIGURED
+    if _CONFIGURED:
+        return
+    _CONFIGURED = True
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(trace_id)s] %(message)s"))
+    handler.addFilter(_SampleFilter(float(os.getenv("LOG_SAMPLE_RATE", "1.0"))))
+    root = logging.getLogger("src")
+    root.addHandler(handler)
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    root.propagate = False
+
+
+def get_logger(name: str) -> logging.Logger:
+    """src.* 로거 (처음 호출할 때 핸들러 구성)"""
+    _configure()
+    return logging.getLogger(name if name.startswith("src") else f"src.{name}")
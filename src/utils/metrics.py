@@ -0,0 +1,464 @@
+"""
+Prometheus 형식 메트릭
+
+    from src.utils.metrics import NODE_DURATION
+    NODE_DURATION.observe(0.42, node="label_utterances")
+
+- 값은 스레드별 샤드에 누적한다 (기록 경로에 락이 없다). 스크레이프할 때만 모든 샤드를 합친다.
+  스레드가 끝나면 그 샤드는 종료된 스레드 누적값에 합치고 버린다 (요청마다 스레드를 만드는 풀에서도 샤드가 늘지 않는다).
+- 큐 깊이, 커넥션 풀처럼 수집 시점의 값은 register_collector로 등록한 함수가 계산한다.
+- 프로세스가 여러 개면(프리포크 서버) METRICS_DIR에 프로세스별 스냅샷을 쓰고 /metrics에서 합친다.
+  카운터/히스토그램은 종료된 워커 것도 합치고, 게이지는 살아 있는 프로세스 것만 합친다.
+- METRICS_ENABLED=false면 기록하지 않는다.
+
+    python -m src.utils.metrics    # 현재 METRICS_DIR의 스냅샷을 합쳐 텍스트 형식으로 출력
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+_LabelKey = Tuple[str, ...]
+# 수집기 반환값: (메트릭 이름, 라벨, 값)
+CollectorSample = Tuple[str, Dict[str, str], float]
+
+
+class _Shard:
+    """스레드 하나가 기록하는 값 {(메트릭 이름, 라벨 값): 값 | 히스토그램 [버킷별 개수..., 합]}"""
+
+    __slots__ = ("values",)
+
+    def __init__(self):
+        self.values: Dict[Tuple[str, _LabelKey], Any] = {}
+
+
+class _ShardOwner:
+    """스레드 로컬에 두는 샤드 소유자 - 스레드가 끝나 해제되면 Registry가 샤드를 회수한다"""
+
+    __slots__ = ("shard", "__weakref__")
+
+    def __init__(self, shard: _Shard):
+        self.shard = shard
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, "_Metric"] = {}
+        self._collectors: List[Callable[[], Iterable[CollectorSample]]] = []
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """기록된 값 초기화 (fork한 워커에서 부모 값을 버릴 때)"""
+        with self._lock:
+            self._shards: List[_Shard] = []
+            # 종료된 스레드들의 샤드를 합친 값
+            self._retired: Dict[Tuple[str, _LabelKey], Any] = {}
+            self._retiring: Deque[_Shard] = deque()
+            self._local = threading.local()
+
+    def shard(self) -> _Shard:
+        owner = getattr(self._local, "owner", None)
+        if owner is None:
+            owner = self._local.owner = _ShardOwner(_Shard())
+            with self._lock:
+                self._drain_retired()
+                self._shards.append(owner.shard)
+            # 스레드가 끝나면 threading.local이 owner를 놓으므로 그때 샤드를 회수
+            weakref.finalize(owner, self._retire, owner.shard)
+        return owner.shard
+
+    def _retire(self, shard: _Shard) -> None:
+        # finalize는 GC 중 아무 스레드에서나(락을 잡은 상태일 수도 있다) 불리므로 큐에만 넣고
+        # 실제 회수는 다음 shard()/snapshot()이 락 안에서 한다
+        self._retiring.append(shard)
+
+    def _drain_retired(self) -> None:
+        """종료된 스레드의 샤드를 누적값에 합치고 샤드 목록에서 뺀다 (self._lock 안에서 호출)"""
+        while self._retiring:
+            shard = self._retiring.popleft()
+            try:
+                self._shards.remove(shard)
+            except ValueError:
+                # reset() 이전 샤드
+                continue
+            for key, value in shard.values.items():
+                _merge_value(self._retired, key, value)
+
+    def register(self, metric: "_Metric") -> "_Metric":
+        if metric.name in self._metrics:
+            raise ValueError(f"이미 등록된 메트릭입니다: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[CollectorSample]]) -> None:
+        self._collectors.append(collector)
+
+    def snapshot(self) -> Dict[str, Dict[_LabelKey, Any]]:
+        """모든 샤드를 합친 값과 수집기 값 {메트릭 이름: {라벨 값: 값}}"""
+        merged: Dict[str, Dict[_LabelKey, Any]] = {}
+        with self._lock:
+            self._drain_retired()
+            shards = list(self._shards)
+            for (name, labels), value in self._retired.items():
+                _merge_value(merged.setdefault(name, {}), labels, value)
+        for shard in shards:
+            # dict 복사는 GIL 안에서 한 번에 끝나므로 기록 중인 스레드와 락 없이 읽을 수 있다
+            for (name, labels), value in list(shard.values.items()):
+                _merge_value(merged.setdefault(name, {}), labels, value)
+        for collector in self._collectors:
+            try:
+                samples = list(collector())
+            except Exception:
+                continue
+            for name, labels, value in samples:
+                metric = self._metrics.get(name)
+                if metric is not None:
+                    merged.setdefault(name, {})[metric.label_key(labels)] = float(value)
+        return merged
+
+    def render(self, snapshot: Dict[str, Dict[_LabelKey, Any]]) -> str:
+        """Prometheus 텍스트 형식 (0.0.4)"""
+        lines: List[str] = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for labels, value in sorted((snapshot.get(name) or {}).items()):
+                lines.extend(metric.samples(labels, value))
+        return "\n".join(lines) + "\n"
+
+
+def _merge_value(into: Dict[_LabelKey, Any], labels: _LabelKey, value: Any) -> None:
+    current = into.get(labels)
+    if isinstance(value, list):
+        if current is None:
+            into[labels] = list(value)
+        else:
+            for i, v in enumerate(value):
+                current[i] += v
+    else:
+        into[labels] = (current or 0.0) + value
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _labels_text(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), registry: Optional[Registry] = None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.registry = registry or REGISTRY
+        self.registry.register(self)
+
+    def label_key(self, labels: Dict[str, Any]) -> _LabelKey:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def samples(self, labels: _LabelKey, value: Any) -> List[str]:
+        return [f"{self.name}{_labels_text(self.labelnames, labels)} {_number(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        if not ENABLED:
+            return
+        values = self.registry.shard().values
+        key = (self.name, self.label_key(labels))
+        values[key] = values.get(key, 0.0) + amount
+
+
+class Gauge(Counter):
+    """inc/dec로 증감하는 게이지 (스레드별로 증감분을 누적해 합친다) 또는 수집기가 채우는 게이지"""
+
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track(self, **labels: Any) -> Iterator[None]:
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets: Iterable[float] = (),
+                 registry: Optional[Registry] = None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames, registry)
+
+    def observe(self, value: float, **labels: Any) -> None:
+        if not ENABLED:
+            return
+        values = self.registry.shard().values
+        key = (self.name, self.label_key(labels))
+        counts = values.get(key)
+        if counts is None:
+            # 버킷별 개수 (마지막 버킷 = +Inf) + 합
+            counts = values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def samples(self, labels: _LabelKey, value: Any) -> List[str]:
+        out = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), value[:-1]):
+            cumulative += count
+            bucket_labels = _labels_text(self.labelnames + ("le",), labels + (_number(bound),))
+            out.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+        base = _labels_text(self.labelnames, labels)
+        out.append(f"{self.name}_sum{base} {_number(value[-1])}")
+        out.append(f"{self.name}_count{base} {cumulative}")
+        return out
+
+
+REGISTRY = Registry()
+
+
+def register_collector(collector: Callable[[], Iterable[CollectorSample]]) -> None:
+    """스크레이프할 때 호출되어 (메트릭 이름, 라벨, 값)을 돌려주는 함수 등록 (게이지용)"""
+    REGISTRY.register_collector(collector)
+
+
+# ---------------------------------------------------------------------- #
+# 메트릭 목록
+# ---------------------------------------------------------------------- #
+_LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+NODE_DURATION = Histogram("pipeline_node_duration_seconds", "그래프 노드 실행 시간", ("node",), _LATENCY_BUCKETS)
+NODE_ERRORS = Counter("pipeline_node_errors_total", "예외로 끝난 노드 실행 수", ("node",))
+FALLBACKS = Counter("pipeline_fallbacks_total", "경량 모델/규칙 기반 대체 경로로 실행한 수", ("node", "kind"))
+LLM_CALLS = Counter("pipeline_llm_calls_total", "LLM 호출 수", ("node", "provider", "model"))
+LLM_TOKENS = Counter("pipeline_llm_tokens_total", "LLM 토큰 수 (direction=input|output)", ("node", "provider", "direction"))
+LLM_ERRORS = Counter("pipeline_llm_errors_total", "실패한 LLM 호출 수", ("node", "provider"))
+ELECTRA_BATCH_SIZE = Histogram("electra_batch_size", "ELECTRA 배치당 발화 수", ("backend",),
+                               (1, 2, 4, 8, 16, 32, 64, 128, 256))
+ELECTRA_QUEUE_DEPTH = Gauge("electra_queue_depth", "ELECTRA 워커 풀에서 결과를 기다리는 배치 수")
+CACHE_REQUESTS = Counter("pipeline_cache_requests_total", "캐시 조회 수 (result=hit|miss)", ("cache", "node", "result"))
+SESSIONS_INFLIGHT = Gauge("pipeline_sessions_inflight", "실행 중인 분석 세션 수")
+SESSIONS = Counter("pipeline_sessions_total", "끝난 분석 세션 수 (status=ok|error)", ("status",))
+LIVE_SESSIONS = Gauge("live_sessions", "열려 있는 실시간 세션 수")
+LIVE_UTTERANCE_DURATION = Histogram("live_utterance_duration_seconds", "실시간 세션 발화 하나의 처리 시간 (전처리~라벨링)",
+                                    (), _LATENCY_BUCKETS)
+DB_POOL_CONNECTIONS = Gauge("db_pool_connections", "DB 커넥션 풀 커넥션 수 (state=in_use|idle)", ("state",))
+RESULT_SINK_PENDING = Gauge("result_sink_pending", "결과 저장 큐에서 기다리는 세션 수")
+RESULT_SINK_DROPPED = Counter("result_sink_dropped_total", "큐가 가득 차 저장하지 못한 세션 수")
+
+
+# ---------------------------------------------------------------------- #
+# 현재 노드 (LLM 메트릭의 node 라벨)
+# ---------------------------------------------------------------------- #
+_NODE: ContextVar[str] = ContextVar("metrics_node", default="")
+
+
+def current_node() -> str:
+    return _NODE.get()
+
+
+@contextmanager
+def node_context(name: str) -> Iterator[None]:
+    token = _NODE.set(name)
+    try:
+        yield
+    finally:
+        _NODE.reset(token)
+
+
+# ---------------------------------------------------------------------- #
+# 대체 경로 출력 표시 (노드 메모이제이션은 표시된 출력을 캐시하지 않는다)
+# ---------------------------------------------------------------------- #
+_FALLBACK_KINDS: ContextVar[Optional[List[str]]] = ContextVar("node_fallbacks", default=None)
+
+
+def record_fallback(kind: str, node: Optional[str] = None) -> None:
+    """
+    노드가 오류 때문에 대체 경로(원문 유지, 규칙 기반, 오류 문구 등)로 출력을 만들었음을 기록
+    FALLBACKS 메트릭을 올리고, track_fallbacks() 안이면 그 출력을 대체 출력으로 표시한다.
+    """
+    FALLBACKS.inc(node=node or current_node(), kind=kind)
+    kinds = _FALLBACK_KINDS.get()
+    if kinds is not None:
+        kinds.append(kind)
+
+
+@contextmanager
+def track_fallbacks() -> Iterator[List[str]]:
+    """블록 안에서 record_fallback으로 기록된 종류 리스트"""
+    kinds: List[str] = []
+    token = _FALLBACK_KINDS.set(kinds)
+    try:
+        yield kinds
+    finally:
+        _FALLBACK_KINDS.reset(token)
+
+
+@contextmanager
+def track_session() -> Iterator[None]:
+    """세션 하나의 실행 중 게이지와 완료 카운터"""
+    SESSIONS_INFLIGHT.inc()
+    status = "error"
+    try:
+        yield
+        status = "ok"
+    finally:
+        SESSIONS_INFLIGHT.dec()
+        SESSIONS.inc(status=status)
+
+
+def _langchain_callback_handler(provider: str):
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    from src.utils.tracing import llm_token_usage
+
+    class MetricsCallbackHandler(BaseCallbackHandler):
+        """LLM 호출/토큰/오류 카운터 (node 라벨은 호출한 그래프 노드)"""
+
+        def _start(self, **kwargs: Any) -> None:
+            invocation = kwargs.get("invocation_params") or {}
+            model = invocation.get("model") or invocation.get("model_name") or ""
+            LLM_CALLS.inc(node=current_node(), provider=provider, model=model)
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+            self._start(**kwargs)
+
+        def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+            self._start(**kwargs)
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            input_tokens, output_tokens = llm_token_usage(response)
+            node = current_node()
+            if input_tokens:
+                LLM_TOKENS.inc(input_tokens, node=node, provider=provider, direction="input")
+            if output_tokens:
+                LLM_TOKENS.inc(output_tokens, node=node, provider=provider, direction="output")
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            LLM_ERRORS.inc(node=current_node(), provider=provider)
+
+    return MetricsCallbackHandler()
+
+
+_HANDLERS: Dict[str, Any] = {}
+
+
+def llm_callbacks(provider: str) -> List[Any]:
+    """get_llm에 넘길 메트릭 콜백 (METRICS_ENABLED=false면 빈 리스트)"""
+    if not ENABLED:
+        return []
+    if provider not in _HANDLERS:
+        _HANDLERS[provider] = _langchain_callback_handler(provider)
+    return [_HANDLERS[provider]]
+
+
+# ---------------------------------------------------------------------- #
+# 프로세스 간 집계 (METRICS_DIR)
+# ---------------------------------------------------------------------- #
+_STARTED_NS = time.time_ns()
+
+
+def reset_metrics() -> None:
+    """fork한 워커에서 부모 프로세스가 기록한 값을 버리고 새 스냅샷 파일을 쓰기 시작"""
+    global _STARTED_NS
+    REGISTRY.reset()
+    _STARTED_NS = time.time_ns()
+
+
+def _metrics_dir() -> Optional[str]:
+    return os.getenv("METRICS_DIR") or None
+
+
+def write_snapshot() -> None:
+    """METRICS_DIR/<pid>-<시작 시각>.json에 현재 프로세스 값 기록"""
+    directory = _metrics_dir()
+    if directory is None:
+        return
+    snapshot = REGISTRY.snapshot()
+    payload = {
+        "pid": os.getpid(),
+        "metrics": {name: [[list(labels), value] for labels, value in values.items()] for name, values in snapshot.items()},
+    }
+    path = os.path.join(directory, f"{os.getpid()}-{_STARTED_NS}.json")
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _merged_snapshot() -> Dict[str, Dict[_LabelKey, Any]]:
+    directory = _metrics_dir()
+    if directory is None:
+        return REGISTRY.snapshot()
+    write_snapshot()
+    merged: Dict[str, Dict[_LabelKey, Any]] = {}
+    for filename in os.listdir(directory):
+        if not filename.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, filename), "r", encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            continue
+        alive = _alive(int(payload.get("pid") or 0))
+        for name, samples in (payload.get("metrics") or {}).items():
+            metric = REGISTRY._metrics.get(name)
+            if metric is None or (metric.kind == "gauge" and not alive):
+                continue
+            for labels, value in samples:
+                _merge_value(merged.setdefault(name, {}), tuple(labels), value)
+    return merged
+
+
+def render_metrics() -> str:
+    """/metrics 응답 본문 (METRICS_DIR가 있으면 모든 프로세스 합계)"""
+    return REGISTRY.render(_merged_snapshot())
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+if __name__ == "__main__":
+    print(render_metrics(), end="")
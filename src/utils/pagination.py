@@ -1,6 +1,8 @@
 from __future__ import annotations
 
-from typing import Any, Callable, Dict, Iterable, List
+import base64
+import json
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
 
 
 def apply_filters(items: Iterable[Dict[str, Any]], predicate: Callable[[Dict[str, Any]], bool]) -> List[Dict[str, Any]]:
@@ -19,3 +21,55 @@ def paginate(items: List[Dict[str, Any]], page: int, size: int) -> List[Dict[str
     start = (page - 1) * size
     end = start + size
     return items[start:end]
+
+
+def _cursor_value(value: Any) -> Any:
+    # 숫자는 그대로, 나머지(datetime 등)는 문자열로 비교/직렬화
+    if value is None or isinstance(value, (int, float, str)):
+        return value
+    return str(value)
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """키셋 커서 값(예: created_at, id)을 불투명한 문자열로 인코딩"""
+    raw = json.dumps([_cursor_value(v) for v in values])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[List[Any]]:
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("잘못된 페이지 커서입니다.")
+    if not isinstance(values, list):
+        raise ValueError("잘못된 페이지 커서입니다.")
+    return values
+
+
+def keyset_paginate(
+    items: Iterable[Dict[str, Any]],
+    keys: Sequence[str],
+    size: int,
+    cursor: Optional[str] = None,
+    reverse: bool = False,
+) -> Dict[str, Any]:
+    """
+    메모리 내 키셋 페이지네이션 (DB가 없을 때 results_query와 같은 커서 형식으로 동작)
+    keys는 유일한 정렬 키 조합이어야 한다 (예: created_at, id)
+    """
+    if size < 1:
+        size = 10
+
+    def _key(x: Dict[str, Any]) -> tuple:
+        return tuple((x.get(k) is not None, _cursor_value(x.get(k))) for k in keys)
+
+    ordered = sorted(items, key=_key, reverse=reverse)
+    after = decode_cursor(cursor)
+    if after is not None:
+        after_key = tuple((v is not None, v) for v in after)
+        ordered = apply_filters(ordered, lambda x: _key(x) < after_key if reverse else _key(x) > after_key)
+    page = ordered[:size]
+    next_cursor = encode_cursor([page[-1].get(k) for k in keys]) if len(ordered) > size else None
+    return {"items": page, "next_cursor": next_cursor}
@@ -0,0 +1,275 @@
+from __future__ import annotations
+
+import json
+import os
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Deque, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from src.utils.utterance_store import UtteranceStore
+
+# 지원하는 규칙 파일 버전
+SUPPORTED_RULES_VERSION = 1
+
+_DEFAULT_RULES_PATH = Path(__file__).resolve().parent / "pattern_rules.json"
+
+
+@dataclass(frozen=True)
+class _Step:
+    """시퀀스 모티프의 한 단계 (발화 하나에 대한 조건)"""
+    speaker: Optional[str] = None
+    labels: Optional[FrozenSet[str]] = None
+    not_labels: FrozenSet[str] = frozenset()
+
+    def matches(self, speaker: Optional[str], label: Optional[str]) -> bool:
+        if self.speaker is not None and speaker != self.speaker:
+            return False
+        if self.labels is not None and label not in self.labels:
+            return False
+        return label not in self.not_labels
+
+
+@dataclass(frozen=True)
+class PatternRule:
+    """
+    컴파일된 패턴 규칙
+
+    - sequence: 순서대로 만족해야 하는 단계들
+    - max_gap: 연속한 두 단계 사이에 허용되는 무관한 발화 수
+    - window: 첫 단계부터 마지막 단계까지 허용되는 최대 발화 범위 (None이면 무제한)
+    - min_count / count_window: count_window 발화 안에서 min_count번 이상 매칭될 때만 패턴으로 보고
+    """
+    name: str
+    description: str
+    severity: str
+    steps: Tuple[_Step, ...]
+    max_gap: int = 0
+    window: Optional[int] = None
+    min_count: int = 1
+    count_window: Optional[int] = None
+
+
+@dataclass
+class RuleSet:
+    version: int
+    rules: List[PatternRule] = field(default_factory=list)
+
+
+def _compile_step(raw: Dict[str, Any]) -> _Step:
+    labels = raw.get("labels")
+    return _Step(
+        speaker=raw.get("speaker"),
+        labels=frozenset(labels) if labels is not None else None,
+        not_labels=frozenset(raw.get("not_labels") or []),
+    )
+
+
+def compile_rules(data: Dict[str, Any]) -> RuleSet:
+    """규칙 파일(dict)을 검증하고 컴파일"""
+    version = data.get("version")
+    if version != SUPPORTED_RULES_VERSION:
+        raise ValueError(f"지원하지 않는 패턴 규칙 버전입니다: {version}")
+
+    rules: List[PatternRule] = []
+    for raw in data.get("rules") or []:
+        steps = tuple(_compile_step(s) for s in raw.get("sequence") or [])
+        if not raw.get("name") or not steps:
+            raise ValueError(f"패턴 규칙에 name과 sequence가 필요합니다: {raw}")
+        rules.append(PatternRule(
+            name=raw["name"],
+            description=raw.get("description", raw["name"]),
+            severity=raw.get("severity", "medium"),
+            steps=steps,
+            max_gap=int(raw.get("max_gap", 0)),
+            window=raw.get("window"),
+            min_count=int(raw.get("min_count", 1)),
+            count_window=raw.get("count_window"),
+        ))
+    return RuleSet(version=version, rules=rules)
+
+
+_rules_cache: Dict[str, RuleSet] = {}
+
+
+def rules_path() -> str:
+    """기본 규칙 파일 경로 (PATTERN_RULES_PATH 환경 변수로 교체 가능)"""
+    return os.getenv("PATTERN_RULES_PATH") or str(_DEFAULT_RULES_PATH)
+
+
+def load_rules(path: Optional[str] = None) -> RuleSet:
+    """
+    규칙 파일 로딩 (경로별 캐시)
+    PATTERN_RULES_PATH 환경 변수로 기본 규칙 파일을 교체할 수 있다.
+    """
+    resolved = path or rules_path()
+    if resolved not in _rules_cache:
+        with open(resolved, "r", encoding="utf-8") as f:
+            _rules_cache[resolved] = compile_rules(json.load(f))
+    return _rules_cache[resolved]
+
+
+class PatternScanner:
+    """
+    발화 라벨 시퀀스를 한 번만 훑으면서 모든 규칙을 동시에 매칭하는 스캐너
+
+    규칙마다 단계별로 진행 중인 부분 매칭을 하나씩만 유지하므로(같은 단계면 마지막 매칭이 가장 최근인 것,
+    같으면 늦게 시작한 것 - 이후 간격/윈도우 조건을 가장 오래 만족한다) 발화 하나의 처리 비용은
+    규칙 단계 수에 비례하고, 전체는 발화 수에 대해 선형 시간이다. feed()를 발화마다 호출하면 증분 처리도 가능하다.
+    keep_results=False면 탐지 결과를 보관하지 않는다 (feed() 반환값만 사용하는 실시간 세션의 메모리 상한).
+    """
+
+    def __init__(self, rule_set: RuleSet, keep_results: bool = True):
+        self.rule_set = rule_set
+        self.keep_results = keep_results
+        self._index = 0
+        # 규칙별 부분 매칭: [(매칭된 인덱스 튜플, 다음 단계 위치)]
+        self._partials: List[List[Tuple[Tuple[int, ...], int]]] = [[] for _ in rule_set.rules]
+        # 규칙별 min_count 집계용 완료 매칭 버퍼
+        self._buffers: List[Deque[Tuple[int, ...]]] = [deque() for _ in rule_set.rules]
+        # 규칙별 탐지 결과 (규칙 선언 순서대로 출력하기 위해 분리 보관)
+        self._results: List[List[Dict[str, Any]]] = [[] for _ in rule_set.rules]
+
+    def feed(self, speaker: Optional[str], label: Optional[str]) -> List[Dict[str, Any]]:
+        """발화 하나를 처리하고 이번 발화에서 완성된 패턴들을 반환"""
+        i = self._index
+        self._index += 1
+        emitted: List[Dict[str, Any]] = []
+
+        for r, rule in enumerate(self.rule_set.rules):
+            survivors: List[Tuple[Tuple[int, ...], int]] = []
+            completed: List[Tuple[int, ...]] = []
+
+            for indices, pos in self._partials[r]:
+                # 단계 사이 간격 또는 전체 윈도우를 넘으면 폐기
+                if i - indices[-1] - 1 > rule.max_gap:
+                    continue
+                if rule.window is not None and i - indices[0] >= rule.window:
+                    continue
+                if rule.steps[pos].matches(speaker, label):
+                    advanced = indices + (i,)
+                    if pos + 1 == len(rule.steps):
+                        completed.append(advanced)
+                    else:
+                        survivors.append((advanced, pos + 1))
+                else:
+                    survivors.append((indices, pos))
+
+            # 현재 발화에서 새 매칭 시작
+            if rule.steps[0].matches(speaker, label):
+                if len(rule.steps) == 1:
+                    completed.append((i,))
+                else:
+                    survivors.append(((i,), 1))
+
+            # 단계별로 부분 매칭 하나만 유지 (max_gap이 크고 window가 없어도 부분 매칭이 발화 수만큼 늘지 않는다)
+            best: Dict[int, Tuple[int, ...]] = {}
+            for indices, pos in survivors:
+                kept = best.get(pos)
+                if kept is None or (indices[-1], indices[0]) > (kept[-1], kept[0]):
+                    best[pos] = indices
+            self._partials[r] = [(indices, pos) for pos, indices in best.items()]
+            for indices in completed:
+                pattern = self._complete(r, rule, indices)
+                if pattern is not None:
+                    if self.keep_results:
+                        self._results[r].append(pattern)
+                    emitted.append(pattern)
+
+        return emitted
+
+    def _complete(self, r: int, rule: PatternRule, indices: Tuple[int, ...]) -> Optional[Dict[str, Any]]:
+        if rule.min_count <= 1:
+            return _make_pattern(rule, list(indices))
+
+        buffer = self._buffers[r]
+        buffer.append(indices)
+        if rule.count_window is not None:
+            while buffer and indices[-1] - buffer[0][0] >= rule.count_window:
+                buffer.popleft()
+        if len(buffer) < rule.min_count:
+            return None
+
+        merged = sorted({idx for match in buffer for idx in match})
+        count = len(buffer)
+        buffer.clear()
+        pattern = _make_pattern(rule, merged, count=count)
+        pattern["occurrence_count"] = count
+        return pattern
+
+    def results(self) -> List[Dict[str, Any]]:
+        """지금까지 탐지된 패턴 (규칙 선언 순서, 규칙 내에서는 발화 순서)"""
+        return [p for per_rule in self._results for p in per_rule]
+
+
+def _make_pattern(rule: PatternRule, indices: List[int], count: int = 1) -> Dict[str, Any]:
+    return {
+        "pattern_name": rule.name,
+        "description": rule.description.format(start=indices[0], end=indices[-1], count=count),
+        "utterance_indices": indices,
+        "severity": rule.severity,
+    }
+
+
+def detect_rule_patterns(
+    utterances_labeled: Iterable[Dict[str, Any]],
+    rule_set: Optional[RuleSet] = None,
+) -> List[Dict[str, Any]]:
+    """라벨링된 발화 리스트에 규칙을 적용해 패턴 리스트 반환"""
+    scanner = PatternScanner(rule_set or load_rules())
+    for utt in utterances_labeled:
+        scanner.feed(utt.get("speaker"), utt.get("label"))
+    return scanner.results()
+
+
+def _is_vectorizable(rule: PatternRule) -> bool:
+    """인접 발화만 보는 규칙은 마스크 시프트 연산으로 한 번에 계산할 수 있다"""
+    return (
+        rule.max_gap == 0
+        and rule.min_count <= 1
+        and (rule.window is None or rule.window >= len(rule.steps))
+    )
+
+
+def detect_rule_patterns_columnar(
+    store: "UtteranceStore",
+    rule_set: Optional[RuleSet] = None,
+) -> List[Dict[str, Any]]:
+    """
+    컬럼형 발화 저장소에 규칙을 적용 (detect_rule_patterns와 같은 결과)
+    간격 없는 시퀀스 규칙은 NumPy 마스크 연산으로, 나머지는 스캐너로 처리한다.
+    """
+    rule_set = rule_set or load_rules()
+    n = len(store)
+    patterns: List[Dict[str, Any]] = []
+    decoded: Optional[List[Tuple[str, str]]] = None
+
+    for rule in rule_set.rules:
+        k = len(rule.steps)
+        if _is_vectorizable(rule):
+            if n < k:
+                continue
+            # starts[i]: i번째 발화부터 k개 단계가 연속으로 매칭되는지
+            starts = np.ones(n - k + 1, dtype=bool)
+            for offset, step in enumerate(rule.steps):
+                step_mask = store.mask(
+                    speaker=step.speaker,
+                    labels=step.labels,
+                    not_labels=step.not_labels,
+                )
+                starts &= step_mask[offset:n - k + 1 + offset]
+            for start in np.flatnonzero(starts).tolist():
+                patterns.append(_make_pattern(rule, list(range(start, start + k))))
+            continue
+
+        if decoded is None:
+            decoded = [(store.speaker_at(i), store.label_at(i)) for i in range(n)]
+        scanner = PatternScanner(RuleSet(version=rule_set.version, rules=[rule]))
+        for speaker, label in decoded:
+            scanner.feed(speaker, label)
+        patterns.extend(scanner.results())
+
+    return patterns
@@ -0,0 +1,297 @@
+"""
+세션 결과 / 그래프 상태 바이너리 인코딩
+
+결과 JSON은 같은 키와 같은 한국어 문장(key_moments의 대화 사본, coaching_plan의 full_text와 섹션 등)이
+반복되므로, msgpack으로 구조를 줄이고 우리 출력으로 학습한 공유 사전으로 zstd 압축한다.
+
+    encode(obj) -> bytes
+    decode(data) -> obj   (decode(encode(x)) == json.loads(json.dumps(x)))
+
+헤더(8바이트): b"DR" | 버전 | 형식(상위 4비트 압축, 하위 4비트 컨테이너) | 사전 ID(uint32)
+msgpack / zstandard가 없으면 json + zlib(같은 사전을 zdict로 사용)으로 인코딩하며,
+어떤 형식으로 인코딩했든 헤더를 보고 디코딩한다.
+
+사전을 다시 학습하면 이전 사전은 <사전 경로>.<사전 ID>로 보관되고, 기본 코덱은 현재 사전과 보관된 사전을
+모두 등록해 이전 사전으로 인코딩된 메모/체크포인트도 디코딩한다. 등록되지 않은 사전 ID는
+UnknownDictionaryError (메모 캐시는 캐시 미스, 체크포인트는 없는 것으로 처리)
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import struct
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from src.utils.log import get_logger
+
+log = get_logger(__name__)
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+_MAGIC = b"DR"
+_VERSION = 1
+_HEADER = struct.Struct(">2sBBI")
+
+# 컨테이너
+CONTAINER_JSON = 0
+CONTAINER_MSGPACK = 1
+
+# 압축
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_ZSTD = 2
+
+DEFAULT_DICT_PATH = Path(__file__).parent / "result_codec.dict"
+DEFAULT_LEVEL = int(os.getenv("RESULT_CODEC_LEVEL", "6"))
+
+# zlib의 zdict는 마지막 32KB만 사용한다
+_ZLIB_WINDOW = 32 * 1024
+
+
+class UnknownDictionaryError(ValueError):
+    """데이터를 인코딩한 압축 사전이 코덱에 등록되어 있지 않음"""
+
+    def __init__(self, dict_id: int, known: Iterable[int]):
+        self.dict_id = dict_id
+        super().__init__(f"등록되지 않은 압축 사전입니다 (데이터: {dict_id}, 등록: {sorted(known)})")
+
+
+def _json_bytes(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _normalize(obj: Any) -> Any:
+    """JSON 왕복과 같은 값이 되도록 정규화 (튜플 → 리스트, dict 키 → 문자열)"""
+    return json.loads(_json_bytes(obj))
+
+
+class ResultCodec:
+    """
+    Args:
+        dictionary: 공유 압축 사전 바이트 (None이면 사전 없이 압축)
+        level: 압축 레벨
+        container: CONTAINER_JSON / CONTAINER_MSGPACK (None이면 사용 가능한 것 중 msgpack 우선)
+        compression: COMPRESSION_* (None이면 zstd 우선)
+        previous: 디코딩에만 쓰는 이전 사전들 (사전을 교체한 뒤에도 기존 데이터를 읽기 위해)
+    """
+
+    def __init__(
+        self,
+        dictionary: Optional[bytes] = None,
+        level: int = DEFAULT_LEVEL,
+        container: Optional[int] = None,
+        compression: Optional[int] = None,
+        previous: Iterable[bytes] = (),
+    ):
+        self.dictionary = dictionary
+        self.level = level
+        self.container = container if container is not None else (
+            CONTAINER_MSGPACK if MSGPACK_AVAILABLE else CONTAINER_JSON
+        )
+        self.compression = compression if compression is not None else (
+            COMPRESSION_ZSTD if ZSTD_AVAILABLE else COMPRESSION_ZLIB
+        )
+        if self.container == CONTAINER_MSGPACK and not MSGPACK_AVAILABLE:
+            raise ImportError("msgpack 라이브러리가 필요합니다. pip install msgpack")
+        if self.compression == COMPRESSION_ZSTD and not ZSTD_AVAILABLE:
+            raise ImportError("zstandard 라이브러리가 필요합니다. pip install zstandard")
+
+        # 사전 ID(adler32) → 사전 바이트 / zstd 사전 객체 (현재 사전 + 이전 사전)
+        self._dictionaries: Dict[int, bytes] = {}
+        self._zstd_dicts: Dict[int, Any] = {}
+        for previous_dictionary in previous:
+            self.add_dictionary(previous_dictionary)
+        self.dict_id = self.add_dictionary(dictionary) if dictionary else 0
+
+    def add_dictionary(self, dictionary: bytes) -> int:
+        """디코딩용 사전 등록 후 사전 ID 반환"""
+        dict_id = zlib.adler32(dictionary)
+        self._dictionaries[dict_id] = dictionary
+        if ZSTD_AVAILABLE:
+            self._zstd_dicts[dict_id] = zstandard.ZstdCompressionDict(dictionary)
+        return dict_id
+
+    @property
+    def dictionary_ids(self) -> List[int]:
+        return sorted(self._dictionaries)
+
+    # ------------------------------------------------------------------ #
+    # 컨테이너
+    # ------------------------------------------------------------------ #
+    def _pack(self, obj: Any) -> tuple:
+        if self.container == CONTAINER_MSGPACK:
+            try:
+                return CONTAINER_MSGPACK, msgpack.packb(_normalize(obj), use_bin_type=True)
+            except (OverflowError, TypeError, ValueError):
+                # 64비트를 넘는 정수 등 msgpack으로 표현할 수 없는 값은 JSON으로
+                pass
+        return CONTAINER_JSON, _json_bytes(obj)
+
+    @staticmethod
+    def _unpack(container: int, raw: bytes) -> Any:
+        if container == CONTAINER_MSGPACK:
+            if not MSGPACK_AVAILABLE:
+                raise ImportError("msgpack 라이브러리가 필요합니다. pip install msgpack")
+            return msgpack.unpackb(raw, raw=False, strict_map_key=False)
+        if container == CONTAINER_JSON:
+            return json.loads(raw.decode("utf-8"))
+        raise ValueError(f"알 수 없는 컨테이너 형식입니다: {container}")
+
+    # ------------------------------------------------------------------ #
+    # 압축
+    # ------------------------------------------------------------------ #
+    def _compress(self, raw: bytes) -> bytes:
+        if self.compression == COMPRESSION_ZSTD:
+            # zstd 압축기/해제기 객체는 스레드 간 공유할 수 없어 호출마다 만든다 (생성 비용은 작다)
+            dict_data = self._zstd_dicts.get(self.dict_id) if self.dictionary else None
+            return zstandard.ZstdCompressor(level=self.level, dict_data=dict_data).compress(raw)
+        if self.compression == COMPRESSION_ZLIB:
+            if self.dictionary:
+                c = zlib.compressobj(self.level, zdict=self.dictionary[-_ZLIB_WINDOW:])
+                return c.compress(raw) + c.flush()
+            return zlib.compress(raw, self.level)
+        return raw
+
+    def _decompress(self, compression: int, dict_id: int, payload: bytes) -> bytes:
+        if dict_id and dict_id not in self._dictionaries:
+            raise UnknownDictionaryError(dict_id, self._dictionaries)
+        if compression == COMPRESSION_ZSTD:
+            if not ZSTD_AVAILABLE:
+                raise ImportError("zstandard 라이브러리가 필요합니다. pip install zstandard")
+            dict_data = self._zstd_dicts[dict_id] if dict_id else None
+            return zstandard.ZstdDecompressor(dict_data=dict_data).decompress(payload)
+        if compression == COMPRESSION_ZLIB:
+            if dict_id:
+                d = zlib.decompressobj(zdict=self._dictionaries[dict_id][-_ZLIB_WINDOW:])
+                return d.decompress(payload) + d.flush()
+            return zlib.decompress(payload)
+        if compression == COMPRESSION_NONE:
+            return payload
+        raise ValueError(f"알 수 없는 압축 형식입니다: {compression}")
+
+    # ------------------------------------------------------------------ #
+    # 공개 API
+    # ------------------------------------------------------------------ #
+    def encode(self, obj: Any) -> bytes:
+        container, raw = self._pack(obj)
+        dict_id = self.dict_id if self.dictionary and self.compression != COMPRESSION_NONE else 0
+        header = _HEADER.pack(_MAGIC, _VERSION, (self.compression << 4) | container, dict_id)
+        return header + self._compress(raw)
+
+    def decode(self, data: bytes) -> Any:
+        if len(data) < _HEADER.size:
+            raise ValueError("인코딩된 데이터가 너무 짧습니다.")
+        magic, version, fmt, dict_id = _HEADER.unpack_from(data)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError("지원하지 않는 인코딩 형식입니다.")
+        raw = self._decompress(fmt >> 4, dict_id, data[_HEADER.size:])
+        return self._unpack(fmt & 0x0F, raw)
+
+
+def train_dictionary(samples: Iterable[Any], size: int = 64 * 1024) -> bytes:
+    """
+    저장된 결과 샘플로 공유 압축 사전 학습
+    zstandard가 있으면 zstd 사전 학습, 없으면 샘플 직렬화 바이트의 뒷부분을 zlib용 사전으로 쓴다.
+    """
+    serialized = [
+        msgpack.packb(_normalize(s), use_bin_type=True) if MSGPACK_AVAILABLE else _json_bytes(s)
+        for s in samples
+    ]
+    if not serialized:
+        raise ValueError("사전 학습에 사용할 샘플이 없습니다.")
+    if ZSTD_AVAILABLE:
+        try:
+            return zstandard.train_dictionary(size, serialized).as_bytes()
+        except zstandard.ZstdError as e:
+            # 샘플이 너무 적으면 학습이 실패한다. 이때는 원본 내용 사전으로 대신한다
+            log.warning("Dictionary training failed, using raw content dictionary: %s", e)
+    return b"".join(serialized)[-min(size, _ZLIB_WINDOW):]
+
+
+def _dict_path(path: Optional[str] = None) -> Path:
+    return Path(path or os.getenv("RESULT_CODEC_DICT_PATH", str(DEFAULT_DICT_PATH)))
+
+
+def load_dictionary(path: Optional[str] = None) -> Optional[bytes]:
+    path = _dict_path(path)
+    if not path.exists():
+        return None
+    return path.read_bytes()
+
+
+def load_previous_dictionaries(path: Optional[str] = None) -> List[bytes]:
+    """보관된 이전 사전들 (<사전 경로>.<사전 ID>)"""
+    path = _dict_path(path)
+    if not path.parent.is_dir():
+        return []
+    return [
+        p.read_bytes()
+        for p in sorted(path.parent.glob(f"{path.name}.*"))
+        if p.suffix[1:].isdigit()
+    ]
+
+
+def archive_dictionary(path: Optional[str] = None) -> Optional[Path]:
+    """현재 사전을 <사전 경로>.<사전 ID>로 보관 (새 사전으로 교체하기 전에 호출)"""
+    current = load_dictionary(path)
+    if not current:
+        return None
+    archived = _dict_path(path).with_name(f"{_dict_path(path).name}.{zlib.adler32(current)}")
+    archived.write_bytes(current)
+    return archived
+
+
+_CODEC: Optional[ResultCodec] = None
+
+
+def get_codec() -> ResultCodec:
+    """공유 사전(RESULT_CODEC_DICT_PATH)으로 인코딩하고, 보관된 이전 사전으로도 디코딩하는 기본 코덱"""
+    global _CODEC
+    if _CODEC is None:
+        _CODEC = ResultCodec(dictionary=load_dictionary(), previous=load_previous_dictionaries())
+    return _CODEC
+
+
+def encode(obj: Any) -> bytes:
+    return get_codec().encode(obj)
+
+
+def decode(data: bytes) -> Any:
+    return get_codec().decode(data)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="저장된 결과로 압축 사전 학습")
+    parser.add_argument("corpus", help="결과 JSONL 파일 (한 줄에 한 세션 결과)")
+    parser.add_argument("--out", default=str(DEFAULT_DICT_PATH))
+    parser.add_argument("--size", type=int, default=64 * 1024)
+    args = parser.parse_args()
+
+    with open(args.corpus, "r", encoding="utf-8") as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+    dictionary = train_dictionary(corpus, args.size)
+    # 기존 사전으로 인코딩된 메모/체크포인트를 계속 읽을 수 있도록 교체 전에 보관
+    archived = archive_dictionary(args.out)
+    Path(args.out).write_bytes(dictionary)
+    summary: Dict[str, Any] = {
+        "samples": len(corpus),
+        "bytes": len(dictionary),
+        "dict_id": zlib.adler32(dictionary),
+        "archived": str(archived) if archived else None,
+    }
+    print(json.dumps(summary, ensure_ascii=False))
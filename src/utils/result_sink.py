@@ -0,0 +1,305 @@
+"""
+분석 결과 write-behind 저장
+
+aggregate_result 이후 persist_result 노드가 최종 결과와 중간 산출물(라벨링된 발화, 패턴)을
+프로세스 내부의 제한된 큐에 넣으면, 백그라운드 writer가 여러 세션을 모아 한 트랜잭션으로 기록한다.
+응답 경로에서는 DB 지연을 기다리지 않는다.
+
+- 큐가 가득 차면 SINK_PUT_TIMEOUT초까지 대기 (백프레셔), 그래도 자리가 없으면 버리고 dropped로 집계
+- 기록 실패 시 배치를 다시 시도 (최소 한 번 전달), session_key 기준 upsert라 중복 기록해도 결과는 같다
+- 재시도를 모두 실패한 배치는 SINK_SPOOL_DIR에 파일로 남기고, 이후 기록이 성공하거나 writer가 한가할 때
+  (SINK_SPOOL_REPLAY_INTERVAL초마다) 다시 기록한다 (프로세스를 다시 시작해도 남아 있다)
+- 프로세스 종료 시 남은 항목을 flush
+
+MySQL 테이블 (가정):
+    analysis_session(id BIGINT AUTO_INCREMENT PK, session_key VARCHAR(64) UNIQUE, family_id VARCHAR,
+                     created_at DATETIME, utterances_labeled JSON, patterns JSON, result JSON)
+"""
+
+from __future__ import annotations
+
+import atexit
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from src.utils.log import get_logger
+from src.utils.metrics import RESULT_SINK_DROPPED, register_collector
+
+log = get_logger(__name__)
+
+_TABLE = "analysis_session"
+_COLUMNS = ("session_key", "family_id", "created_at", "utterances_labeled", "patterns", "result")
+_UPDATE_COLUMNS = ("utterances_labeled", "patterns", "result")
+
+# meta에서 세션 식별자로 쓰는 키 (앞에서부터 우선)
+_KEY_FIELDS = ("session_key", "session_id", "request_id")
+
+
+def result_key(meta: Optional[Dict[str, Any]], utterances: Optional[List[Any]] = None) -> str:
+    """
+    멱등 저장 키
+    meta에 세션 식별자가 있으면 그대로 쓰고, 없으면 meta와 발화의 해시를 쓴다
+    (같은 세션을 다시 제출하면 같은 키가 나온다)
+    utterances는 입력 형식(utterances_ko / transcript / message)과 관계없이 채워지는 정규화된 발화를 넘긴다.
+    """
+    meta = meta or {}
+    for field in _KEY_FIELDS:
+        if meta.get(field):
+            return str(meta[field])[:64]
+    basis = json.dumps(
+        {"meta": meta, "utterances": utterances or []},
+        ensure_ascii=False, sort_keys=True, default=str,
+    )
+    return hashlib.sha256(basis.encode("utf-8")).hexdigest()
+
+
+class ResultSink:
+    """
+    제한된 큐 + 백그라운드 배치 writer
+
+    Args:
+        max_queue: 큐 최대 길이
+        batch_size: 한 트랜잭션에 기록할 최대 세션 수
+        flush_interval: 배치가 덜 찼어도 기록하는 주기(초)
+        put_timeout: 큐가 가득 찼을 때 대기할 최대 시간(초)
+        max_retries: 배치 기록 재시도 횟수 (초과 시 failed로 집계하고 spool_dir에 남긴다)
+        spool_dir: 재시도를 모두 실패한 배치를 남길 디렉터리 (None이면 버린다)
+        replay_interval: spool_dir의 배치를 다시 기록해 보는 최소 간격(초)
+    """
+
+    def __init__(
+        self,
+        max_queue: int = 1000,
+        batch_size: int = 50,
+        flush_interval: float = 1.0,
+        put_timeout: float = 0.5,
+        max_retries: int = 5,
+        spool_dir: Optional[str] = None,
+        replay_interval: float = 60.0,
+    ):
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.max_retries = max_retries
+        self.spool_dir = spool_dir
+        self.replay_interval = replay_interval
+        self._last_replay = 0.0
+        self._stats = {
+            "queued": 0, "written": 0, "dropped": 0, "failed": 0, "retries": 0, "batches": 0,
+            "spooled": 0, "replayed": 0,
+        }
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    def start(self) -> "ResultSink":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="result-sink", daemon=True)
+            self._thread.start()
+        return self
+
+    def submit(self, record: Dict[str, Any]) -> bool:
+        """기록할 항목을 큐에 넣는다. 백프레셔 시간 안에 자리가 나지 않으면 False"""
+        if self._closed:
+            return False
+        try:
+            self._queue.put(record, timeout=self.put_timeout)
+        except queue.Full:
+            self._count("dropped")
+            RESULT_SINK_DROPPED.inc()
+            log.warning("Result sink queue full, dropped session %s", record.get("session_key"))
+            return False
+        self._count("queued")
+        return True
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self._stats[key] += n
+
+    def _run(self) -> None:
+        while True:
+            batch: List[Dict[str, Any]] = []
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            written = self._write_with_retry(batch) if batch else True
+            if written and time.monotonic() - self._last_replay >= self.replay_interval:
+                self._replay_spool()
+            if stop:
+                return
+
+    def _write_with_retry(self, batch: List[Dict[str, Any]]) -> bool:
+        # 같은 배치 안에 같은 키가 여러 번 있으면 마지막 것만 기록
+        batch = list({r["session_key"]: r for r in batch}.values())
+        for attempt in range(self.max_retries + 1):
+            try:
+                _write_batch(batch)
+                self._count("written", len(batch))
+                self._count("batches")
+                return True
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self._count("failed", len(batch))
+                    log.warning("Result sink write error (giving up on %d sessions): %s", len(batch), e)
+                    self._spool(batch)
+                    return False
+                self._count("retries")
+                time.sleep(min(30.0, 0.5 * (2 ** attempt)))
+        return False
+
+    # ------------------------------------------------------------------ #
+    # 실패 배치 보관 (spool)
+    # 배치마다 파일 하나(<pid>-<ns>.jsonl)를 임시 파일 → rename으로 만들고, 다시 기록할 때는
+    # <파일>.claimed-<pid>로 이름을 바꿔 가져가므로 여러 워커 프로세스가 같은 디렉터리를 써도 한 번씩만 기록한다.
+    # ------------------------------------------------------------------ #
+    def _spool(self, batch: List[Dict[str, Any]]) -> None:
+        if not self.spool_dir:
+            return
+        try:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            path = os.path.join(self.spool_dir, f"{os.getpid()}-{time.time_ns()}.jsonl")
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                for record in batch:
+                    f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            os.replace(path + ".tmp", path)
+            self._count("spooled", len(batch))
+        except OSError as e:
+            log.warning("Result sink spool error (%d sessions lost): %s", len(batch), e)
+
+    def _spool_files(self) -> List[str]:
+        if not self.spool_dir or not os.path.isdir(self.spool_dir):
+            return []
+        files = []
+        for name in sorted(os.listdir(self.spool_dir)):
+            if name.endswith(".jsonl"):
+                files.append(name)
+            elif ".jsonl.claimed-" in name:
+                # 다시 기록하던 프로세스가 죽은 파일
+                pid = name.rsplit("-", 1)[1]
+                if pid.isdigit() and not _pid_alive(int(pid)):
+                    files.append(name)
+        return files
+
+    def _replay_spool(self) -> None:
+        """보관된 배치를 오래된 것부터 다시 기록 (실패하면 남은 파일은 다음 기회로)"""
+        self._last_replay = time.monotonic()
+        for name in self._spool_files():
+            base = os.path.join(self.spool_dir, name.split(".jsonl")[0] + ".jsonl")
+            path = os.path.join(self.spool_dir, name)
+            claimed = f"{base}.claimed-{os.getpid()}"
+            try:
+                os.rename(path, claimed)
+            except OSError:
+                continue  # 다른 프로세스가 가져감
+            try:
+                with open(claimed, "r", encoding="utf-8") as f:
+                    batch = [json.loads(line) for line in f if line.strip()]
+                _write_batch(batch)
+            except Exception as e:
+                os.rename(claimed, base)
+                log.warning("Result sink spool replay error: %s", e)
+                return
+            os.remove(claimed)
+            self._count("replayed", len(batch))
+
+    def close(self, timeout: float = 30.0) -> None:
+        """새 항목을 받지 않고 남은 큐를 모두 기록한 뒤 writer 종료"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "pending": self._queue.qsize()}
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def _write_batch(batch: List[Dict[str, Any]]) -> None:
+    from src.utils.sql import transaction, upsert_sql
+
+    sql = upsert_sql(_TABLE, _COLUMNS, _UPDATE_COLUMNS)
+    rows = [
+        (
+            r["session_key"],
+            r.get("family_id"),
+            r["created_at"],
+            json.dumps(r.get("utterances_labeled") or [], ensure_ascii=False),
+            json.dumps(r.get("patterns") or [], ensure_ascii=False),
+            json.dumps(r.get("result") or {}, ensure_ascii=False, default=str),
+        )
+        for r in batch
+    ]
+    with transaction() as cur:
+        cur.executemany(sql, rows)
+
+
+_SINK: Optional[ResultSink] = None
+_SINK_LOCK = threading.Lock()
+
+
+def sink_enabled() -> bool:
+    return os.getenv("RESULT_SINK", "false").lower() == "true"
+
+
+def get_result_sink() -> Optional[ResultSink]:
+    """RESULT_SINK=true일 때 프로세스 전역 sink (처음 호출 시 writer 시작)"""
+    global _SINK
+    if not sink_enabled():
+        return None
+    if _SINK is None:
+        with _SINK_LOCK:
+            if _SINK is None:
+                _SINK = ResultSink(
+                    max_queue=int(os.getenv("SINK_MAX_QUEUE", "1000")),
+                    batch_size=int(os.getenv("SINK_BATCH_SIZE", "50")),
+                    flush_interval=float(os.getenv("SINK_FLUSH_INTERVAL", "1.0")),
+                    put_timeout=float(os.getenv("SINK_PUT_TIMEOUT", "0.5")),
+                    spool_dir=os.getenv("SINK_SPOOL_DIR", "./data/result_sink_spool") or None,
+                    replay_interval=float(os.getenv("SINK_SPOOL_REPLAY_INTERVAL", "60")),
+                ).start()
+                atexit.register(shutdown_result_sink)
+    return _SINK
+
+
+def _collect_metrics():
+    sink = _SINK
+    if sink is not None:
+        yield "result_sink_pending", {}, sink._queue.qsize()
+
+
+register_collector(_collect_metrics)
+
+
+def shutdown_result_sink(timeout: float = 30.0) -> None:
+    global _SINK
+    with _SINK_LOCK:
+        sink, _SINK = _SINK, None
+    if sink is not None:
+        sink.close(timeout)
+
@@ -0,0 +1,136 @@
+"""
+저장된 세션 결과 조회
+
+analysis_session 테이블(src/utils/result_sink.py 참고)을 (family_id, created_at, id) 키셋으로 페이지 조회한다.
+필터는 SQL WHERE로 내려보내고, 아래 인덱스가 필터와 정렬을 모두 처리하므로 가족의 세션 수가 늘어도
+페이지 조회 비용은 페이지 크기에만 비례한다.
+
+DB를 쓸 수 없는 곳에서는 pagination.apply_filters / apply_sort / paginate / keyset_paginate를 그대로 쓴다.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from src.utils.log import get_logger
+from src.utils.pagination import decode_cursor, encode_cursor
+
+log = get_logger(__name__)
+
+_TABLE = "analysis_session"
+
+INDEX_DDL = [
+    f"CREATE INDEX idx_session_family_created ON {_TABLE} (family_id, created_at, id)",
+]
+
+_LIST_COLUMNS = ("id", "session_key", "family_id", "created_at")
+
+# 필터 이름 → WHERE 조건 (값은 %s로 바인딩)
+_FILTERS = {
+    "created_from": "created_at >= %s",
+    "created_to": "created_at < %s",
+    "session_key": "session_key = %s",
+}
+
+
+def ensure_indexes() -> None:
+    """조회용 인덱스 생성 (이미 있으면 무시)"""
+    from src.utils.sql import run_query
+
+    for ddl in INDEX_DDL:
+        try:
+            run_query(ddl)
+        except Exception as e:
+            # 중복 인덱스 오류는 무시
+            log.info("Index create skipped: %s", e)
+
+
+def _build_query(
+    family_id: str,
+    filters: Optional[Dict[str, Any]],
+    after: Optional[List[Any]],
+    limit: int,
+    newest_first: bool,
+    include_result: bool,
+) -> Tuple[str, Tuple[Any, ...]]:
+    where = ["family_id = %s"]
+    params: List[Any] = [family_id]
+    for name, value in (filters or {}).items():
+        if value is None:
+            continue
+        if name not in _FILTERS:
+            raise ValueError(f"지원하지 않는 필터입니다: {name}")
+        where.append(_FILTERS[name])
+        params.append(value)
+    if after is not None:
+        if len(after) != 2:
+            raise ValueError("잘못된 페이지 커서입니다.")
+        where.append("(created_at, id) < (%s, %s)" if newest_first else "(created_at, id) > (%s, %s)")
+        params.extend(after)
+
+    columns = _LIST_COLUMNS + (("result",) if include_result else ())
+    order = "DESC" if newest_first else "ASC"
+    sql = (
+        f"SELECT {', '.join(columns)} FROM {_TABLE} "
+        f"WHERE {' AND '.join(where)} "
+        f"ORDER BY created_at {order}, id {order} LIMIT %s"
+    )
+    params.append(limit)
+    return sql, tuple(params)
+
+
+def _decode_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    if isinstance(row.get("result"), (str, bytes)):
+        row = {**row, "result": json.loads(row["result"])}
+    return row
+
+
+def query_results(
+    family_id: str,
+    size: int = 20,
+    cursor: Optional[str] = None,
+    filters: Optional[Dict[str, Any]] = None,
+    newest_first: bool = True,
+    include_result: bool = False,
+) -> Dict[str, Any]:
+    """
+    가족의 세션 결과 한 페이지 조회
+
+    Args:
+        family_id: 가족 ID
+        size: 페이지 크기
+        cursor: 이전 페이지의 next_cursor (첫 페이지는 None)
+        filters: created_from / created_to / session_key
+        newest_first: 최신순 여부
+        include_result: 결과 JSON 포함 여부 (목록 화면에서는 생략)
+
+    Returns:
+        {items, next_cursor}
+    """
+    from src.utils.sql import run_query
+
+    if size < 1:
+        size = 20
+    sql, params = _build_query(family_id, filters, decode_cursor(cursor), size + 1, newest_first, include_result)
+    rows = run_query(sql, params)
+    items = [_decode_row(r) for r in rows[:size]]
+    next_cursor = encode_cursor([items[-1]["created_at"], items[-1]["id"]]) if len(rows) > size else None
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def iter_results(
+    family_id: str,
+    page_size: int = 200,
+    filters: Optional[Dict[str, Any]] = None,
+    newest_first: bool = True,
+    include_result: bool = False,
+) -> Iterator[Dict[str, Any]]:
+    """가족의 세션 결과를 페이지 단위로 지연 조회하며 하나씩 반환"""
+    cursor: Optional[str] = None
+    while True:
+        page = query_results(family_id, page_size, cursor, filters, newest_first, include_result)
+        yield from page["items"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return
@@ -1,12 +1,22 @@
 from __future__ import annotations
 
+import asyncio
 import os
-from typing import Any, List, Tuple
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
 
-import pymysql
+from src.utils.metrics import register_collector
+from src.utils.tracing import span
 
 
 def get_mysql_conn():
+    # pymysql은 MySQL을 실제로 쓸 때만 임포트 (SQLite 백엔드/DB 미사용 워커의 시작 시간 단축)
+    import pymysql
+
     return pymysql.connect(
         host=os.getenv("MYSQL_HOST", "localhost"),
         user=os.getenv("MYSQL_USER", "root"),
@@ -17,10 +27,425 @@ def get_mysql_conn():
     )
 
 
+# ---------------------------------------------------------------------- #
+# SQLite 대체 백엔드 (로컬 테스트용, SQL_BACKEND=sqlite)
+# ---------------------------------------------------------------------- #
+_PLACEHOLDER_RE = re.compile(r"%s")
+
+
+class _SQLiteCursor:
+    """pymysql DictCursor와 같은 방식으로 쓸 수 있는 sqlite3 커서 래퍼 (%s 플레이스홀더 지원)"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self._cur = conn.cursor()
+
+    def __enter__(self) -> "_SQLiteCursor":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._cur.close()
+
+    @property
+    def description(self):
+        return self._cur.description
+
+    def execute(self, sql: str, params: Sequence[Any] = ()) -> int:
+        self._cur.execute(_PLACEHOLDER_RE.sub("?", sql), tuple(params or ()))
+        return self._cur.rowcount
+
+    def executemany(self, sql: str, rows: Sequence[Sequence[Any]]) -> int:
+        self._cur.executemany(_PLACEHOLDER_RE.sub("?", sql), [tuple(r) for r in rows])
+        return self._cur.rowcount
+
+    def _row(self, row) -> Dict[str, Any]:
+        return {d[0]: v for d, v in zip(self._cur.description, row)}
+
+    def fetchall(self) -> List[Dict[str, Any]]:
+        return [self._row(r) for r in self._cur.fetchall()]
+
+    def fetchmany(self, size: int) -> List[Dict[str, Any]]:
+        return [self._row(r) for r in self._cur.fetchmany(size)]
+
+
+class _SQLiteConnection:
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, uri=True)
+
+    def cursor(self, cursorclass=None) -> _SQLiteCursor:
+        return _SQLiteCursor(self._conn)
+
+    def ping(self, reconnect: bool = False) -> None:
+        self._conn.execute("SELECT 1")
+
+    def begin(self) -> None:
+        self._conn.execute("BEGIN")
+
+    def commit(self) -> None:
+        self._conn.execute("COMMIT")
+
+    def rollback(self) -> None:
+        self._conn.execute("ROLLBACK")
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def is_sqlite_backend() -> bool:
+    return os.getenv("SQL_BACKEND", "mysql").lower() == "sqlite"
+
+
+def _connect_factory() -> Callable[[], Any]:
+    if is_sqlite_backend():
+        # 기본값은 프로세스 안의 모든 풀 커넥션이 공유하는 인메모리 DB
+        path = os.getenv("SQLITE_PATH", "file:sql_shim?mode=memory&cache=shared")
+        return lambda: _SQLiteConnection(path)
+    return get_mysql_conn
+
+
+# ---------------------------------------------------------------------- #
+# 커넥션 풀
+# ---------------------------------------------------------------------- #
+class PoolTimeoutError(RuntimeError):
+    pass
+
+
+def _connection_errors() -> Tuple[type, ...]:
+    """풀로 돌려보내면 안 되는 연결 오류 타입"""
+    errors: Tuple[type, ...] = (sqlite3.OperationalError,)
+    if not is_sqlite_backend():
+        import pymysql
+
+        errors += (pymysql.err.OperationalError, pymysql.err.InterfaceError)
+    return errors
+
+
+class _PooledConn:
+    __slots__ = ("conn", "created_at", "last_used")
+
+    def __init__(self, conn: Any):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class ConnectionPool:
+    """
+    스레드 안전 커넥션 풀
+
+    - min_size개는 미리 열어 두고 max_size까지 필요할 때 연다.
+    - recycle초보다 오래된 커넥션은 반환 시 닫는다 (MySQL wait_timeout 대비).
+    - health_check초 이상 쉬었던 커넥션은 꺼낼 때 ping으로 확인한다.
+    - 프로세스가 fork되면 부모의 커넥션은 버리고 새로 연다.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        min_size: int = 1,
+        max_size: int = 10,
+        recycle: float = 3600.0,
+        health_check: float = 30.0,
+        timeout: float = 10.0,
+    ):
+        if max_size < 1 or min_size > max_size:
+            raise ValueError("풀 크기 설정이 올바르지 않습니다.")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.recycle = recycle
+        self.health_check = health_check
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._reset_state()
+
+    def _reset_state(self) -> None:
+        self._pid = os.getpid()
+        self._idle: List[_PooledConn] = []
+        self._size = 0
+        self._stats = {
+            "created": 0,
+            "closed": 0,
+            "acquired": 0,
+            "waits": 0,
+            "wait_ms_total": 0.0,
+            "timeouts": 0,
+            "health_check_failures": 0,
+            "recycled": 0,
+        }
+
+    def _check_fork(self) -> None:
+        if self._pid != os.getpid():
+            # 부모 프로세스의 소켓은 공유하면 안 되므로 닫지 않고 버린다
+            self._reset_state()
+
+    def _open(self) -> _PooledConn:
+        return _PooledConn(self._connect())
+
+    def _discard(self, pooled: _PooledConn) -> None:
+        try:
+            pooled.conn.close()
+        except Exception:
+            pass
+        self._stats["closed"] += 1
+        self._size -= 1
+
+    def fill(self) -> None:
+        """min_size까지 커넥션을 미리 연다"""
+        with self._cond:
+            self._check_fork()
+            while self._size < self.min_size:
+                self._size += 1
+                try:
+                    self._idle.append(self._open())
+                    self._stats["created"] += 1
+                except Exception:
+                    self._size -= 1
+                    raise
+
+    def acquire(self) -> _PooledConn:
+        deadline = time.monotonic() + self.timeout
+        waited_from: Optional[float] = None
+        with self._cond:
+            self._check_fork()
+            while True:
+                while self._idle:
+                    pooled = self._idle.pop()
+                    if time.monotonic() - pooled.last_used >= self.health_check:
+                        try:
+                            pooled.conn.ping(reconnect=False)
+                        except Exception:
+                            self._stats["health_check_failures"] += 1
+                            self._discard(pooled)
+                            continue
+                    return self._checked_out(pooled, waited_from)
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                if waited_from is None:
+                    waited_from = time.monotonic()
+                    self._stats["waits"] += 1
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    if not self._idle and self._size >= self.max_size:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeoutError(f"{self.timeout}초 안에 DB 커넥션을 얻지 못했습니다.")
+
+        # 새 커넥션은 락 밖에서 연다 (느린 연결이 다른 스레드를 막지 않도록)
+        try:
+            pooled = self._open()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats["created"] += 1
+            return self._checked_out(pooled, waited_from)
+
+    def _checked_out(self, pooled: _PooledConn, waited_from: Optional[float]) -> _PooledConn:
+        self._stats["acquired"] += 1
+        if waited_from is not None:
+            self._stats["wait_ms_total"] += (time.monotonic() - waited_from) * 1000
+        return pooled
+
+    def release(self, pooled: _PooledConn, broken: bool = False) -> None:
+        with self._cond:
+            if self._pid != os.getpid():
+                return
+            now = time.monotonic()
+            if broken or now - pooled.created_at >= self.recycle:
+                if not broken:
+                    self._stats["recycled"] += 1
+                self._discard(pooled)
+            else:
+                pooled.last_used = now
+                self._idle.append(pooled)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        pooled = self.acquire()
+        broken = False
+        try:
+            yield pooled.conn
+        except _connection_errors():
+            # 연결 자체의 오류면 풀로 돌려보내지 않는다
+            broken = True
+            raise
+        finally:
+            self.release(pooled, broken=broken)
+
+    def close(self) -> None:
+        with self._cond:
+            while self._idle:
+                self._discard(self._idle.pop())
+            self._cond.notify_all()
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._cond:
+            idle = len(self._idle)
+            return {
+                **self._stats,
+                "size": self._size,
+                "idle": idle,
+                "in_use": self._size - idle,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+            }
+
+
+_POOL: Optional[ConnectionPool] = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """환경변수 설정으로 프로세스 전역 풀 생성"""
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = ConnectionPool(
+                    _connect_factory(),
+                    min_size=int(os.getenv("SQL_POOL_MIN", "1")),
+                    max_size=int(os.getenv("SQL_POOL_MAX", "10")),
+                    recycle=float(os.getenv("SQL_POOL_RECYCLE", "3600")),
+                    health_check=float(os.getenv("SQL_POOL_HEALTH_CHECK", "30")),
+                    timeout=float(os.getenv("SQL_POOL_TIMEOUT", "10")),
+                )
+    return _POOL
+
+
+def close_pool() -> None:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.close()
+            _POOL = None
+
+
+def pool_metrics() -> Dict[str, Any]:
+    return get_pool().metrics() if _POOL is not None else {}
+
+
+def _collect_metrics():
+    if _POOL is not None:
+        stats = _POOL.metrics()
+        yield "db_pool_connections", {"state": "in_use"}, stats["in_use"]
+        yield "db_pool_connections", {"state": "idle"}, stats["idle"]
+
+
+register_collector(_collect_metrics)
+
+
+# ---------------------------------------------------------------------- #
+# 쿼리 헬퍼
+# ---------------------------------------------------------------------- #
 def run_query(sql: str, params: Tuple[Any, ...] | None = None) -> List[dict]:
-    with get_mysql_conn() as conn:
+    with span("db.query"), get_pool().connection() as conn:
         with conn.cursor() as cur:
             cur.execute(sql, params or ())
             if cur.description:
                 return list(cur.fetchall())
             return []
+
+
+def run_many(sql: str, rows: Sequence[Tuple[Any, ...]]) -> int:
+    """executemany로 여러 행을 한 번에 실행하고 영향받은 행 수 반환"""
+    if not rows:
+        return 0
+    with span("db.write", rows=len(rows)), get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            return cur.executemany(sql, rows) or 0
+
+
+def upsert_sql(table: str, columns: Sequence[str], update_columns: Optional[Sequence[str]] = None) -> str:
+    """
+    INSERT 문 생성
+    update_columns를 주면 키 중복 시 해당 컬럼을 갱신한다
+    (MySQL ON DUPLICATE KEY UPDATE, SQLite 백엔드에서는 INSERT OR REPLACE)
+    """
+    placeholders = ", ".join(["%s"] * len(columns))
+    if update_columns and is_sqlite_backend():
+        return f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+    if update_columns:
+        sql += " ON DUPLICATE KEY UPDATE " + ", ".join(f"{c} = VALUES({c})" for c in update_columns)
+    return sql
+
+
+@contextmanager
+def transaction() -> Iterator[Any]:
+    """커넥션 하나에서 BEGIN/COMMIT으로 묶인 커서 (예외 시 ROLLBACK)"""
+    with span("db.transaction"), get_pool().connection() as conn:
+        conn.begin()
+        try:
+            with conn.cursor() as cur:
+                yield cur
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+
+def bulk_insert(
+    table: str,
+    columns: Sequence[str],
+    rows: Sequence[Tuple[Any, ...]],
+    update_columns: Optional[Sequence[str]] = None,
+    chunk_size: int = 1000,
+) -> int:
+    """
+    여러 행을 chunk_size 단위 executemany로 삽입
+    update_columns를 주면 키 중복 시 해당 컬럼을 갱신한다 (upsert_sql 참고)
+    """
+    sql = upsert_sql(table, columns, update_columns)
+    affected = 0
+    for i in range(0, len(rows), chunk_size):
+        affected += run_many(sql, rows[i:i + chunk_size])
+    return affected
+
+
+def stream_query(
+    sql: str,
+    params: Tuple[Any, ...] | None = None,
+    fetch_size: int = 500,
+) -> Iterator[Dict[str, Any]]:
+    """
+    서버 사이드 커서로 큰 결과를 fetch_size씩 나눠 읽는다
+    이터레이터를 끝까지 소비하거나 닫을 때까지 커넥션 하나를 점유한다.
+    """
+    with get_pool().connection() as conn:
+        if isinstance(conn, _SQLiteConnection):
+            cursor = conn.cursor()
+        else:
+            import pymysql
+
+            cursor = conn.cursor(pymysql.cursors.SSDictCursor)
+        with cursor as cur:
+            cur.execute(sql, params or ())
+            while True:
+                rows = cur.fetchmany(fetch_size)
+                if not rows:
+                    return
+                yield from rows
+
+
+# ---------------------------------------------------------------------- #
+# asyncio 변형 (이벤트 루프를 막지 않도록 풀 작업을 스레드로 넘긴다)
+# ---------------------------------------------------------------------- #
+async def run_query_async(sql: str, params: Tuple[Any, ...] | None = None) -> List[dict]:
+    return await asyncio.to_thread(run_query, sql, params)
+
+
+async def run_many_async(sql: str, rows: Sequence[Tuple[Any, ...]]) -> int:
+    return await asyncio.to_thread(run_many, sql, rows)
+
+
+async def bulk_insert_async(
+    table: str,
+    columns: Sequence[str],
+    rows: Sequence[Tuple[Any, ...]],
+    update_columns: Optional[Sequence[str]] = None,
+    chunk_size: int = 1000,
+) -> int:
+    return await asyncio.to_thread(bulk_insert, table, columns, rows, update_columns, chunk_size)
@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+STYLE_TYPES = ["authoritative", "authoritarian", "permissive", "uninvolved", "mixed"]
+
+# 스타일별 선형 점수 가중치 (특징값은 모두 0~1 비율)
+# 기존 통계 폴백 규칙(명령/부정 비율이 높으면 authoritarian, 칭찬/반영 비율이 높으면 authoritative,
+# 명령/부정이 거의 없으면 permissive)을 연속적인 점수로 옮긴 것이다.
+_WEIGHTS: Dict[str, Dict[str, float]] = {
+    "authoritative": {"bias": -1.0, "positive_ratio": 4.0, "reflection_ratio": 4.0, "question_ratio": 1.0,
+                      "negative_ratio": -3.0, "command_ratio": -1.0},
+    "authoritarian": {"bias": -1.2, "command_ratio": 4.0, "negative_ratio": 5.0, "critical_pattern_rate": 2.0,
+                      "positive_ratio": -2.0, "reflection_ratio": -2.0},
+    "permissive": {"bias": 0.2, "command_ratio": -5.0, "negative_ratio": -5.0, "positive_ratio": 0.5},
+    "uninvolved": {"bias": 1.5, "parent_share": -6.0, "question_ratio": -2.0, "reflection_ratio": -2.0},
+    "mixed": {"bias": 0.0},
+}
+
+# 점수를 확률로 바꿀 때의 온도
+# 기본값은 코퍼스로 맞추기 전의 값이다. 라벨링된 세션 코퍼스에서 fit_temperature()
+# (python -m src.utils.style_classifier corpus.jsonl --fit)로 구한 값을 지정해야 style_confidence가 보정된 확률이 된다.
+DEFAULT_TEMPERATURE = float(os.getenv("STYLE_CLASSIFIER_TEMPERATURE", "0.5"))
+
+# fit_temperature의 기본 탐색 범위 (로그 간격)
+_TEMPERATURE_GRID = [round(0.05 * (1.15 ** i), 4) for i in range(33)]
+
+# 1순위와 2순위 확률 차이가 이 값보다 작으면 모호한 세션으로 보고 LLM에 판정을 맡긴다
+DEFAULT_AMBIGUITY_BAND = float(os.getenv("STYLE_AMBIGUITY_BAND", "0.15"))
+
+# 부모의 부정적 상호작용을 나타내는 규칙 패턴
+_CRITICAL_PATTERNS = {"비판적반응", "명령과제시"}
+
+
+@dataclass
+class StylePrediction:
+    style_type: str
+    probabilities: Dict[str, float]
+    margin: float
+    ambiguous: bool
+
+    @property
+    def confidence(self) -> float:
+        """판정 스타일의 확률 (온도를 코퍼스로 맞춘 경우에만 보정된 확률)"""
+        return self.probabilities[self.style_type]
+
+
+def style_features(
+    label_counts: Dict[str, int],
+    total_utterances: int,
+    patterns: Optional[List[Dict[str, Any]]] = None,
+    pattern_counts: Optional[Dict[str, int]] = None,
+) -> Dict[str, float]:
+    """
+    부모 라벨 분포와 패턴 수에서 분류기 특징값 계산
+    pattern_counts(패턴 이름별 누적 수)를 주면 patterns 대신 사용한다 (실시간 세션의 증분 집계)
+    """
+    total_parent = sum(label_counts.values())
+
+    def _ratio(label: str) -> float:
+        return (label_counts.get(label, 0) / total_parent) if total_parent > 0 else 0.0
+
+    if pattern_counts is not None:
+        critical = sum(pattern_counts.get(name, 0) for name in _CRITICAL_PATTERNS)
+    else:
+        critical = sum(1 for p in patterns or [] if p.get("pattern_name") in _CRITICAL_PATTERNS)
+    return {
+        "positive_ratio": _ratio("PR"),
+        "negative_ratio": _ratio("NEG"),
+        "command_ratio": _ratio("CMD"),
+        "question_ratio": _ratio("Q"),
+        "reflection_ratio": _ratio("RD"),
+        "parent_share": (total_parent / total_utterances) if total_utterances > 0 else 0.0,
+        "critical_pattern_rate": min(1.0, critical / total_parent) if total_parent > 0 else 0.0,
+    }
+
+
+def classify_style(
+    features: Dict[str, float],
+    temperature: float = DEFAULT_TEMPERATURE,
+    ambiguity_band: float = DEFAULT_AMBIGUITY_BAND,
+) -> StylePrediction:
+    """특징값으로 스타일 확률을 계산하고 모호 여부를 판정"""
+    scores = {
+        style: sum(w * (1.0 if name == "bias" else features.get(name, 0.0)) for name, w in weights.items())
+        for style, weights in _WEIGHTS.items()
+    }
+    top = max(scores.values())
+    exp = {style: math.exp((score - top) / temperature) for style, score in scores.items()}
+    total = sum(exp.values())
+    probabilities = {style: exp[style] / total for style in STYLE_TYPES}
+
+    ranked = sorted(probabilities, key=probabilities.get, reverse=True)
+    margin = probabilities[ranked[0]] - probabilities[ranked[1]]
+    return StylePrediction(
+        style_type=ranked[0],
+        probabilities=probabilities,
+        margin=margin,
+        ambiguous=margin < ambiguity_band,
+    )
+
+
+def _record_features(record: Dict[str, Any]) -> Optional[Dict[str, float]]:
+    """세션 기록의 분류기 특징값 (라벨링된 발화가 없으면 None)"""
+    utterances = record.get("utterances_labeled") or []
+    if not utterances:
+        return None
+    label_counts: Dict[str, int] = {}
+    for utt in utterances:
+        if utt.get("speaker") == "Parent":
+            label = utt.get("label", "OTH")
+            label_counts[label] = label_counts.get(label, 0) + 1
+    return style_features(label_counts, len(utterances), record.get("patterns"))
+
+
+def _labeled_sessions(records: Iterable[Dict[str, Any]]) -> List[Tuple[Dict[str, float], str]]:
+    """(특징값, LLM이 고른 style_type) 리스트"""
+    sessions = []
+    for record in records:
+        expected = record.get("style_type") or (record.get("style_analysis") or {}).get("style_type")
+        features = _record_features(record)
+        if expected in STYLE_TYPES and features is not None:
+            sessions.append((features, expected))
+    return sessions
+
+
+def _calibration_error(pairs: List[Tuple[float, bool]], bins: int = 10) -> float:
+    """기대 보정 오차 (신뢰도 구간별 |정답률 - 평균 신뢰도|의 가중 평균)"""
+    if not pairs:
+        return 0.0
+    buckets: Dict[int, List[Tuple[float, bool]]] = {}
+    for conf, hit in pairs:
+        buckets.setdefault(min(bins - 1, int(conf * bins)), []).append((conf, hit))
+    return sum(
+        abs(sum(h for _, h in bucket) / len(bucket) - sum(c for c, _ in bucket) / len(bucket)) * len(bucket)
+        for bucket in buckets.values()
+    ) / len(pairs)
+
+
+def evaluate_agreement(
+    records: Iterable[Dict[str, Any]],
+    temperature: float = DEFAULT_TEMPERATURE,
+    ambiguity_band: float = DEFAULT_AMBIGUITY_BAND,
+) -> Dict[str, Any]:
+    """
+    코퍼스에서 분류기와 LLM이 고른 style_type의 일치도 측정
+
+    Args:
+        records: {utterances_labeled, patterns, style_type} 또는
+                 {utterances_labeled, patterns, style_analysis: {style_type}} 형식의 세션 기록
+
+    Returns:
+        전체/비모호 세션 일치율, 모호 세션 비율, 보정 오차, 혼동 행렬
+    """
+    total = agree = confident = confident_agree = 0
+    confusion: Dict[str, Dict[str, int]] = {}
+    pairs: List[Tuple[float, bool]] = []
+
+    for features, expected in _labeled_sessions(records):
+        prediction = classify_style(features, temperature, ambiguity_band)
+
+        total += 1
+        hit = prediction.style_type == expected
+        agree += hit
+        pairs.append((prediction.confidence, hit))
+        if not prediction.ambiguous:
+            confident += 1
+            confident_agree += hit
+        row = confusion.setdefault(expected, {})
+        row[prediction.style_type] = row.get(prediction.style_type, 0) + 1
+
+    return {
+        "sessions": total,
+        "agreement": (agree / total) if total else 0.0,
+        "confident_agreement": (confident_agree / confident) if confident else 0.0,
+        "ambiguous_rate": ((total - confident) / total) if total else 0.0,
+        "calibration_error": _calibration_error(pairs),
+        "confusion": confusion,
+    }
+
+
+def fit_temperature(
+    records: Iterable[Dict[str, Any]],
+    temperatures: Optional[Iterable[float]] = None,
+) -> Dict[str, Any]:
+    """
+    코퍼스의 LLM 판정 style_type에 대한 음의 로그 우도가 가장 작은 온도 탐색 (온도 스케일링 보정)
+    가중치는 그대로 두므로 판정 순위는 바뀌지 않고 확률(style_confidence)과 모호 판정만 달라진다.
+
+    Returns:
+        {temperature, nll, sessions}
+    """
+    sessions = _labeled_sessions(records)
+    if not sessions:
+        raise ValueError("온도를 맞출 라벨링된 세션이 없습니다.")
+
+    best_temperature, best_nll = DEFAULT_TEMPERATURE, math.inf
+    for temperature in temperatures or _TEMPERATURE_GRID:
+        nll = -sum(
+            math.log(max(classify_style(features, temperature).probabilities[expected], 1e-12))
+            for features, expected in sessions
+        ) / len(sessions)
+        if nll < best_nll:
+            best_temperature, best_nll = temperature, nll
+    return {"temperature": best_temperature, "nll": best_nll, "sessions": len(sessions)}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="스타일 분류기와 LLM 판정 일치도 측정 / 온도 보정")
+    parser.add_argument("corpus", help="세션 기록 JSONL 파일 (한 줄에 한 세션)")
+    parser.add_argument("--temperature", type=float, default=DEFAULT_TEMPERATURE)
+    parser.add_argument("--band", type=float, default=DEFAULT_AMBIGUITY_BAND)
+    parser.add_argument("--fit", action="store_true", help="온도를 코퍼스에 맞춘 뒤 그 온도로 측정")
+    args = parser.parse_args()
+
+    with open(args.corpus, "r", encoding="utf-8") as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+    report: Dict[str, Any] = {}
+    if args.fit:
+        report["fit"] = fit_temperature(corpus)
+        args.temperature = report["fit"]["temperature"]
+    report.update(evaluate_agreement(corpus, args.temperature, args.band))
+    print(json.dumps(report, ensure_ascii=False, indent=2))
@@ -0,0 +1,485 @@
+"""
+span 기반 트레이싱
+
+    with span("db.write", rows=len(rows)) as s:
+        ...
+        s.set(affected=n)
+
+세션(루트 span) 단위로 TRACE_SAMPLE_RATE 확률로 기록하며, 샘플링되지 않은 세션의 하위 span은 아무것도 하지 않는다.
+현재 span은 contextvar로 전달되므로 LangGraph가 노드를 실행하는 스레드에서도 부모-자식 관계가 유지된다.
+
+기록 대상: 그래프 노드(node.*), LLM 호출(llm.call, 토큰 수 / rate limit 대기), ELECTRA 배치(electra.batch),
+DB 쿼리/쓰기(db.query / db.write / db.transaction)
+
+내보내기 (루트 span이 끝나면 백그라운드 스레드에서):
+- TRACE_EXPORT=file: TRACE_PATH(JSONL)에 트레이스 하나당 한 줄의 OTLP JSON(resourceSpans) 기록
+- TRACE_EXPORT=otlp: TRACE_OTLP_ENDPOINT(예: http://localhost:4318/v1/traces)로 OTLP/HTTP JSON 전송
+
+플레임그래프 (folded stacks, flamegraph.pl / speedscope 입력):
+    python -m src.utils.tracing data/traces.jsonl --trace <trace_id> --critical-path > session.folded
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from uuid import UUID
+
+from src.utils.log import get_logger
+
+log = get_logger(__name__)
+
+SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0") or 0)
+EXPORT = os.getenv("TRACE_EXPORT", "file").lower()
+TRACE_PATH = os.getenv("TRACE_PATH", "./data/traces.jsonl")
+OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "linkid-multi-agent")
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "events", "status")
+
+    def __init__(self, trace: "_Trace", parent: Optional["Span"], name: str, attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent is not None else None
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.events: List[Dict[str, Any]] = []
+        self.status = "ok"
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def event(self, name: str, **attributes: Any) -> None:
+        self.events.append({"name": name, "time_ns": time.time_ns(), "attributes": attributes})
+
+    def error(self, exc: BaseException) -> None:
+        self.status = "error"
+        self.event("exception", type=type(exc).__name__, message=str(exc))
+
+    def end(self) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            self.trace.finish(self)
+
+
+class _NoopSpan:
+    """샘플링되지 않은 트레이스의 span (모든 호출이 무시된다)"""
+
+    trace_id = None
+    span_id = None
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+    def event(self, name: str, **attributes: Any) -> None:
+        pass
+
+    def error(self, exc: BaseException) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+_CURRENT: ContextVar[Any] = ContextVar("current_span", default=None)
+
+
+class _Trace:
+    def __init__(self):
+        self.trace_id = os.urandom(16).hex()
+        self.spans: List[Span] = []
+        self.lock = threading.Lock()
+
+    def finish(self, span: Span) -> None:
+        with self.lock:
+            self.spans.append(span)
+        if span.parent_id is None:
+            _exporter().submit(to_otlp(self))
+
+
+def tracing_enabled() -> bool:
+    return SAMPLE_RATE > 0
+
+
+def current_span() -> Any:
+    """현재 span (없거나 샘플링되지 않았으면 NOOP_SPAN)"""
+    return _CURRENT.get() or NOOP_SPAN
+
+
+def start_span(name: str, parent: Any = None, **attributes: Any) -> Any:
+    """
+    직접 끝내야 하는 span 시작 (콜백처럼 시작/종료 지점이 다른 함수에 있을 때)
+    parent가 없으면 현재 span의 자식, 현재 span도 없으면 새 트레이스의 루트(샘플링 적용)
+    """
+    parent = parent if parent is not None else _CURRENT.get()
+    if parent is NOOP_SPAN:
+        return NOOP_SPAN
+    if parent is None:
+        if not tracing_enabled() or random.random() >= SAMPLE_RATE:
+            return NOOP_SPAN
+        return Span(_Trace(), None, name, attributes)
+    return Span(parent.trace, parent, name, attributes)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Any]:
+    """현재 span의 자식 span (루트면 TRACE_SAMPLE_RATE로 샘플링)"""
+    parent = _CURRENT.get()
+    if parent is None and not tracing_enabled():
+        # 트레이싱이 꺼져 있으면 contextvar도 건드리지 않는다
+        yield NOOP_SPAN
+        return
+    s = start_span(name, parent, **attributes)
+    token = _CURRENT.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.error(e)
+        raise
+    finally:
+        _CURRENT.reset(token)
+        s.end()
+
+
+# ---------------------------------------------------------------------- #
+# LangChain 콜백 (LLM 호출 span)
+# ---------------------------------------------------------------------- #
+def llm_token_usage(response: Any) -> Tuple[int, int]:
+    """LangChain LLMResult의 (입력 토큰, 출력 토큰) - usage_metadata가 있으면 우선"""
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    for generations in response.generations:
+        for gen in generations:
+            metadata = getattr(getattr(gen, "message", None), "usage_metadata", None)
+            if metadata:
+                usage = {
+                    "prompt_tokens": metadata.get("input_tokens"),
+                    "completion_tokens": metadata.get("output_tokens"),
+                }
+    return usage.get("prompt_tokens") or 0, usage.get("completion_tokens") or 0
+
+
+def _langchain_callback_handler():
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class TracingCallbackHandler(BaseCallbackHandler):
+        """LLM 호출마다 llm.call span (모델명, 메시지 수, 입력/출력 토큰 수)"""
+
+        def __init__(self):
+            self._spans: Dict[UUID, Any] = {}
+
+        def _start(self, run_id: UUID, serialized: Optional[Dict[str, Any]], prompts: int, **kwargs: Any) -> None:
+            parent = _CURRENT.get()
+            if parent is None or parent is NOOP_SPAN:
+                # 세션 밖의 LLM 호출은 따로 트레이스를 만들지 않는다
+                return
+            invocation = kwargs.get("invocation_params") or {}
+            self._spans[run_id] = start_span(
+                "llm.call",
+                parent,
+                model=invocation.get("model") or invocation.get("model_name") or "",
+                provider=((serialized or {}).get("id") or ["?"])[-1],
+                messages=prompts,
+            )
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+            self._start(run_id, serialized, sum(len(m) for m in messages), **kwargs)
+
+        def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+            self._start(run_id, serialized, len(prompts), **kwargs)
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            s = self._spans.pop(run_id, None)
+            if s is None:
+                return
+            input_tokens, output_tokens = llm_token_usage(response)
+            s.set(input_tokens=input_tokens, output_tokens=output_tokens)
+            s.end()
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            s = self._spans.pop(run_id, None)
+            if s is not None:
+                s.error(error)
+                s.end()
+
+    return TracingCallbackHandler()
+
+
+_HANDLER = None
+
+
+def llm_callbacks() -> List[Any]:
+    """get_llm에 넘길 콜백 (트레이싱이 꺼져 있으면 빈 리스트)"""
+    global _HANDLER
+    if not tracing_enabled():
+        return []
+    if _HANDLER is None:
+        _HANDLER = _langchain_callback_handler()
+    return [_HANDLER]
+
+
+def traced_rate_limiter(requests_per_second: float):
+    """대기 시간을 llm.rate_limit_wait span으로 기록하는 LangChain rate limiter"""
+    from langchain_core.rate_limiters import InMemoryRateLimiter
+
+    class _TracedRateLimiter(InMemoryRateLimiter):
+        def acquire(self, *, blocking: bool = True) -> bool:
+            with span("llm.rate_limit_wait"):
+                return super().acquire(blocking=blocking)
+
+        async def aacquire(self, *, blocking: bool = True) -> bool:
+            with span("llm.rate_limit_wait"):
+                return await super().aacquire(blocking=blocking)
+
+    return _TracedRateLimiter(requests_per_second=requests_per_second, max_bucket_size=max(1, int(requests_per_second)))
+
+
+# ---------------------------------------------------------------------- #
+# OTLP JSON 변환 / 내보내기
+# ---------------------------------------------------------------------- #
+def _attr_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_attr_value(v) for v in value]}}
+    return {"stringValue": str(value)}
+
+
+def _from_attr_value(value: Dict[str, Any]) -> Any:
+    if "intValue" in value:
+        return int(value["intValue"])
+    if "arrayValue" in value:
+        return [_from_attr_value(v) for v in value["arrayValue"].get("values", [])]
+    for key in ("boolValue", "doubleValue", "stringValue"):
+        if key in value:
+            return value[key]
+    return None
+
+
+def _attrs(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": k, "value": _attr_value(v)} for k, v in attributes.items() if v is not None]
+
+
+def to_otlp(trace: _Trace) -> Dict[str, Any]:
+    with trace.lock:
+        spans = list(trace.spans)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": _attrs({"service.name": SERVICE_NAME, "process.pid": os.getpid()})},
+            "scopeSpans": [{
+                "scope": {"name": "src.utils.tracing"},
+                "spans": [{
+                    "traceId": trace.trace_id,
+                    "spanId": s.span_id,
+                    **({"parentSpanId": s.parent_id} if s.parent_id else {}),
+                    "name": s.name,
+                    "kind": 1,
+                    "startTimeUnixNano": str(s.start_ns),
+                    "endTimeUnixNano": str(s.end_ns or s.start_ns),
+                    "attributes": _attrs(s.attributes),
+                    "events": [
+                        {"name": e["name"], "timeUnixNano": str(e["time_ns"]), "attributes": _attrs(e["attributes"])}
+                        for e in s.events
+                    ],
+                    "status": {"code": 2 if s.status == "error" else 1},
+                } for s in spans],
+            }],
+        }],
+    }
+
+
+class _Exporter:
+    """완료된 트레이스를 백그라운드 스레드에서 파일/수집기로 내보낸다 (큐가 차면 버림)"""
+
+    def __init__(self, max_queue: int = 1000):
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max_queue)
+        self._file_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+        self.dropped = 0
+
+    def submit(self, payload: Dict[str, Any]) -> None:
+        try:
+            self._queue.put_nowait(payload)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            payload = self._queue.get()
+            if payload is None:
+                return
+            try:
+                if EXPORT == "otlp":
+                    self._post(payload)
+                else:
+                    self._write(payload)
+            except Exception as e:
+                log.warning("Trace export error: %s", e)
+
+    def _write(self, payload: Dict[str, Any]) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(TRACE_PATH)), exist_ok=True)
+        line = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+        with self._file_lock, open(TRACE_PATH, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    @staticmethod
+    def _post(payload: Dict[str, Any]) -> None:
+        from urllib.request import Request, urlopen
+
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        req = Request(OTLP_ENDPOINT, data=data, headers={"Content-Type": "application/json"}, method="POST")
+        with urlopen(req, timeout=5):
+            pass
+
+    def close(self, timeout: float = 5.0) -> None:
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+
+_EXPORTER: Optional[_Exporter] = None
+_EXPORTER_LOCK = threading.Lock()
+
+
+def _exporter() -> _Exporter:
+    global _EXPORTER
+    with _EXPORTER_LOCK:
+        if _EXPORTER is None:
+            _EXPORTER = _Exporter()
+            atexit.register(_EXPORTER.close)
+    return _EXPORTER
+
+
+def shutdown_tracing(timeout: float = 5.0) -> None:
+    """남은 트레이스를 내보내고 exporter 스레드 종료 (os._exit로 끝나는 서버 워커에서 호출)"""
+    global _EXPORTER
+    with _EXPORTER_LOCK:
+        exporter, _EXPORTER = _EXPORTER, None
+    if exporter is not None:
+        exporter.close(timeout)
+
+
+# ---------------------------------------------------------------------- #
+# 플레임그래프
+# ---------------------------------------------------------------------- #
+def load_traces(path: str) -> Dict[str, List[Dict[str, Any]]]:
+    """OTLP JSON 파일 → {trace_id: [span dict(name, span_id, parent_id, start_ns, end_ns, attributes)]}"""
+    traces: Dict[str, List[Dict[str, Any]]] = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            for rs in json.loads(line).get("resourceSpans", []):
+                for ss in rs.get("scopeSpans", []):
+                    for s in ss.get("spans", []):
+                        traces.setdefault(s["traceId"], []).append({
+                            "name": s["name"],
+                            "span_id": s["spanId"],
+                            "parent_id": s.get("parentSpanId"),
+                            "start_ns": int(s["startTimeUnixNano"]),
+                            "end_ns": int(s["endTimeUnixNano"]),
+                            "attributes": {a["key"]: _from_attr_value(a["value"]) for a in s.get("attributes", [])},
+                        })
+    return traces
+
+
+def _node_critical_path(spans: List[Dict[str, Any]]) -> List[str]:
+    """노드 span의 시작/종료/선행 노드로 세션 임계 경로 계산 (dag.critical_path와 같은 규칙)"""
+    from src.router.dag import critical_path
+
+    timings = {
+        s["attributes"]["graph.node"]: {
+            "start": s["start_ns"] / 1e9,
+            "end": s["end_ns"] / 1e9,
+            "deps": s["attributes"].get("graph.deps") or [],
+        }
+        for s in spans if "graph.node" in s["attributes"]
+    }
+    return critical_path(timings)["path"]
+
+
+def folded_stacks(spans: List[Dict[str, Any]], critical_only: bool = False) -> List[str]:
+    """
+    span 트리 → folded stack 줄 ("root;node.summarize;llm.call 1234", 값은 자기 시간 µs)
+    critical_only면 임계 경로에 있는 노드 span과 그 하위 span만 포함
+    """
+    by_id = {s["span_id"]: s for s in spans}
+    children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    for s in spans:
+        parent = s["parent_id"] if s["parent_id"] in by_id else None
+        children.setdefault(parent, []).append(s)
+
+    keep_nodes = set(_node_critical_path(spans)) if critical_only else None
+    lines: List[str] = []
+
+    def _walk(s: Dict[str, Any], stack: List[str]) -> None:
+        node = s["attributes"].get("graph.node")
+        if keep_nodes is not None and node is not None and node not in keep_nodes:
+            return
+        stack = stack + [s["name"]]
+        duration = s["end_ns"] - s["start_ns"]
+        # 병렬 자식의 합이 부모보다 길 수 있으므로 자기 시간은 0 이상으로 자른다
+        child_total = sum(c["end_ns"] - c["start_ns"] for c in children.get(s["span_id"], []))
+        self_us = max(0, duration - child_total) // 1000
+        if self_us:
+            lines.append(f"{';'.join(stack)} {self_us}")
+        for c in sorted(children.get(s["span_id"], []), key=lambda c: c["start_ns"]):
+            _walk(c, stack)
+
+    for root in children.get(None, []):
+        _walk(root, [])
+    return lines
+
+
+def _merge_folded(lines: Iterable[str]) -> List[str]:
+    totals: Dict[str, int] = {}
+    for line in lines:
+        stack, value = line.rsplit(" ", 1)
+        totals[stack] = totals.get(stack, 0) + int(value)
+    return [f"{stack} {value}" for stack, value in sorted(totals.items())]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="트레이스 파일 → 플레임그래프용 folded stacks")
+    parser.add_argument("path", nargs="?", default=TRACE_PATH)
+    parser.add_argument("--trace", help="trace_id (생략 시 모든 트레이스를 합산)")
+    parser.add_argument("--critical-path", action="store_true", help="세션 임계 경로의 노드만 포함")
+    parser.add_argument("--list", action="store_true", help="트레이스 목록 (trace_id, 루트 이름, 소요 ms)")
+    args = parser.parse_args()
+
+    all_traces = load_traces(args.path)
+    if args.list:
+        for trace_id, trace_spans in all_traces.items():
+            roots = [s for s in trace_spans if not s["parent_id"]]
+            root = roots[0] if roots else trace_spans[0]
+            print(f"{trace_id}\t{root['name']}\t{(root['end_ns'] - root['start_ns']) / 1e6:.1f}")
+    else:
+        selected = [all_traces[args.trace]] if args.trace else list(all_traces.values())
+        for out in _merge_folded(line for t in selected for line in folded_stacks(t, args.critical_path)):
+            print(out)
@@ -0,0 +1,328 @@
+"""
+대화 전사(transcript) 수집
+
+스피커 태그는 한 번 컴파일한 lexer로 발화마다 한 번만 파싱하고, 정규화된 코드(MOM/CHI)를 다음 단계로 넘긴다.
+
+입력 형식 (fmt를 주지 않으면 파일 확장자나 첫 줄로 판단):
+- plain: 한 줄에 한 발화 ("엄마: ...", "[아이] ...", "Parent ...")
+- jsonl: 한 줄에 세그먼트 하나 {"text", "speaker"?, "start"?, "end"?}
+- json: STT 결과 {"segments": [...]} 또는 세그먼트 리스트
+- srt / vtt: 자막 (VTT의 <v 화자> 태그 지원)
+
+파일/스트림은 한 줄씩 읽어 발화를 하나씩 내보내므로 큰 전사를 메모리에 두 번 올리지 않는다
+(json 형식만 한 번에 파싱한다).
+
+    from src.utils.transcript import ingest, ingest_text
+    utterances = list(ingest("session.vtt"))                 # 파일 경로
+    utterances = list(ingest(sys.stdin, fmt="srt"))           # 스트림
+    utterances = list(ingest(["엄마: 밥 먹자", "아이: 싫어"]))  # 발화 리스트
+    utterances = list(ingest_text(body, fmt="vtt"))          # 문자열
+
+발화마다 문자 구성으로 언어(lang)를 태깅한다 (detect_language). translate 단계는 한국어가 섞인
+발화만 번역하고 영어 발화는 그대로 라벨링으로 넘긴다.
+
+STT 화자 라벨(예: SPEAKER_00)은 TRANSCRIPT_SPEAKER_ALIASES(JSON, {"SPEAKER_00": "MOM"})로 매핑한다.
+
+    python -m src.utils.transcript session.srt    # 정규화된 발화를 JSONL로 출력
+"""
+
+from __future__ import annotations
+
+import io
+import itertools
+import json
+import os
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple, Union
+
+PARENT = "MOM"
+CHILD = "CHI"
+
+_DEFAULT_ALIASES: Dict[str, str] = {
+    **{alias: PARENT for alias in ("부모", "엄마", "아빠", "어머니", "아버지", "parent", "mom", "dad", "mother", "father")},
+    **{alias: CHILD for alias in ("아이", "자녀", "아들", "딸", "child", "kid", "son", "daughter", "chi")},
+}
+
+FORMATS = ("plain", "jsonl", "json", "srt", "vtt")
+_SUFFIX_FORMATS = {".txt": "plain", ".jsonl": "jsonl", ".json": "json", ".srt": "srt", ".vtt": "vtt"}
+
+Source = Union[str, os.PathLike, io.IOBase, Iterable[Any]]
+
+
+class SpeakerLexer:
+    """별칭 → 스피커 코드 사전과, 모든 별칭을 한 번에 매칭하도록 한 번만 컴파일한 스피커 태그 정규식"""
+
+    def __init__(self, aliases: Dict[str, str]):
+        self.aliases = {alias.lower(): code for alias, code in aliases.items()}
+        names = "|".join(re.escape(alias) for alias in sorted(self.aliases, key=len, reverse=True))
+        # "[엄마] ...", "엄마: ...", "엄마 ..." (긴 별칭 우선, 별칭 뒤에는 구분자가 와야 한다)
+        self._pattern = re.compile(
+            rf"^\s*(?:\[(?P<bracket>{names})\]\s*|(?P<bare>{names})(?:\s*:\s*|\s+))(?P<text>\S.*)$",
+            re.IGNORECASE | re.DOTALL,
+        )
+        # 공백만 있는 태그는 받지 않는다 ("엄마 밥 먹었어?"처럼 호칭으로 시작하는 발화를 태그로 읽지 않도록)
+        self._delimited_pattern = re.compile(
+            rf"^\s*(?:\[(?P<bracket>{names})\]\s*|(?P<bare>{names})\s*:\s*)(?P<text>\S.*)$",
+            re.IGNORECASE | re.DOTALL,
+        )
+
+    def code(self, name: Any) -> Optional[str]:
+        """화자 이름/라벨 → MOM | CHI (모르는 이름이면 None)"""
+        return self.aliases.get(str(name).strip().strip("[]").strip().lower())
+
+    def parse(self, line: str, bare: bool = True) -> Tuple[Optional[str], str]:
+        """
+        발화 앞의 스피커 태그 파싱 → (스피커 코드 또는 None, 태그를 뗀 발화)
+        bare=False면 대괄호나 ":"가 붙은 태그만 인정한다 (STT 세그먼트)
+        """
+        match = (self._pattern if bare else self._delimited_pattern).match(line)
+        if match is None:
+            return None, line.strip()
+        alias = match.group("bracket") or match.group("bare")
+        return self.aliases[alias.lower()], match.group("text").strip()
+
+
+@lru_cache(maxsize=1)
+def get_speaker_lexer() -> SpeakerLexer:
+    """기본 별칭 + TRANSCRIPT_SPEAKER_ALIASES로 만든 프로세스 전역 lexer"""
+    aliases = dict(_DEFAULT_ALIASES)
+    extra = os.getenv("TRANSCRIPT_SPEAKER_ALIASES")
+    if extra:
+        aliases.update({str(k): str(v).upper() for k, v in json.loads(extra).items()})
+    return SpeakerLexer(aliases)
+
+
+# ---------------------------------------------------------------------- #
+# 언어 태깅
+# ---------------------------------------------------------------------- #
+LANG_KO = "ko"
+LANG_EN = "en"
+LANG_MIXED = "mixed"
+LANG_OTHER = "other"
+
+# 한글 음절 + 자모 (ㅋㅋ, ㅠㅠ 포함)
+_HANGUL_RE = re.compile(r"[\uac00-\ud7a3\u1100-\u11ff\u3130-\u318f]")
+_LATIN_RE = re.compile(r"[A-Za-z]")
+
+
+def detect_language(text: str) -> str:
+    """
+    문자 구성으로 발화 언어 판별 (모델 없이 정규식 두 번)
+
+    Returns:
+        ko: 한글만 / mixed: 한글 + 영문 / en: 영문만 / other: 둘 다 없음 (숫자, 기호, 이모지)
+    """
+    if not _HANGUL_RE.search(text):
+        return LANG_EN if _LATIN_RE.search(text) else LANG_OTHER
+    return LANG_MIXED if _LATIN_RE.search(text) else LANG_KO
+
+
+def needs_translation(lang: str) -> bool:
+    """한글이 섞인 발화만 번역한다"""
+    return lang in (LANG_KO, LANG_MIXED)
+
+
+# ---------------------------------------------------------------------- #
+# 형식별 세그먼트 읽기
+# ---------------------------------------------------------------------- #
+_CUE_RE = re.compile(r"^(\S+)\s+-->\s+(\S+)")
+_TIMESTAMP_RE = re.compile(r"^(?:(\d+):)?(\d{1,2}):(\d{2})[,.](\d{1,3})$")
+_VOICE_RE = re.compile(r"^<v(?:\.[^\s>]*)?\s+([^>]+)>")
+_TAG_RE = re.compile(r"<[^>]+>")
+
+
+def _seconds(timestamp: str) -> Optional[float]:
+    match = _TIMESTAMP_RE.match(timestamp)
+    if match is None:
+        return None
+    hours, minutes, seconds, millis = match.groups()
+    return int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds) + int(millis.ljust(3, "0")) / 1000
+
+
+def plain_segment(text: str) -> Dict[str, Any]:
+    """사람이 적은 한 줄 발화 세그먼트 ("엄마 ..."처럼 구분자 없는 스피커 태그도 인정)"""
+    return {"text": text, "format": "plain"}
+
+
+def _iter_plain(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    for line in lines:
+        line = line.strip()
+        if line:
+            yield plain_segment(line)
+
+
+def _iter_jsonl(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    for line in lines:
+        line = line.strip()
+        if line:
+            segment = json.loads(line)
+            if isinstance(segment, dict) and ("segments" in segment or "utterances" in segment):
+                # 한 줄짜리 STT 결과 JSON
+                yield from _iter_json(segment)
+            else:
+                yield segment if isinstance(segment, dict) else {"text": str(segment)}
+
+
+def _iter_json(data: Any) -> Iterator[Dict[str, Any]]:
+    segments = (data.get("segments") or data.get("utterances")) if isinstance(data, dict) else data
+    for segment in segments or []:
+        yield segment if isinstance(segment, dict) else {"text": str(segment)}
+
+
+def _cue(start: Optional[float], end: Optional[float], lines: list) -> Dict[str, Any]:
+    text = " ".join(lines)
+    segment: Dict[str, Any] = {"start": start, "end": end}
+    voice = _VOICE_RE.match(text)
+    if voice:
+        segment["speaker"] = voice.group(1).strip()
+    segment["text"] = _TAG_RE.sub("", text).strip()
+    return segment
+
+
+def _iter_cues(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """SRT / VTT 공통: 타임코드 줄부터 빈 줄까지가 자막 하나 (번호, WEBVTT 헤더, NOTE 블록은 건너뜀)"""
+    timing: Optional[Tuple[Optional[float], Optional[float]]] = None
+    text_lines: list = []
+    for line in lines:
+        line = line.strip()
+        cue = _CUE_RE.match(line)
+        if cue:
+            if timing is not None and text_lines:
+                yield _cue(*timing, text_lines)
+            timing, text_lines = (_seconds(cue.group(1)), _seconds(cue.group(2))), []
+        elif not line:
+            if timing is not None and text_lines:
+                yield _cue(*timing, text_lines)
+            timing, text_lines = None, []
+        elif timing is not None:
+            text_lines.append(line)
+    if timing is not None and text_lines:
+        yield _cue(*timing, text_lines)
+
+
+def _sniff(first: str) -> str:
+    first = first.strip().lstrip("﻿")
+    if first.startswith("WEBVTT"):
+        return "vtt"
+    if first.isdigit() or "-->" in first:
+        return "srt"
+    if first.startswith("{"):
+        try:
+            json.loads(first)
+            return "jsonl"
+        except ValueError:
+            return "json"
+    # "[아이] ..."는 plain, "[{...", "["만 있는 줄은 JSON 배열
+    if first.startswith("[") and first[1:].lstrip()[:1] in ("", "{", '"', "]"):
+        return "json"
+    return "plain"
+
+
+def _iter_lines(lines: Iterable[str], fmt: Optional[str]) -> Iterator[Dict[str, Any]]:
+    lines = iter(lines)
+    if fmt is None:
+        head = []
+        for line in lines:
+            head.append(line)
+            if line.strip():
+                break
+        fmt = _sniff(head[-1]) if head else "plain"
+        lines = itertools.chain(head, lines)
+    if fmt == "plain":
+        return _iter_plain(lines)
+    if fmt == "jsonl":
+        return _iter_jsonl(lines)
+    if fmt == "json":
+        return _iter_json(json.loads("".join(lines)))
+    if fmt in ("srt", "vtt"):
+        return _iter_cues(lines)
+    raise ValueError(f"알 수 없는 전사 형식입니다: {fmt} (가능: {list(FORMATS)})")
+
+
+def iter_segments(source: Source, fmt: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    전사 원본 → 세그먼트 {text, speaker?, start?, end?}
+
+    Args:
+        source: 파일 경로, 텍스트 스트림, 또는 발화(문자열/세그먼트 dict) iterable
+        fmt: FORMATS 중 하나 (없으면 확장자나 첫 줄로 판단)
+    """
+    if isinstance(source, (str, os.PathLike)):
+        path = Path(source)
+        fmt = fmt or _SUFFIX_FORMATS.get(path.suffix.lower())
+        with open(path, "r", encoding="utf-8-sig") as f:
+            yield from _iter_json(json.load(f)) if fmt == "json" else _iter_lines(f, fmt)
+    elif hasattr(source, "read"):
+        yield from _iter_lines(source, fmt)
+    else:
+        for item in source:
+            if isinstance(item, dict):
+                yield item
+            elif item is not None:
+                yield plain_segment(str(item))
+
+
+# ---------------------------------------------------------------------- #
+# 발화 정규화
+# ---------------------------------------------------------------------- #
+def normalize_segment(
+    segment: Dict[str, Any],
+    last: Optional[str] = None,
+    lexer: Optional[SpeakerLexer] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    세그먼트 하나 → 정규화된 발화 {speaker: "MOM"|"CHI", 발화내용_ko, lang, start?, end?} (텍스트가 없으면 None)
+
+    스피커는 세그먼트의 speaker 필드 → 발화 앞 태그 순으로 정하고, 둘 다 없으면
+    직전 발화 스피커(last)와 다른 스피커로 추정한다 (대화는 주로 교대로 진행, 첫 발화는 부모).
+    speaker 필드가 있으면 발화 앞 태그는 파싱하지 않는다 ("엄마, 이거 봐"의 호칭을 지우지 않도록).
+    STT 세그먼트(plain_segment가 아닌 세그먼트)는 대괄호나 ":"가 붙은 태그만 인정한다.
+    """
+    lexer = lexer or get_speaker_lexer()
+    text = str(segment.get("text") or "").strip()
+    if not text:
+        return None
+    if segment.get("speaker"):
+        speaker = lexer.code(segment["speaker"])
+    else:
+        speaker, body = lexer.parse(text, bare=segment.get("format") == "plain")
+        if speaker is not None:
+            text = body
+    if speaker is None:
+        speaker = CHILD if last == PARENT else PARENT
+    utterance: Dict[str, Any] = {"speaker": speaker, "발화내용_ko": text, "lang": detect_language(text)}
+    if segment.get("start") is not None:
+        utterance["start"] = segment["start"]
+    if segment.get("end") is not None:
+        utterance["end"] = segment["end"]
+    return utterance
+
+
+def ingest(source: Source, fmt: Optional[str] = None, lexer: Optional[SpeakerLexer] = None) -> Iterator[Dict[str, Any]]:
+    """전사 원본 → 정규화된 발화 (한 번에 하나씩, normalize_segment 참고)"""
+    lexer = lexer or get_speaker_lexer()
+    last: Optional[str] = None
+    for segment in iter_segments(source, fmt):
+        utterance = normalize_segment(segment, last, lexer)
+        if utterance is not None:
+            last = utterance["speaker"]
+            yield utterance
+
+
+def ingest_text(text: str, fmt: Optional[str] = None, lexer: Optional[SpeakerLexer] = None) -> Iterator[Dict[str, Any]]:
+    """문자열로 받은 전사 (요청 본문 등)"""
+    return ingest(io.StringIO(text), fmt, lexer)
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="전사 파일을 정규화된 발화 JSONL로 출력")
+    parser.add_argument("path", nargs="?", help="전사 파일 (없으면 stdin)")
+    parser.add_argument("--format", choices=FORMATS)
+    args = parser.parse_args()
+    for utt in ingest(args.path or sys.stdin, args.format):
+        print(json.dumps(utt, ensure_ascii=False))
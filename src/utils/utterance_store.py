@@ -0,0 +1,318 @@
+from __future__ import annotations
+
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+# 직렬화 형식 버전
+STORE_VERSION = 1
+
+# 기본 코드 테이블 (처음 보는 값은 뒤에 추가된다)
+_DEFAULT_SPEAKERS = ["Parent", "Child", "Unknown"]
+_DEFAULT_LABELS = ["PR", "RD", "BD", "NT", "Q", "CMD", "NEG", "IGN", "OTH"]
+
+
+class UtteranceStore:
+    """
+    라벨링된 발화의 컬럼형 저장소
+
+    발화별 dict 대신 다음 컬럼을 유지한다.
+    - speaker / label: int8 코드 배열 (코드 테이블 인덱스)
+    - english / korean: int32 배열 (중복 제거된 문자열 테이블 인덱스)
+
+    기존 utterances_labeled dict 형식은 __getitem__ / as_dicts()로 복원할 수 있다.
+    """
+
+    def __init__(self, capacity: int = 16):
+        self.strings: List[str] = []
+        self._string_ids: Dict[str, int] = {}
+        self.speaker_names: List[str] = list(_DEFAULT_SPEAKERS)
+        self.label_names: List[str] = list(_DEFAULT_LABELS)
+        self._size = 0
+        self._speaker = np.zeros(capacity, dtype=np.int8)
+        self._label = np.zeros(capacity, dtype=np.int8)
+        self._english = np.zeros(capacity, dtype=np.int32)
+        self._korean = np.zeros(capacity, dtype=np.int32)
+        self._dicts: Optional[List[Dict[str, Any]]] = None
+
+    # ------------------------------------------------------------------ #
+    # 생성 / 추가
+    # ------------------------------------------------------------------ #
+    @classmethod
+    def from_utterances(cls, utterances_labeled: Iterable[Dict[str, Any]]) -> "UtteranceStore":
+        """기존 dict 리스트 형식에서 생성"""
+        items = list(utterances_labeled)
+        store = cls(capacity=max(16, len(items)))
+        for utt in items:
+            store.append(
+                speaker=utt.get("speaker", "Unknown"),
+                label=utt.get("label", "OTH"),
+                english=utt.get("english", utt.get("text", "")),
+                korean=utt.get("original_ko", utt.get("korean", "")),
+            )
+        return store
+
+    def _intern(self, text: str) -> int:
+        idx = self._string_ids.get(text)
+        if idx is None:
+            idx = len(self.strings)
+            self.strings.append(text)
+            self._string_ids[text] = idx
+        return idx
+
+    @staticmethod
+    def _code(table: List[str], value: str) -> int:
+        try:
+            return table.index(value)
+        except ValueError:
+            if len(table) >= 127:
+                raise ValueError("코드 테이블이 int8 범위를 넘었습니다.")
+            table.append(value)
+            return len(table) - 1
+
+    def _grow(self) -> None:
+        capacity = max(16, len(self._speaker) * 2)
+        self._speaker = np.resize(self._speaker, capacity)
+        self._label = np.resize(self._label, capacity)
+        self._english = np.resize(self._english, capacity)
+        self._korean = np.resize(self._korean, capacity)
+
+    def append(self, speaker: str, label: str, english: str, korean: str) -> int:
+        """발화 하나 추가 후 인덱스 반환"""
+        if self._size == len(self._speaker):
+            self._grow()
+        i = self._size
+        self._speaker[i] = self._code(self.speaker_names, speaker)
+        self._label[i] = self._code(self.label_names, label)
+        self._english[i] = self._intern(english or "")
+        self._korean[i] = self._intern(korean or "")
+        self._size += 1
+        self._dicts = None
+        return i
+
+    # ------------------------------------------------------------------ #
+    # 컬럼 접근
+    # ------------------------------------------------------------------ #
+    @property
+    def speaker_codes(self) -> np.ndarray:
+        return self._speaker[:self._size]
+
+    @property
+    def label_codes(self) -> np.ndarray:
+        return self._label[:self._size]
+
+    def speaker_at(self, i: int) -> str:
+        return self.speaker_names[self._speaker[i]]
+
+    def label_at(self, i: int) -> str:
+        return self.label_names[self._label[i]]
+
+    def english_at(self, i: int) -> str:
+        return self.strings[self._english[i]]
+
+    def korean_at(self, i: int) -> str:
+        return self.strings[self._korean[i]]
+
+    def mask(self, speaker: Optional[str] = None, labels: Optional[Iterable[str]] = None,
+             not_labels: Optional[Iterable[str]] = None) -> np.ndarray:
+        """조건을 만족하는 발화의 불리언 마스크"""
+        result = np.ones(self._size, dtype=bool)
+        if speaker is not None:
+            if speaker not in self.speaker_names:
+                return np.zeros(self._size, dtype=bool)
+            result &= self.speaker_codes == self.speaker_names.index(speaker)
+        if labels is not None:
+            codes = [self.label_names.index(lb) for lb in labels if lb in self.label_names]
+            result &= np.isin(self.label_codes, codes)
+        if not_labels:
+            codes = [self.label_names.index(lb) for lb in not_labels if lb in self.label_names]
+            result &= ~np.isin(self.label_codes, codes)
+        return result
+
+    def label_counts(self, speaker: Optional[str] = None) -> Dict[str, int]:
+        """라벨별 발화 수 (speaker 지정 시 해당 화자만)"""
+        codes = self.label_codes
+        if speaker is not None:
+            codes = codes[self.mask(speaker=speaker)]
+        counts = np.bincount(codes, minlength=len(self.label_names))
+        return {self.label_names[c]: int(n) for c, n in enumerate(counts) if n}
+
+    # ------------------------------------------------------------------ #
+    # dict 뷰 (하위 호환성)
+    # ------------------------------------------------------------------ #
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError(i)
+        english = self.english_at(i)
+        korean = self.korean_at(i)
+        return {
+            "speaker": self.speaker_at(i),
+            "text": english,
+            "label": self.label_at(i),
+            "original": korean or english,  # 한국어 원문 우선, 없으면 영어
+            "original_ko": korean,
+            "english": english,
+        }
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(self._size):
+            yield self[i]
+
+    def as_dicts(self) -> List[Dict[str, Any]]:
+        """
+        기존 utterances_labeled 형식의 dict 리스트
+        처음 요청될 때 만들어 두고 append 전까지 재사용한다 (호출자는 수정하지 않는다).
+        """
+        if self._dicts is None:
+            self._dicts = list(self)
+        return self._dicts
+
+    # ------------------------------------------------------------------ #
+    # 상태 직렬화 (체크포인트/JSON 직렬화가 가능한 기본 타입만 사용)
+    # ------------------------------------------------------------------ #
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            "version": STORE_VERSION,
+            "strings": list(self.strings),
+            "speaker_names": list(self.speaker_names),
+            "label_names": list(self.label_names),
+            "speaker": self.speaker_codes.tolist(),
+            "label": self.label_codes.tolist(),
+            "english": self._english[:self._size].tolist(),
+            "korean": self._korean[:self._size].tolist(),
+        }
+
+    @classmethod
+    def from_state(cls, data: Dict[str, Any]) -> "UtteranceStore":
+        if data.get("version") != STORE_VERSION:
+            raise ValueError(f"지원하지 않는 발화 저장소 버전입니다: {data.get('version')}")
+        speaker = np.asarray(data["speaker"], dtype=np.int8)
+        store = cls(capacity=max(16, len(speaker)))
+        store.strings = list(data["strings"])
+        store._string_ids = {s: i for i, s in enumerate(store.strings)}
+        store.speaker_names = list(data["speaker_names"])
+        store.label_names = list(data["label_names"])
+        n = len(speaker)
+        store._speaker[:n] = speaker
+        store._label[:n] = data["label"]
+        store._english[:n] = data["english"]
+        store._korean[:n] = data["korean"]
+        store._size = n
+        return store
+
+
+# utterances_columns 객체별로 복원한 저장소 캐시 (같은 실행의 노드들이 하나의 저장소를 공유)
+_STORE_CACHE_SIZE = 64
+_store_cache: "OrderedDict[int, tuple]" = OrderedDict()
+_store_cache_lock = threading.Lock()
+
+
+def get_utterance_store(state: Dict[str, Any]) -> UtteranceStore:
+    """
+    상태에서 컬럼형 저장소를 가져온다. 반환된 저장소는 여러 노드가 공유하므로 읽기 전용으로 쓴다.
+    같은 utterances_columns 객체에 대해서는 한 번만 복원하고,
+    utterances_columns가 없으면 (이전 체크포인트 등) utterances_labeled에서 생성한다.
+    """
+    columns = state.get("utterances_columns")
+    if not columns:
+        return UtteranceStore.from_utterances(state.get("utterances_labeled") or [])
+    key = id(columns)
+    with _store_cache_lock:
+        cached = _store_cache.get(key)
+        # 캐시가 columns를 참조하고 있으므로 같은 id는 같은 객체일 때만 일치한다
+        if cached is not None and cached[0] is columns:
+            _store_cache.move_to_end(key)
+            return cached[1]
+    store = UtteranceStore.from_state(columns)
+    with _store_cache_lock:
+        _store_cache[key] = (columns, store)
+        while len(_store_cache) > _STORE_CACHE_SIZE:
+            _store_cache.popitem(last=False)
+    return store
+
+
+def get_labeled_utterances(state: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """상태의 라벨링된 발화를 기존 utterances_labeled dict 형식으로 (필요할 때만 만든다)"""
+    return get_utterance_store(state).as_dicts()
+
+
+_NORMALIZE_RE = re.compile(r"[\s\.,!?~…'\"“”‘’]+")
+
+
+def normalize_text(text: str) -> str:
+    """텍스트 매칭용 정규화 (소문자, 공백/문장부호 제거)"""
+    return _NORMALIZE_RE.sub("", (text or "").lower())
+
+
+class UtteranceIndex:
+    """
+    세션별 발화 조회 인덱스
+    - 인덱스 → 발화 (상수 시간)
+    - 정규화된 텍스트 해시 → 발화 인덱스 (key_moments의 LLM이 번호 대신 원문(quotes)만 돌려준 경우, 처음 조회할 때 생성)
+    """
+
+    def __init__(self, store: UtteranceStore):
+        self.store = store
+        self._by_text: Optional[Dict[str, List[int]]] = None
+
+    def _text_map(self) -> Dict[str, List[int]]:
+        # 텍스트 조회는 드물게만 쓰이므로 (인덱스 조회만 하는 노드가 대부분) 처음 조회할 때 만든다
+        if self._by_text is None:
+            by_text: Dict[str, List[int]] = {}
+            for i in range(len(self.store)):
+                for text in (self.store.korean_at(i), self.store.english_at(i)):
+                    key = normalize_text(text)
+                    if key:
+                        positions = by_text.setdefault(key, [])
+                        if not positions or positions[-1] != i:
+                            positions.append(i)
+            self._by_text = by_text
+        return self._by_text
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def valid(self, indices: Iterable[int]) -> List[int]:
+        """범위를 벗어나거나 중복된 인덱스를 제거 (순서 유지)"""
+        seen = set()
+        out: List[int] = []
+        for idx in indices:
+            try:
+                idx = int(idx)
+            except (TypeError, ValueError):
+                continue
+            if 0 <= idx < len(self.store) and idx not in seen:
+                seen.add(idx)
+                out.append(idx)
+        return out
+
+    def find_text(self, text: str, speaker: Optional[str] = None, after: int = -1) -> Optional[int]:
+        """
+        텍스트로 발화 인덱스 조회
+        같은 문장이 여러 번 나오면 after 이후의 첫 발화를 우선 반환해 짧은 반복 발화가 엉뚱한 위치로 매핑되지 않게 한다.
+        """
+        positions = self._text_map().get(normalize_text(text))
+        if not positions:
+            return None
+        if speaker:
+            speaker = speaker.lower()
+            positions = [i for i in positions if self.store.speaker_at(i).lower() == speaker] or positions
+        for i in positions:
+            if i > after:
+                return i
+        return positions[0]
+
+    def dialogue(self, indices: Iterable[int]) -> List[Dict[str, str]]:
+        """발화 인덱스 리스트를 한국어 원문 대화로 변환"""
+        return [
+            {"speaker": self.store.speaker_at(i).lower(), "text": self.store.korean_at(i) or self.store.english_at(i)}
+            for i in self.valid(indices)
+        ]